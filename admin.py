@@ -0,0 +1,32 @@
+"""
+Protección de los endpoints de administración (los que hacen trabajo pesado
+sobre la base, como reconstruir los reportes).
+
+Se habilitan definiendo ADMIN_TOKEN; el cliente lo manda en el header
+Authorization: Bearer <token>. Sin ADMIN_TOKEN quedan deshabilitados.
+"""
+import hmac
+import os
+from functools import wraps
+from flask import jsonify, request
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _bearer_token():
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+
+def require_admin(view):
+    """Decorador: 403 si no hay ADMIN_TOKEN configurado, 401 si el token no coincide."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"status":"error","message":"Endpoint de administración deshabilitado (falta ADMIN_TOKEN)"}), 403
+        if not hmac.compare_digest(_bearer_token().encode(), ADMIN_TOKEN.encode()):
+            response = jsonify({"status":"error","message":"Token de administración inválido"})
+            response.headers["WWW-Authenticate"] = "Bearer"
+            return response, 401
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,242 @@
+import logging
+import os
+import threading
+import time
+from flask import g, jsonify, request
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads de cada worker de gunicorn (mismo default que gunicorn.conf.py): un
+# worker gthread nunca atiende más requests que estos a la vez, así que los
+# límites tienen que quedar por debajo para que haya cola y rechazos
+WORKER_THREADS = int(os.getenv("GUNICORN_THREADS", "16"))
+# Lugares del total que solo pueden usar las reservas
+ADMISSION_BOOKING_RESERVED = int(os.getenv("ADMISSION_BOOKING_RESERVED", "2"))
+# Requests que pueden estar usando la base a la vez en cada worker (0 desactiva
+# el control de admisión). Por defecto, la mitad de los threads (sin pasar las
+# conexiones del pool) y más que los lugares reservados; el resto de los
+# threads queda para las colas y para /live, /ready y /metrics
+_default_concurrent = max(min(int(os.getenv("DB_POOL_MAX", "10")), WORKER_THREADS // 2), ADMISSION_BOOKING_RESERVED + 1)
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", str(_default_concurrent)))
+# Segundos que se sugiere esperar en el Retry-After de los 503
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+# Grupo de cada endpoint; los que no están (/, /live, /ready, /docs, /metrics...) no se limitan
+ROUTE_GROUPS = {
+    'reservations_bp.create_reservation': 'booking',
+    'reservations_bp.create_bulk_reservation': 'booking',
+    'reservations_bp.quote_reservations': 'search',
+    'availability_bp.get_availability': 'search',
+    'availability_bp.get_availability_calendar': 'search',
+    'rooms_bp.get_rooms': 'catalog',
+    'room_types_bp.get_room_types': 'catalog',
+    'activities_bp.get_activities': 'catalog',
+    'services_bp.get_services': 'catalog',
+    'packages_bp.get_packages': 'catalog',
+    'packages_bp.get_package_by_id': 'catalog',
+    'imports_bp.import_table': 'catalog',
+    'reports_bp.get_occupancy_report': 'search',
+    'reports_bp.get_revenue_report': 'search',
+    'reports_bp.get_kpis_report': 'search',
+    'reports_bp.rebuild_reports': 'catalog',
+}
+
+
+def _setting(group, name, default):
+    return float(os.getenv(f"ADMISSION_{group.upper()}_{name}", default))
+
+
+class AdmissionGroup:
+    """Límites de un grupo de rutas: concurrencia, largo de la cola y espera máxima."""
+
+    def __init__(self, name, limit, queue, timeout, priority=False):
+        self.name = name
+        self.limit = int(limit)
+        self.queue = int(queue)
+        self.timeout = timeout
+        self.priority = priority
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+
+
+class AdmissionController:
+    """
+    Semáforo por grupo de rutas con cola acotada y deadline. Además de su
+    propio límite, todos los grupos comparten un total (ADMISSION_MAX_CONCURRENT)
+    del que los grupos sin prioridad no pueden usar los últimos
+    ADMISSION_BOOKING_RESERVED lugares, y mientras haya una reserva esperando
+    no entra ningún otro request: con la base saturada se rechazan primero
+    las búsquedas y el catálogo.
+    """
+
+    def __init__(self, total, reserved, groups):
+        self.total = total
+        self.reserved = reserved
+        self.groups = {group.name: group for group in groups}
+        self.active = 0
+        self._cond = threading.Condition()
+
+    def _can_enter(self, group):
+        if group.active >= group.limit:
+            return False
+        if group.priority:
+            return self.active < self.total
+        if any(other.priority and other.waiting for other in self.groups.values()):
+            return False
+        return self.active < self.total - self.reserved
+
+    def acquire(self, group):
+        """Ocupa un lugar del grupo; devuelve el motivo del rechazo o None si entró."""
+        with self._cond:
+            if not self._can_enter(group):
+                if group.waiting >= group.queue:
+                    group.rejected["queue_full"] += 1
+                    return "queue_full"
+                deadline = time.monotonic() + group.timeout
+                group.waiting += 1
+                try:
+                    while not self._can_enter(group):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            group.rejected["timeout"] += 1
+                            return "timeout"
+                        self._cond.wait(remaining)
+                finally:
+                    group.waiting -= 1
+                    # Si se rindió una reserva que esperaba, los demás pueden volver a probar
+                    self._cond.notify_all()
+            group.active += 1
+            group.admitted += 1
+            self.active += 1
+            return None
+
+    def release(self, group):
+        with self._cond:
+            group.active -= 1
+            self.active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_concurrent": self.total,
+                "booking_reserved": self.reserved,
+                "active": self.active,
+                "groups": {
+                    name: {
+                        "limit": group.limit,
+                        "queue": group.queue,
+                        "timeout_seconds": group.timeout,
+                        "active": group.active,
+                        "waiting": group.waiting,
+                        "admitted": group.admitted,
+                        "rejected": dict(group.rejected),
+                    }
+                    for name, group in self.groups.items()
+                },
+            }
+
+
+_browse_limit = max(ADMISSION_MAX_CONCURRENT - ADMISSION_BOOKING_RESERVED, 1)
+# Las colas usan los threads libres (menos uno para /live, /ready y /metrics):
+# límite + cola de cada grupo no pasa de los threads, así la cola se llena y
+# los siguientes reciben 503 en vez de esperar un thread fuera de control
+_booking_queue = max(WORKER_THREADS - ADMISSION_MAX_CONCURRENT - 1, 1)
+_browse_queue = max(_booking_queue // 2, 1)
+controller = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_BOOKING_RESERVED, [
+    AdmissionGroup('booking', _setting('booking', 'LIMIT', ADMISSION_MAX_CONCURRENT),
+                   _setting('booking', 'QUEUE', _booking_queue), _setting('booking', 'TIMEOUT', 5), priority=True),
+    AdmissionGroup('search', _setting('search', 'LIMIT', _browse_limit),
+                   _setting('search', 'QUEUE', _browse_queue), _setting('search', 'TIMEOUT', 1)),
+    AdmissionGroup('catalog', _setting('catalog', 'LIMIT', _browse_limit),
+                   _setting('catalog', 'QUEUE', _browse_queue), _setting('catalog', 'TIMEOUT', 1)),
+])
+
+
+def check_limits(ctrl=None, threads=WORKER_THREADS):
+    """
+    Problemas de configuración que dejan el control de admisión sin efecto
+    (límites que los threads del worker nunca alcanzan). Lista vacía si está bien.
+    """
+    ctrl = ctrl or controller
+    problems = []
+    if ctrl.total <= 0:
+        return problems
+    if not ctrl.reserved < ctrl.total < threads:
+        problems.append(f"se espera ADMISSION_BOOKING_RESERVED ({ctrl.reserved}) < "
+                        f"ADMISSION_MAX_CONCURRENT ({ctrl.total}) < GUNICORN_THREADS ({threads})")
+    for group in ctrl.groups.values():
+        if min(group.limit, ctrl.total) + group.queue > threads:
+            problems.append(f"el grupo {group.name} admite {min(group.limit, ctrl.total)} + {group.queue} en cola, "
+                            f"más que los {threads} threads: la cola nunca se llena")
+    return problems
+
+
+for _problem in check_limits():
+    logger.warning("Control de admisión: %s", _problem)
+
+
+def _before_request():
+    group = controller.groups.get(ROUTE_GROUPS.get(request.endpoint))
+    if group is None or ADMISSION_MAX_CONCURRENT <= 0:
+        return None
+    reason = controller.acquire(group)
+    if reason is not None:
+        logger.warning("Request rechazado por sobrecarga (%s, %s): %s %s", group.name, reason, request.method, request.path)
+        response = jsonify({"status":"error","message":"Servidor sobrecargado, reintentar más tarde"})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+        return response
+    g.admission_group = group
+    return None
+
+
+def _after_request(response):
+    # Una respuesta en streaming (exportaciones con ?stream=1) sigue leyendo
+    # de la base después de que termina la vista: el lugar se libera cuando
+    # el servidor cierra la respuesta, no en el teardown. Las demás ya
+    # tienen el cuerpo armado y lo liberan en el teardown.
+    if response.is_streamed:
+        group = g.pop("admission_group", None)
+        if group is not None:
+            response.call_on_close(lambda: controller.release(group))
+    return response
+
+
+def _teardown_request(exception=None):
+    group = g.pop("admission_group", None)
+    if group is not None:
+        controller.release(group)
+
+
+def _admission_metrics():
+    stats = controller.stats()
+    groups = stats["groups"]
+    return [
+        ("admission_limit", "gauge", "Requests simultáneos permitidos por grupo de rutas",
+         [({"group": name}, s["limit"]) for name, s in groups.items()]),
+        ("admission_active", "gauge", "Requests en curso por grupo de rutas",
+         [({"group": name}, s["active"]) for name, s in groups.items()]),
+        ("admission_waiting", "gauge", "Requests en la cola de espera por grupo de rutas",
+         [({"group": name}, s["waiting"]) for name, s in groups.items()]),
+        ("admission_admitted_total", "counter", "Requests admitidos por grupo de rutas",
+         [({"group": name}, s["admitted"]) for name, s in groups.items()]),
+        ("admission_rejected_total", "counter", "Requests rechazados con 503 por grupo de rutas y motivo",
+         [({"group": name, "reason": reason}, count) for name, s in groups.items() for reason, count in s["rejected"].items()]),
+    ]
+
+
+metrics.add_collector(_admission_metrics)
+
+
+def get_admission_stats():
+    return controller.stats()
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -4,11 +4,40 @@ from flask_cors import CORS
 
 
 load_dotenv()
+import admission
+import changes
+import database
+import instrumentation
+import reports
+import serialization
+
 app = Flask(__name__)
 
+# JSON más rápido (orjson si está instalado) y compatible con el de Flask
+serialization.init_app(app)
+
 # Habilitar CORS para todas las rutas.
 # Esto permite que el frontend en el puerto 5000 le hable al backend en el 5001.
-CORS(app, resources={r"/*": {"origins": "*"}})
+# Sin credenciales (origen "*"): los headers propios que el frontend necesita
+# leer se exponen, y el de read-your-writes lo devuelve en sus requests
+CORS(app, resources={r"/*": {"origins": "*"}},
+     expose_headers=[database.PRIMARY_HEADER, "Idempotent-Replayed", "Retry-After", "ETag"])
+
+# Cada request toma una conexión del pool y la devuelve al terminar
+database.init_app(app)
+
+# Tiempos por request y por consulta (header Server-Timing y /metrics)
+instrumentation.init_app(app)
+
+# Avisos entre workers (LISTEN/NOTIFY) para invalidar el cache del catálogo
+changes.init_app(app)
+
+# Suma las reservas nuevas a los resúmenes de los reportes, fuera de su transacción
+reports.init_app(app)
+
+# Límites de concurrencia por grupo de rutas (reservas, búsquedas, catálogo):
+# con la base saturada se responde 503 rápido en vez de acumular requests
+admission.init_app(app)
 
 from routes.home import home_bp
 from routes.rooms import rooms_bp
@@ -18,7 +47,10 @@ from routes.activities import activities_bp
 from routes.services import services_bp
 from routes.packages import packages_bp
 from routes.reservations import reservations_bp
+from routes.imports import imports_bp
+from routes.reports import reports_bp
 from routes.docs import docs_bp
+from routes.metrics import metrics_bp
 
 # Registrar Blueprints
 app.register_blueprint(home_bp)
@@ -29,7 +61,18 @@ app.register_blueprint(activities_bp)
 app.register_blueprint(services_bp)
 app.register_blueprint(packages_bp)
 app.register_blueprint(reservations_bp)
+app.register_blueprint(imports_bp)
+app.register_blueprint(reports_bp)
 app.register_blueprint(docs_bp)
+app.register_blueprint(metrics_bp)
+
+# Cargar el índice de ocupación de habitaciones antes de recibir requests
+import occupancy
+occupancy.warm_up()
+
+# Swagger UI y la spec en memoria, ya comprimidos, antes de recibir requests
+import static_assets
+static_assets.load()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,171 @@
+"""
+Chequeo de los planes de las consultas calientes.
+
+Corre EXPLAIN (FORMAT JSON) sobre cada consulta de los caminos calientes
+(confirmación de disponibilidad al reservar, precios, paquetes, listados
+paginados, resúmenes de los reportes) contra la base de DATABASE_URL y
+falla si alguna recorre secuencialmente una de las tablas grandes.
+
+La base tiene que estar cargada con un volumen realista (ver bench/seed.py):
+con tablas chicas el planificador elige Seq Scan aunque exista el índice.
+La carga completa del índice de ocupación (occupancy.STAYS_QUERY) lee todas
+las reservas a propósito y no se chequea.
+
+Uso:
+    python bench/seed.py --reset
+    python bench/check_query_plans.py
+    python bench/check_query_plans.py --verbose
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tablas que nunca deberían recorrerse enteras en un camino caliente
+LARGE_TABLES = ('room', 'reservation', 'reservation_room', 'reservation_activity', 'reservation_service')
+
+# Debajo de estas filas el chequeo no es confiable
+MIN_RESERVATIONS = 10000
+
+SAMPLE_QUERY = """
+    SELECT (SELECT MAX(id) FROM room) AS room_id,
+        (SELECT MAX(id) FROM package) AS package_id,
+        (SELECT MAX(id) FROM activity) AS activity_id,
+        (SELECT MAX(id) FROM service) AS service_id,
+        (SELECT MAX(id) FROM reservation) AS reservation_id,
+        (SELECT COUNT(*) FROM reservation) AS reservations;
+"""
+
+
+class RecordingCursor:
+    """Envuelve un cursor y guarda cada consulta ejecutada con sus parámetros ya interpolados."""
+
+    def __init__(self, cur):
+        self._cur = cur
+        self.queries = []
+
+    def execute(self, query, vars=None):
+        self._cur.execute(query, vars)
+        self.queries.append(self._cur.query.decode('utf-8'))
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+def hot_queries(cur, sample):
+    """Lista de (nombre, SQL con parámetros) a chequear."""
+    from listing import page_query
+    from reports import UPDATE_OCCUPANCY_QUERY, UPDATE_REVENUE_QUERY
+    from routes.packages import load_packages
+    from routes.reservations import (
+        LOCK_ROOM_QUERY, PACKAGE_BOOKING_QUERY, PRICES_QUERY, ROOM_OVERLAP_QUERY,
+    )
+
+    checkin = date.today() + timedelta(days=30)
+    checkout = checkin + timedelta(days=3)
+    queries = [
+        ("reservations.ROOM_OVERLAP_QUERY", cur.mogrify(ROOM_OVERLAP_QUERY, (sample['room_id'], checkout, checkin))),
+        ("reservations.LOCK_ROOM_QUERY", cur.mogrify(LOCK_ROOM_QUERY, (sample['room_id'],))),
+        ("reservations.PACKAGE_BOOKING_QUERY", cur.mogrify(PACKAGE_BOOKING_QUERY, (sample['package_id'],))),
+        ("reservations.PRICES_QUERY", cur.mogrify(PRICES_QUERY, ([sample['room_id']], [sample['activity_id']], [sample['service_id']]))),
+    ]
+    # Resúmenes de los reportes que se actualizan con cada tanda de reservas
+    # nuevas (la reconstrucción es una carga masiva y puede recorrer tablas enteras)
+    rollup_params = {'ids': [sample['reservation_id']], 'first_day': None, 'last_day': None}
+    queries += [
+        ("reports.UPDATE_OCCUPANCY_QUERY", cur.mogrify(UPDATE_OCCUPANCY_QUERY, rollup_params)),
+        ("reports.UPDATE_REVENUE_QUERY", cur.mogrify(UPDATE_REVENUE_QUERY, rollup_params)),
+    ]
+    # Sincronización del índice de ocupación con lo que confirmaron otros workers
+    from occupancy import OCCUPANCY_SYNC_LOOKBACK, SYNC_QUERY
+    sync_params = {'room_id': sample['room_id'], 'reservation_id': max(sample['reservation_id'] - OCCUPANCY_SYNC_LOOKBACK, 0)}
+    queries.append(("occupancy.SYNC_QUERY", cur.mogrify(SYNC_QUERY, sync_params)))
+    sql, params = page_query('room', (100, sample['room_id'] // 2))
+    queries.append(("listing.page_query(room)", cur.mogrify(sql, params)))
+
+    # load_packages arma sus consultas en tiempo de ejecución: se graban corriéndola
+    recorder = RecordingCursor(cur)
+    load_packages(recorder, [sample['package_id']])
+    for n, sql in enumerate(recorder.queries, 1):
+        queries.append((f"packages.load_packages#{n}", sql))
+    return [(name, sql.decode('utf-8') if isinstance(sql, bytes) else sql) for name, sql in queries]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def check_plan(cur, sql, tables):
+    """Devuelve (plan, nodos Seq Scan sobre las tablas prohibidas)."""
+    cur.execute('EXPLAIN (FORMAT JSON) ' + sql)
+    row = cur.fetchone()
+    plan = list(row.values())[0] if isinstance(row, dict) else row[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    bad = [node for node in plan_nodes(root)
+           if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in tables]
+    return root, bad
+
+
+def describe(plan, depth=0):
+    relation = f" on {plan['Relation Name']}" if 'Relation Name' in plan else ''
+    index = f" using {plan['Index Name']}" if 'Index Name' in plan else ''
+    lines = [f"{'  ' * depth}-> {plan['Node Type']}{relation}{index}"]
+    for child in plan.get('Plans', []):
+        lines += describe(child, depth + 1)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='mostrar el plan de cada consulta')
+    parser.add_argument('--tables', nargs='+', default=list(LARGE_TABLES),
+                        help='tablas en las que un Seq Scan es un error')
+    args = parser.parse_args()
+
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SAMPLE_QUERY)
+            sample = cur.fetchone()
+            if sample['reservations'] < MIN_RESERVATIONS or sample['package_id'] is None:
+                print(f"La base tiene {sample['reservations']} reservas: cargá datos con bench/seed.py antes de chequear")
+                return 2
+            failures = 0
+            for name, sql in hot_queries(cur, sample):
+                root, bad = check_plan(cur, sql, set(args.tables))
+                status = "OK " if not bad else "SEQ"
+                print(f"{status} {name}")
+                if bad:
+                    failures += 1
+                    for node in bad:
+                        print(f"    Seq Scan sobre {node['Relation Name']}")
+                if bad or args.verbose:
+                    print("\n".join("    " + line for line in describe(root)))
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if failures:
+        print(f"ERROR: {failures} consultas calientes hacen Seq Scan sobre tablas grandes")
+        return 1
+    print("OK: todas las consultas calientes usan índices")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
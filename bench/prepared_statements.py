@@ -0,0 +1,161 @@
+"""
+Medición de lo que ahorran los prepared statements.
+
+Para cada consulta registrada con database.prepared_statement (reserva,
+precios, resúmenes de los reportes, disponibilidad) compara, sobre la base
+de DATABASE_URL:
+
+- el tiempo de planificación (Planning Time de EXPLAIN) de la consulta
+  común contra el de su EXECUTE ya preparado y usado varias veces, cuando el
+  servidor pasa al plan genérico;
+- el tiempo por ejecución medido desde el cliente (parseo, planificación,
+  ejecución e ida y vuelta) de las dos formas.
+
+Todo corre en una transacción que se deshace al final, así que las
+reservas de prueba no quedan en la base. Conviene correrlo sobre una base
+cargada con bench/seed.py.
+
+Uso:
+    python bench/prepared_statements.py
+    python bench/prepared_statements.py --iterations 500
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_QUERY = """
+    SELECT (SELECT MAX(id) FROM room) AS room_id,
+        (SELECT MAX(id) FROM room_type) AS room_type_id,
+        (SELECT MAX(id) FROM package) AS package_id,
+        (SELECT MAX(id) FROM activity) AS activity_id,
+        (SELECT MAX(id) FROM service) AS service_id,
+        (SELECT MAX(id) FROM reservation) AS reservation_id;
+"""
+
+# Consultas que corre cada camino (una reserva personalizada sin esperas y una búsqueda de disponibilidad)
+PATHS = {
+    'reserva': ('lock_room_skip_locked', 'room_overlap', 'prices', 'insert_reservations'),
+    'disponibilidad': ('available_room_types',),
+}
+
+
+def sample_params(cur, sample):
+    """Para cada consulta, una función que devuelve parámetros nuevos en cada llamada."""
+    checkin = date.today() + timedelta(days=3650)
+    checkout = checkin + timedelta(days=3)
+
+    def new_reservation():
+        return {
+            'room_ids': [sample['room_id']], 'adults': [2], 'children': [0],
+            'amounts': [300], 'activity_rows': [1], 'activity_ids': [sample['activity_id']],
+            'service_rows': [], 'service_ids': [], 'package_id': None,
+            'checkin': checkin, 'checkout': checkout, 'customer_name': 'Bench', 'customer_email': 'prepared@example.com',
+        }
+
+    rollup = lambda: {'ids': [sample['reservation_id']], 'first_day': None, 'last_day': None}
+    return {
+        'room_overlap': lambda: (sample['room_id'], checkout, checkin),
+        'lock_room_skip_locked': lambda: (sample['room_id'],),
+        'lock_room': lambda: (sample['room_id'],),
+        'package_booking': lambda: (sample['package_id'],),
+        'prices': lambda: ([sample['room_id']], [sample['activity_id']], [sample['service_id']]),
+        'insert_reservations': new_reservation,
+        'update_occupancy_rollup': rollup,
+        'update_revenue_rollup': rollup,
+        'available_room_types': lambda: ([sample['room_type_id']],),
+    }
+
+
+def planning_ms(cur, sql):
+    cur.execute('EXPLAIN (FORMAT JSON, SUMMARY) ' + sql)
+    plan = list(cur.fetchone().values())[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Planning Time']
+
+
+def timed_runs(run, params_list):
+    samples = []
+    for params in params_list:
+        started = time.perf_counter()
+        run(params)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def measure(cur, statement, make_params, iterations):
+    plain_params = [make_params() for _ in range(iterations)]
+    prepared_params = [make_params() for _ in range(iterations)]
+    plain_planning = planning_ms(cur, cur.mogrify(statement.query, plain_params[0]).decode('utf-8'))
+    plain = timed_runs(lambda params: cur.execute(statement.query, params), plain_params)
+    # Las primeras ejecuciones preparan la consulta y usan planes a medida; después el servidor pasa al plan genérico
+    prepared = timed_runs(lambda params: statement.execute(cur, params), prepared_params)
+    execute_sql = cur.mogrify(statement.execute_sql, statement.bind(prepared_params[-1])).decode('utf-8')
+    prepared_planning = planning_ms(cur, execute_sql)
+    return {
+        'plain_planning_ms': plain_planning,
+        'prepared_planning_ms': prepared_planning,
+        'plain_ms': plain,
+        'prepared_ms': prepared,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200, help='ejecuciones de cada consulta de cada forma')
+    args = parser.parse_args()
+
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    import routes.availability  # noqa: F401  registran sus consultas
+    import routes.reservations  # noqa: F401
+    from database import PooledConnection, get_prepared_statements
+
+    # Una conexión como las del pool, que prepara las consultas registradas
+    conn = psycopg2.connect(database_url, connection_factory=PooledConnection, cursor_factory=RealDictCursor)
+    results = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SAMPLE_QUERY)
+            sample = cur.fetchone()
+            if sample['reservation_id'] is None or sample['package_id'] is None:
+                print("La base no tiene reservas o paquetes: cargá datos con bench/seed.py antes de medir")
+                return 2
+            params = sample_params(cur, sample)
+            for name, statement in sorted(get_prepared_statements().items()):
+                if name not in params:
+                    print(f"Sin parámetros de ejemplo para {name}, se saltea")
+                    continue
+                results[name] = measure(cur, statement, params[name], args.iterations)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    print(f"Mediana de {args.iterations} ejecuciones (ms)")
+    print(f"{'consulta':<26} {'plan común':>11} {'plan prep.':>11} {'común':>9} {'preparada':>10} {'ahorro':>8}")
+    for name, r in results.items():
+        saved = 1 - r['prepared_ms'] / r['plain_ms'] if r['plain_ms'] else 0.0
+        print(f"{name:<26} {r['plain_planning_ms']:>11.3f} {r['prepared_planning_ms']:>11.3f} "
+              f"{r['plain_ms']:>9.3f} {r['prepared_ms']:>10.3f} {saved:>7.0%}")
+    for path, names in PATHS.items():
+        names = [name for name in names if name in results]
+        planning = sum(results[n]['plain_planning_ms'] - results[n]['prepared_planning_ms'] for n in names)
+        wall = sum(results[n]['plain_ms'] - results[n]['prepared_ms'] for n in names)
+        print(f"Camino de {path}: {planning:.3f} ms menos de planificación y {wall:.3f} ms menos en total por request")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Benchmark de los endpoints de la API.
+
+Recorre todas las rutas de los blueprints (listados del catálogo, paquetes,
+disponibilidad, cotización y reservas) a distintos niveles de concurrencia,
+a través del test client de Flask y por HTTP real, y muestra el throughput y
+los percentiles p50/p95/p99 de cada endpoint. Los resultados se guardan en
+JSON para comparar corridas entre sí.
+
+Uso:
+    # Cargar el dataset sintético y correr todo
+    python bench/run_benchmarks.py --seed --reset --rooms 500 --packages 50 --reservations 1000000
+
+    # Sobre la base ya cargada, solo por HTTP contra un servidor levantado aparte
+    python bench/run_benchmarks.py --transport http --url http://127.0.0.1:5001
+
+    # Comparar con una corrida anterior
+    python bench/run_benchmarks.py --compare bench/results/20250101-120000.json
+
+Si no se pasa --url, el modo http levanta el servidor de desarrollo de
+Werkzeug (multithread) en un puerto libre. Las reservas creadas por el
+benchmark se marcan con un email propio de la corrida y se borran al final.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed import add_seed_arguments, seed
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+CATALOG_QUERY = """
+    SELECT (SELECT array_agg(id ORDER BY id) FROM room_type) AS room_type_ids,
+        (SELECT array_agg(id ORDER BY id) FROM package) AS package_ids,
+        (SELECT array_agg(id ORDER BY id) FROM activity) AS activity_ids,
+        (SELECT array_agg(id ORDER BY id) FROM service) AS service_ids;
+"""
+
+CLEANUP_RANGE_QUERY = """
+    SELECT min(check_in_date) AS first_day, max(check_out_date) AS last_day
+    FROM reservation WHERE customer_email LIKE %(pattern)s;
+"""
+
+CLEANUP_QUERY = """
+    DELETE FROM reservation_room WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %(pattern)s);
+    DELETE FROM reservation_activity WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %(pattern)s);
+    DELETE FROM reservation_service WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %(pattern)s);
+    DELETE FROM reservation WHERE customer_email LIKE %(pattern)s;
+"""
+
+
+def build_scenarios(catalog, email):
+    """
+    Cada escenario es (nombre, método, función i -> (path, body)). Los
+    parámetros varían con i para no medir siempre la misma entrada del cache.
+    """
+    today = date.today()
+    room_types = catalog['room_type_ids']
+    packages = catalog['package_ids']
+    activities = catalog['activity_ids']
+    services = catalog['service_ids']
+    # Las reservas del benchmark van lejos en el futuro para no chocar con datos reales
+    booking_base = today + timedelta(days=3000)
+
+    def stay(i, spread=60):
+        checkin = today + timedelta(days=1 + i % spread)
+        return checkin, checkin + timedelta(days=1 + i % 5)
+
+    def availability(i):
+        checkin, checkout = stay(i)
+        return f'/availability?checkin={checkin}&checkout={checkout}', None
+
+    def calendar(i):
+        first_day = today + timedelta(days=i % 30)
+        return f'/availability/calendar?from={first_day}&to={first_day + timedelta(days=29)}', None
+
+    def quote(i):
+        checkin, checkout = stay(i)
+        return '/reservations/quote', {"itineraries": [
+            {"room_type_id": room_types[(i + n) % len(room_types)], "checkin_date": checkin.isoformat(),
+             "checkout_date": checkout.isoformat(), "activity_ids": [activities[(i + n) % len(activities)]]}
+            for n in range(10)
+        ]}
+
+    def reservation(i):
+        checkin = booking_base + timedelta(days=(i // len(room_types)) % 365)
+        return '/reservations', {
+            "room_type_id": room_types[i % len(room_types)],
+            "checkin_date": checkin.isoformat(),
+            "checkout_date": (checkin + timedelta(days=2)).isoformat(),
+            "activity_ids": [activities[i % len(activities)]],
+            "service_ids": [services[i % len(services)]],
+            "customer_name": "Benchmark",
+            "customer_email": email,
+            "adults": 2,
+        }
+
+    return [
+        ("GET /", 'GET', lambda i: ('/', None)),
+        ("GET /rooms", 'GET', lambda i: ('/rooms', None)),
+        ("GET /rooms?limit=100", 'GET', lambda i: ('/rooms?limit=100', None)),
+        ("GET /room_types", 'GET', lambda i: ('/room_types', None)),
+        ("GET /activity", 'GET', lambda i: ('/activity', None)),
+        ("GET /services", 'GET', lambda i: ('/services', None)),
+        ("GET /package", 'GET', lambda i: ('/package', None)),
+        ("GET /package?expand=full", 'GET', lambda i: ('/package?expand=full', None)),
+        ("GET /package/<id>", 'GET', lambda i: (f'/package/{packages[i % len(packages)]}', None)),
+        ("GET /availability", 'GET', availability),
+        ("GET /availability/calendar", 'GET', calendar),
+        ("POST /reservations/quote", 'POST', quote),
+        ("POST /reservations", 'POST', reservation),
+    ]
+
+
+class TestClientTransport:
+    name = 'testclient'
+
+    def __init__(self, app):
+        self.app = app
+
+    def client(self):
+        test_client = self.app.test_client()
+
+        def send(method, path, body):
+            response = test_client.open(path, method=method, json=body)
+            response.get_data()
+            return response.status_code
+        return send
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    name = 'http'
+
+    def __init__(self, app, url=None):
+        self.server = None
+        if url is None:
+            from werkzeug.serving import make_server
+            # El log de cada request del servidor de desarrollo taparía los resultados
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            self.server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            url = f'http://127.0.0.1:{self.server.port}'
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+
+    def client(self):
+        # Una conexión por cliente; http.client la vuelve a abrir si el servidor la cierra
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+        def send(method, path, body):
+            payload = json.dumps(body) if body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            return response.status
+        return send
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(transport, scenario, concurrency, total_requests, offset):
+    name, method, make_request = scenario
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker():
+        send = transport.client()
+        local_latencies, local_statuses = [], {}
+        start_barrier.wait()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            path, body = make_request(offset + i)
+            started = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = 'error'
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "transport": transport.name,
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "errors": sum(v for k, v in statuses.items() if k == 'error' or k >= 500),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total_requests / elapsed, 1) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+    }
+
+
+def print_result(result, previous=None):
+    line = (f"{result['transport']:<10} {result['endpoint']:<28} c={result['concurrency']:<3} "
+            f"req/s={result['requests_per_second']:>8} p50={result['p50_ms']:>8}ms "
+            f"p95={result['p95_ms']:>8}ms p99={result['p99_ms']:>8}ms errores={result['errors']}")
+    if previous and previous.get('requests_per_second'):
+        change = (result['requests_per_second'] / previous['requests_per_second'] - 1) * 100
+        line += f"  ({change:+.1f}% req/s, p95 antes {previous['p95_ms']}ms)"
+    print(line)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', action='store_true', help='cargar el dataset sintético antes de medir')
+    add_seed_arguments(parser)
+    parser.add_argument('--transport', choices=['testclient', 'http', 'both'], default='both')
+    parser.add_argument('--url', help='servidor ya levantado para el modo http (si no, se levanta uno local)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=200, help='requests por endpoint y nivel de concurrencia')
+    parser.add_argument('--warmup', type=int, default=5, help='requests sin medir antes de cada endpoint')
+    parser.add_argument('--only', nargs='+', help='medir solo los endpoints que contengan alguno de estos textos')
+    parser.add_argument('--output', help='archivo JSON de resultados (por defecto bench/results/<fecha>.json)')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para mostrar la diferencia')
+    parser.add_argument('--keep', action='store_true', help='no borrar las reservas creadas')
+    args = parser.parse_args()
+
+    # Cada cliente usa su propia conexión: el pool tiene que alcanzar para el nivel más alto
+    os.environ.setdefault("DB_POOL_MAX", str(max(args.concurrency) + 2))
+    # Los clientes son threads de este proceso, no los de gunicorn: el control de
+    # admisión (que deriva sus límites de GUNICORN_THREADS) tiene que dejarlos entrar a todos
+    os.environ.setdefault("GUNICORN_THREADS", str(2 * (max(args.concurrency) + 2)))
+    from dotenv import load_dotenv
+    load_dotenv()
+    from database import pooled_connection
+    from reports import rebuild_rollups
+
+    if args.seed:
+        with pooled_connection() as conn:
+            seed(conn, args)
+
+    from app import app
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(CATALOG_QUERY)
+            catalog = cur.fetchone()
+        conn.commit()
+    if not all(catalog.values()):
+        print("El catálogo está vacío: cargá datos con --seed o bench/seed.py")
+        return 1
+
+    run_id = uuid.uuid4().hex[:8]
+    email_pattern = f"bench-{run_id}@example.com"
+    scenarios = build_scenarios(catalog, email_pattern)
+    if args.only:
+        scenarios = [s for s in scenarios if any(text in s[0] for text in args.only)]
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            for result in json.load(f)["results"]:
+                previous[(result["transport"], result["endpoint"], result["concurrency"])] = result
+
+    transports = []
+    if args.transport in ('testclient', 'both'):
+        transports.append(TestClientTransport(app))
+    if args.transport in ('http', 'both'):
+        transports.append(HTTPTransport(app, args.url))
+
+    results = []
+    started_at = datetime.now().isoformat(timespec='seconds')
+    offset = random.randrange(1000000)
+    try:
+        for transport in transports:
+            for scenario in scenarios:
+                if args.warmup:
+                    run_scenario(transport, scenario, 1, args.warmup, offset)
+                    offset += args.warmup
+                for concurrency in args.concurrency:
+                    result = run_scenario(transport, scenario, concurrency, args.requests, offset)
+                    offset += args.requests
+                    results.append(result)
+                    print_result(result, previous.get((result["transport"], result["endpoint"], concurrency)))
+    finally:
+        for transport in transports:
+            transport.close()
+        if not args.keep:
+            with pooled_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(CLEANUP_RANGE_QUERY, {"pattern": email_pattern})
+                    first_day, last_day = list(cur.fetchone().values())
+                    cur.execute(CLEANUP_QUERY, {"pattern": email_pattern})
+                conn.commit()
+                # Sacar las reservas borradas de los resúmenes de los reportes
+                if first_day is not None:
+                    rebuild_rollups(conn, first_day, last_day)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w') as f:
+        json.dump({
+            "started_at": started_at,
+            "git_commit": git_commit(),
+            "dataset": {k: getattr(args, k) for k in ('room_types', 'rooms', 'activities', 'services', 'packages', 'reservations')} if args.seed else None,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "results": results,
+        }, f, indent=2)
+    print(f"Resultados guardados en {output}")
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Generador de un hotel sintético para pruebas de rendimiento.
+
+Aplica las migraciones pendientes y carga tipos de habitación, habitaciones,
+actividades, servicios, paquetes y reservas históricas en la base de
+DATABASE_URL. Las filas se generan del lado del servidor (generate_series),
+así que un millón de reservas se carga en segundos.
+
+Las reservas históricas no se pisan entre sí: cada habitación tiene sus
+estadías en ranuras consecutivas que terminan antes de hoy, así las fechas
+futuras quedan libres para las pruebas de reserva.
+
+Uso:
+    python bench/seed.py --reset
+    python bench/seed.py --reset --rooms 500 --packages 50 --reservations 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import migrate
+from reports import rebuild_rollups
+
+SEED_TABLES = (
+    'reservation_service', 'reservation_activity', 'reservation_room', 'reservation',
+    'package_service', 'package_activity', 'package_room_type', 'package',
+    'service', 'activity', 'room', 'room_type', 'report_queue',
+)
+
+CATALOG_QUERY = """
+    INSERT INTO room_type (name, description, capacity, gallery)
+    SELECT 'Tipo ' || g, 'Tipo de habitación sintético ' || g, 2 + g %% 3, ''
+    FROM generate_series(1, %(room_types)s) g;
+
+    INSERT INTO room (type_id, number, price_per_night)
+    SELECT t.ids[1 + g %% array_length(t.ids, 1)], (100 + g)::text, 50 + (g %% 10) * 10
+    FROM generate_series(1, %(rooms)s) g,
+        (SELECT array_agg(id ORDER BY id) AS ids FROM room_type) t;
+
+    INSERT INTO activity (name, description, price, gallery, schedule)
+    SELECT 'Actividad ' || g, 'Actividad sintética ' || g, 10 + (g %% 8) * 5, '', '10:00'
+    FROM generate_series(1, %(activities)s) g;
+
+    INSERT INTO service (name, description, price, gallery)
+    SELECT 'Servicio ' || g, 'Servicio sintético ' || g, 5 + (g %% 6) * 5, ''
+    FROM generate_series(1, %(services)s) g;
+
+    INSERT INTO package (name, description, days, nights, price, gallery)
+    SELECT 'Paquete ' || g, 'Paquete sintético ' || g, 2 + g %% 5, 1 + g %% 5, 200 + (g %% 10) * 50, ''
+    FROM generate_series(1, %(packages)s) g;
+
+    -- Cada paquete con un tipo de habitación, dos actividades y un servicio
+    INSERT INTO package_room_type (package_id, room_type_id)
+    SELECT p.id, t.ids[1 + p.id %% array_length(t.ids, 1)]
+    FROM package p, (SELECT array_agg(id ORDER BY id) AS ids FROM room_type) t;
+
+    INSERT INTO package_activity (package_id, activity_id)
+    SELECT p.id, a.ids[1 + (p.id + k) %% array_length(a.ids, 1)]
+    FROM package p, generate_series(0, 1) k, (SELECT array_agg(id ORDER BY id) AS ids FROM activity) a;
+
+    INSERT INTO package_service (package_id, service_id)
+    SELECT p.id, s.ids[1 + p.id %% array_length(s.ids, 1)]
+    FROM package p, (SELECT array_agg(id ORDER BY id) AS ids FROM service) s;
+"""
+
+# La reserva g va a la habitación g % rooms, en la ranura g / rooms de esa habitación
+RESERVATIONS_QUERY = """
+    CREATE TEMP TABLE seed_reservation ON COMMIT DROP AS
+    SELECT base.id + g + 1 AS id,
+        r.ids[1 + g %% array_length(r.ids, 1)] AS room_id,
+        CURRENT_DATE - %(slot_days)s * (g / array_length(r.ids, 1) + 1) AS check_in_date,
+        1 + (hashint4(g) & 2147483647) %% (%(slot_days)s - 1) AS nights,
+        g
+    FROM generate_series(0, %(reservations)s - 1) g,
+        (SELECT array_agg(id ORDER BY id) AS ids FROM room) r,
+        (SELECT COALESCE(MAX(id), 0) AS id FROM reservation) base;
+
+    INSERT INTO reservation (id, package_id, check_in_date, check_out_date, adults, children, amount, customer_name, customer_email)
+    SELECT s.id,
+        CASE WHEN s.g %% 5 = 0 THEN p.ids[1 + s.g %% array_length(p.ids, 1)] END,
+        s.check_in_date, s.check_in_date + s.nights,
+        1 + s.g %% 3, s.g %% 2, s.nights * 80,
+        'Huésped ' || s.g, 'seed-' || s.g || '@example.com'
+    FROM seed_reservation s, (SELECT array_agg(id ORDER BY id) AS ids FROM package) p;
+
+    INSERT INTO reservation_room (reservation_id, room_id)
+    SELECT id, room_id FROM seed_reservation;
+
+    INSERT INTO reservation_activity (reservation_id, activity_id)
+    SELECT s.id, a.ids[1 + s.g %% array_length(a.ids, 1)]
+    FROM seed_reservation s, (SELECT array_agg(id ORDER BY id) AS ids FROM activity) a
+    WHERE s.g %% 3 = 0;
+
+    INSERT INTO reservation_service (reservation_id, service_id)
+    SELECT s.id, sv.ids[1 + s.g %% array_length(sv.ids, 1)]
+    FROM seed_reservation s, (SELECT array_agg(id ORDER BY id) AS ids FROM service) sv
+    WHERE s.g %% 4 = 0;
+
+    SELECT setval(pg_get_serial_sequence('reservation', 'id'), (SELECT MAX(id) FROM reservation));
+"""
+
+
+def add_seed_arguments(parser):
+    parser.add_argument('--room-types', type=int, default=5)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--activities', type=int, default=20)
+    parser.add_argument('--services', type=int, default=10)
+    parser.add_argument('--packages', type=int, default=50)
+    parser.add_argument('--reservations', type=int, default=1000000)
+    parser.add_argument('--slot-days', type=int, default=4,
+                        help='días de cada ranura por habitación (la estadía dura entre 1 y slot-days - 1 noches)')
+    parser.add_argument('--reset', action='store_true', help='vaciar las tablas antes de cargar')
+
+
+def seed(conn, args, log=print):
+    """Carga el hotel sintético descrito por `args` (ver add_seed_arguments)."""
+    if args.slot_days < 2:
+        raise ValueError("--slot-days debe ser al menos 2")
+    if min(args.room_types, args.rooms, args.activities, args.services, args.packages) < 1:
+        raise ValueError("El catálogo necesita al menos una fila de cada tabla")
+    migrate(conn, log=log)
+    params = vars(args)
+    with conn.cursor() as cur:
+        if args.reset:
+            log("Vaciando tablas")
+            cur.execute(f"TRUNCATE {', '.join(SEED_TABLES)} RESTART IDENTITY;")
+        started = time.perf_counter()
+        cur.execute(CATALOG_QUERY, params)
+        log(f"Catálogo cargado en {time.perf_counter() - started:.1f}s")
+        if args.reservations > 0:
+            started = time.perf_counter()
+            cur.execute(RESERVATIONS_QUERY, params)
+            log(f"{args.reservations} reservas cargadas en {time.perf_counter() - started:.1f}s")
+    conn.commit()
+    started = time.perf_counter()
+    rebuild_rollups(conn)
+    log(f"Resúmenes de los reportes reconstruidos en {time.perf_counter() - started:.1f}s")
+    # Estadísticas al día para que el planificador vea el tamaño real de las tablas
+    old_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {', '.join(SEED_TABLES)};")
+    finally:
+        conn.autocommit = old_autocommit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    conn = psycopg2.connect(database_url)
+    try:
+        seed(conn, args)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Medición del arranque en frío de la app.
+
+Lanza varios procesos nuevos de Python que importan la app y mide cada
+etapa: intérprete vacío, load_dotenv, imports de librerías (Flask,
+psycopg2), armado de la app (blueprints) y precarga del índice de
+ocupación. Con --importtime muestra los módulos que más tardan en importar
+y con --gunicorn mide cuánto tarda gunicorn (preload + workers) en
+responder /ready.
+
+Uso:
+    python bench/startup_time.py
+    python bench/startup_time.py --runs 10 --importtime
+    python bench/startup_time.py --gunicorn --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se corre en un proceso nuevo; imprime los tiempos de cada etapa en JSON
+PHASES_SCRIPT = r"""
+import time
+t0 = time.perf_counter()
+import json
+from dotenv import load_dotenv
+load_dotenv()
+t1 = time.perf_counter()
+import flask, flask_cors, psycopg2
+t2 = time.perf_counter()
+import occupancy
+warm_up = occupancy.warm_up
+timings = {}
+def timed_warm_up():
+    start = time.perf_counter()
+    warm_up()
+    timings['warm_up'] = time.perf_counter() - start
+occupancy.warm_up = timed_warm_up
+import app
+t3 = time.perf_counter()
+print(json.dumps({
+    'load_dotenv': t1 - t0,
+    'library_imports': t2 - t1,
+    'app_setup': t3 - t2 - timings.get('warm_up', 0.0),
+    'occupancy_warm_up': timings.get('warm_up', 0.0),
+    'total_in_process': t3 - t0,
+}))
+"""
+
+
+def run_phases(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', PHASES_SCRIPT], cwd=ROOT)
+        phases = json.loads(output.decode().strip().splitlines()[-1])
+        phases['process_wall'] = time.perf_counter() - started
+        samples.append(phases)
+    return samples
+
+
+def interpreter_baseline(runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', 'pass'])
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def top_imports(limit):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        rows.append((int(cumulative_us), int(self_us), name))
+    # Solo los módulos de primer nivel, que son los que se pueden evitar o postergar
+    top_level = [row for row in rows if not row[2].startswith(' ') and '.' not in row[2]]
+    return sorted(top_level, reverse=True)[:limit]
+
+
+def gunicorn_ready_time(workers, port, timeout=60):
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), PORT=str(port), GUNICORN_ACCESSLOG='', DRAIN_DELAY_SECONDS='0')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true', help='mostrar los imports más lentos')
+    parser.add_argument('--gunicorn', action='store_true', help='medir el arranque de gunicorn hasta /ready')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    baseline = interpreter_baseline(args.runs)
+    samples = run_phases(args.runs)
+    print(f"Mediana de {args.runs} arranques (ms):")
+    print(f"  {'interprete_vacio':<20} {baseline * 1000:8.1f}")
+    for phase in ('load_dotenv', 'library_imports', 'app_setup', 'occupancy_warm_up', 'total_in_process', 'process_wall'):
+        print(f"  {phase:<20} {statistics.median(s[phase] for s in samples) * 1000:8.1f}")
+
+    if args.importtime:
+        print("Imports más lentos (acumulado, ms):")
+        for cumulative, _, name in top_imports(15):
+            print(f"  {name:<20} {cumulative / 1000:8.1f}")
+
+    if args.gunicorn:
+        elapsed = gunicorn_ready_time(args.workers, args.port)
+        if elapsed is None:
+            print("gunicorn no respondió /ready a tiempo")
+            return 1
+        print(f"gunicorn con {args.workers} workers responde /ready en {elapsed * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Prueba de estrés de la asignación de habitaciones.
+
+Lanza reservas en paralelo (1, 8 y 32 clientes por defecto) para un mismo
+tipo de habitación y fechas que se pisan, usando el test client de Flask
+contra la base de DATABASE_URL. Al terminar verifica en la base que ninguna
+habitación haya quedado reservada dos veces en fechas solapadas y muestra
+el throughput de cada nivel.
+
+Uso:
+    python bench/stress_reservations.py --room-type 1 --requests 40
+    python bench/stress_reservations.py --clients 1 8 32 --keep
+
+Las reservas creadas se marcan con un email propio de la corrida y se
+borran al final (salvo que se pase --keep).
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Primero las estadías de la corrida (pocas) y, para cada una, las reservas
+# que se pisan en fechas en la misma habitación. El OFFSET 0 impide que el
+# planificador aplane el LATERAL: así cada estadía consulta el índice GiST
+# sobre daterange en vez de recorrer el historial entero con un hash join.
+DOUBLE_BOOKINGS_QUERY = """
+    WITH run AS MATERIALIZED (
+        SELECT re.id, rr.room_id, daterange(re.check_in_date, re.check_out_date) AS stay
+        FROM reservation re
+        JOIN reservation_room rr ON rr.reservation_id = re.id
+        WHERE re.customer_email LIKE %s
+    )
+    SELECT DISTINCT run.room_id, LEAST(run.id, other.id) AS reservation_a, GREATEST(run.id, other.id) AS reservation_b
+    FROM run
+    CROSS JOIN LATERAL (
+        SELECT o.id
+        FROM reservation o
+        JOIN reservation_room orr ON orr.reservation_id = o.id AND orr.room_id = run.room_id
+        WHERE daterange(o.check_in_date, o.check_out_date) && run.stay AND o.id <> run.id
+        OFFSET 0
+    ) other
+    ORDER BY 1, 2, 3;
+"""
+
+
+def run_level(app, clients, total_requests, room_type_id, checkin, checkout, email):
+    results = {"created": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    per_client = [total_requests // clients + (1 if i < total_requests % clients else 0) for i in range(clients)]
+    start_barrier = threading.Barrier(clients)
+
+    def client(n):
+        test_client = app.test_client()
+        start_barrier.wait()
+        for _ in range(n):
+            response = test_client.post('/reservations', json={
+                "room_type_id": room_type_id,
+                "checkin_date": checkin.isoformat(),
+                "checkout_date": checkout.isoformat(),
+                "customer_name": "Stress test",
+                "customer_email": email,
+                "adults": 1,
+            })
+            key = "created" if response.status_code == 201 else "rejected" if response.status_code == 400 else "errors"
+            with lock:
+                results[key] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in per_client]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    results["seconds"] = round(elapsed, 3)
+    results["requests_per_second"] = round(total_requests / elapsed, 1) if elapsed else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--room-type', type=int, default=1, help='room_type_id a reservar')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=64, help='reservas por nivel de concurrencia')
+    parser.add_argument('--nights', type=int, default=3)
+    parser.add_argument('--keep', action='store_true', help='no borrar las reservas creadas')
+    args = parser.parse_args()
+
+    # Cada cliente usa su propia conexión: el pool tiene que alcanzar para el nivel más alto
+    os.environ.setdefault("DB_POOL_MAX", str(max(args.clients) + 2))
+    # Los clientes son threads de este proceso, no los de gunicorn: el control de
+    # admisión (que deriva sus límites de GUNICORN_THREADS) tiene que dejarlos entrar a todos
+    os.environ.setdefault("GUNICORN_THREADS", str(2 * (max(args.clients) + 2)))
+    from app import app
+    from database import pooled_connection
+    from reports import rebuild_rollups
+
+    run_id = uuid.uuid4().hex[:8]
+    email_pattern = f"stress-{run_id}-%@example.com"
+    # Cada nivel usa su propia ventana de fechas lejana para arrancar con las habitaciones libres
+    base_day = date.today() + timedelta(days=3650)
+    failed = False
+    for level, clients in enumerate(args.clients):
+        checkin = base_day + timedelta(days=level * (args.nights + 30))
+        checkout = checkin + timedelta(days=args.nights)
+        email = f"stress-{run_id}-{clients}@example.com"
+        results = run_level(app, clients, args.requests, args.room_type, checkin, checkout, email)
+        print(f"clientes={clients:>3} creadas={results['created']:>4} rechazadas={results['rejected']:>4} "
+              f"errores={results['errors']:>3} tiempo={results['seconds']}s req/s={results['requests_per_second']}")
+        failed = failed or results["errors"] > 0
+
+    # Con --keep no se borra nada y no hay resúmenes que reconstruir
+    first_day = last_day = None
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(DOUBLE_BOOKINGS_QUERY, (email_pattern,))
+            double_bookings = cur.fetchall()
+            if not args.keep:
+                cur.execute("""
+                    SELECT min(check_in_date) AS first_day, max(check_out_date) AS last_day
+                    FROM reservation WHERE customer_email LIKE %s;
+                """, (email_pattern,))
+                first_day, last_day = list(cur.fetchone().values())
+                cur.execute("""
+                    DELETE FROM reservation_room WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %s);
+                    DELETE FROM reservation_activity WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %s);
+                    DELETE FROM reservation_service WHERE reservation_id IN (SELECT id FROM reservation WHERE customer_email LIKE %s);
+                    DELETE FROM reservation WHERE customer_email LIKE %s;
+                """, (email_pattern,) * 4)
+        conn.commit()
+        # Sacar las reservas borradas de los resúmenes de los reportes
+        if first_day is not None:
+            rebuild_rollups(conn, first_day, last_day)
+
+    if double_bookings:
+        print(f"ERROR: {len(double_bookings)} reservas dobles")
+        for row in double_bookings:
+            print(f"  habitación {row['room_id']}: reservas {row['reservation_a']} y {row['reservation_b']}")
+        return 1
+    print("OK: ninguna habitación quedó reservada dos veces")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
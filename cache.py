@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+import changes
+from instrumentation import metrics
+from serialization import json_response
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_MAXSIZE = int(os.getenv("CATALOG_CACHE_MAXSIZE", "256"))
+
+
+class TTLCache:
+    """
+    Cache en memoria con vencimiento (TTL) y tamaño máximo (se descarta la
+    entrada usada hace más tiempo). Cada entrada puede tener tags para
+    invalidar de una vez todo lo que depende de una tabla.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (vence, tags, valor)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires, _, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, tags=()):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, frozenset(tags), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, tag):
+        with self._lock:
+            stale = [key for key, (_, tags, _) in self._data.items() if tag in tags]
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+catalog_cache = TTLCache(CATALOG_CACHE_MAXSIZE, CATALOG_CACHE_TTL)
+
+
+def publish_invalidation(cur, tag):
+    """
+    Avisa a los otros workers que invaliden `tag` cuando se confirme la
+    transacción de `cur`. El worker que escribe invalida su propio cache
+    después del commit con catalog_cache.invalidate.
+    """
+    changes.publish(cur, 'catalog', tag=tag)
+
+
+changes.on_change('catalog', lambda data: catalog_cache.invalidate(data['tag']))
+# Si se perdieron avisos no se sabe qué cambió: se descarta todo
+changes.on_resync(catalog_cache.clear)
+
+
+def _cache_metrics():
+    stats = catalog_cache.stats()
+    return [
+        ("catalog_cache_entries", "gauge", "Respuestas en el cache del catálogo", [({}, stats["size"])]),
+        ("catalog_cache_hits_total", "counter", "Aciertos del cache del catálogo", [({}, stats["hits"])]),
+        ("catalog_cache_misses_total", "counter", "Fallos del cache del catálogo", [({}, stats["misses"])]),
+    ]
+
+
+metrics.add_collector(_cache_metrics)
+
+
+def _not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached_response(key, build, tags=None):
+    """
+    Devuelve la respuesta JSON cacheada para `key` o la arma con `build()`,
+    que devuelve (payload, status). Solo se cachean las respuestas 200.
+    Si el cliente manda un If-None-Match que coincide, responde 304 sin
+    tocar la base.
+    """
+    entry = catalog_cache.get(key)
+    if entry is not None and entry["etag"] in request.if_none_match:
+        return _not_modified(entry["etag"])
+
+    if entry is None:
+        payload, status = build()
+        # El cuerpo se codifica una sola vez y se guarda en bytes
+        body = current_app.json.dumps_bytes(payload) + b"\n"
+        if status != 200:
+            return json_response(body, status)
+        etag = hashlib.sha1(body).hexdigest()
+        entry = {"etag": etag, "body": body}
+        catalog_cache.set(key, entry, tags if tags is not None else (key[0],))
+        if etag in request.if_none_match:
+            return _not_modified(etag)
+
+    response = json_response(entry["body"])
+    response.set_etag(entry["etag"])
+    # Los clientes pueden guardar la respuesta pero tienen que revalidarla con el ETag
+    response.headers["Cache-Control"] = "no-cache"
+    return response
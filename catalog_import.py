@@ -0,0 +1,377 @@
+"""
+Carga masiva del catálogo (actividades, servicios, tipos de habitación y
+habitaciones) desde CSV o NDJSON.
+
+Las filas se validan a medida que se leen y las válidas se envían a la base
+con COPY dentro de una sola transacción, así que la memoria usada no depende
+del tamaño del archivo. Por defecto es todo o nada: si alguna fila es
+inválida no se carga ninguna y se informa el error de cada una (con el
+número de línea). Con --skip-invalid se cargan las válidas y se informan las
+descartadas. Si las filas traen `id` se respeta y después se ajusta la
+secuencia de la tabla.
+
+Uso:
+    python catalog_import.py activity actividades.csv
+    python catalog_import.py room habitaciones.ndjson --format ndjson
+    cat servicios.csv | python catalog_import.py service - --skip-invalid
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import sys
+from array import array
+from decimal import Decimal, InvalidOperation
+from psycopg2 import Error as Psycopg2Error, sql
+from psycopg2.extensions import cursor as tuple_cursor
+
+# Cantidad máxima de errores que se detallan en la respuesta (se cuentan todos)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+FORMATS = ('csv', 'ndjson')
+
+
+def _text(value):
+    if isinstance(value, (dict, list)):
+        raise ValueError("debe ser un texto")
+    return str(value)
+
+
+def _integer(value):
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError("debe ser un entero")
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("debe ser un entero")
+    if value < 0:
+        raise ValueError("no puede ser negativo")
+    return value
+
+
+def _price(value):
+    if isinstance(value, bool):
+        raise ValueError("debe ser un número")
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError("debe ser un número")
+    if not value.is_finite() or value < 0:
+        raise ValueError("debe ser un número no negativo")
+    return value
+
+
+# Columnas que se pueden importar en cada tabla: nombre -> (conversión, obligatoria).
+# Las obligatorias son las mismas que piden los POST de cada recurso.
+TABLES = {
+    'activity': {
+        'id': (_integer, False),
+        'name': (_text, True),
+        'description': (_text, True),
+        'price': (_price, True),
+        'gallery': (_text, True),
+        'schedule': (_text, True),
+    },
+    'service': {
+        'id': (_integer, False),
+        'name': (_text, True),
+        'description': (_text, True),
+        'price': (_price, True),
+        'gallery': (_text, False),
+    },
+    'room_type': {
+        'id': (_integer, False),
+        'name': (_text, True),
+        'description': (_text, True),
+        'capacity': (_integer, False),
+        'gallery': (_text, True),
+    },
+    'room': {
+        'id': (_integer, False),
+        'type_id': (_integer, True),
+        'number': (_text, False),
+        'price_per_night': (_price, True),
+    },
+}
+
+# Ids de room_type existentes, para validar type_id sin esperar al error de la FK
+ROOM_TYPE_IDS_QUERY = 'SELECT id FROM room_type;'
+
+# Contexto de los errores de COPY: 'COPY room, line 12: "..."'
+COPY_LINE_RE = re.compile(r'COPY \w+, line (\d+)')
+
+
+class ImportFormatError(ValueError):
+    """El archivo no se puede leer: formato desconocido o columnas inválidas."""
+
+
+def _copy_escape(value):
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return None, iter(())
+    columns = [name.strip() for name in reader.fieldnames]
+
+    def records():
+        for row in reader:
+            if None in row:
+                yield reader.line_num, ValueError("tiene más valores que columnas el encabezado")
+                continue
+            # En CSV una celda vacía es un valor nulo
+            yield reader.line_num, {name.strip(): (value if value != '' else None) for name, value in row.items()}
+    return columns, records()
+
+
+def _ndjson_records(stream):
+    def records():
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, ValueError("no es un JSON válido")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValueError("debe ser un objeto JSON")
+                continue
+            yield line_number, record
+    return None, records()
+
+
+class CatalogImport:
+    """
+    Una importación en curso. Se itera sobre las filas válidas (ya en formato
+    de texto de COPY) y va juntando los errores de las inválidas.
+    """
+
+    def __init__(self, table, records, columns, room_type_ids, skip_invalid):
+        self.table = table
+        self.spec = TABLES[table]
+        self.columns = columns
+        self.room_type_ids = room_type_ids
+        self.skip_invalid = skip_invalid
+        self.records = records
+        self.errors = []
+        self.rejected = 0
+        self.copied = 0
+        self.max_id = None
+        # Línea de entrada de cada fila enviada a COPY, para ubicar los errores de la base
+        self.lines = array('L')
+
+    def add_error(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "message": message})
+
+    def _convert(self, record):
+        unknown = sorted(set(record) - set(self.spec))
+        if unknown:
+            raise ValueError(f"columnas desconocidas: {', '.join(unknown)}")
+        if record.get('id') is not None and 'id' not in self.columns:
+            raise ValueError("trae 'id' pero la primera fila no: o todas lo traen o ninguna")
+        values = []
+        for name in self.columns:
+            convert, required = self.spec[name]
+            value = record.get(name)
+            if isinstance(value, str):
+                value = value.strip() or None
+            if value is None:
+                # Si se importan los ids, todas las filas lo tienen que traer
+                if required or name == 'id':
+                    raise ValueError(f"falta '{name}'")
+                values.append(None)
+                continue
+            try:
+                values.append(convert(value))
+            except ValueError as ve:
+                raise ValueError(f"'{name}' {ve}")
+        if self.table == 'room':
+            type_id = values[self.columns.index('type_id')]
+            if type_id not in self.room_type_ids:
+                raise ValueError(f"no existe el tipo de habitación {type_id}")
+        return values
+
+    def __iter__(self):
+        for line, record in self.records:
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                values = self._convert(record)
+            except ValueError as ve:
+                self.add_error(line, str(ve))
+                continue
+            # Sin --skip-invalid, después del primer error se sigue validando
+            # (para informarlos todos) pero ya no se manda nada a la base
+            if self.rejected and not self.skip_invalid:
+                continue
+            if 'id' in self.columns:
+                row_id = values[self.columns.index('id')]
+                if row_id is not None and (self.max_id is None or row_id > self.max_id):
+                    self.max_id = row_id
+            self.copied += 1
+            self.lines.append(line)
+            yield '\t'.join(_copy_escape(value) for value in values) + '\n'
+
+    def line_of_copy_error(self, db_err):
+        match = COPY_LINE_RE.search(getattr(db_err.diag, 'context', None) or '')
+        if match and 0 < int(match.group(1)) <= len(self.lines):
+            return self.lines[int(match.group(1)) - 1]
+        return None
+
+
+class _CopySource:
+    """Objeto tipo archivo que COPY lee de a bloques, generados a medida que se piden."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += row.encode('utf-8')
+        if size < 0:
+            size = len(self._buffer)
+        chunk = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return chunk
+
+
+def _open_records(stream, fmt, table):
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Formato '{fmt}' desconocido, usar {' o '.join(FORMATS)}")
+    columns, records = _csv_records(stream) if fmt == 'csv' else _ndjson_records(stream)
+    spec = TABLES[table]
+    if columns is None:
+        # NDJSON (o CSV vacío): todas las columnas conocidas (las que falten en
+        # una fila van como nulas), menos el id si la primera fila no lo trae
+        first = next(records, None)
+        if first is None:
+            return [name for name in spec if name != 'id'], records
+        records = itertools.chain([first], records)
+        with_id = isinstance(first[1], dict) and first[1].get('id') is not None
+        return [name for name in spec if name != 'id' or with_id], records
+    unknown = [name for name in columns if name not in spec]
+    if unknown:
+        raise ImportFormatError(f"Columnas desconocidas para {table}: {', '.join(unknown)}")
+    missing = [name for name, (_, required) in spec.items() if required and name not in columns]
+    if missing:
+        raise ImportFormatError(f"Faltan columnas obligatorias para {table}: {', '.join(missing)}")
+    return [name for name in spec if name in columns], records
+
+
+def import_catalog(conn, table, stream, fmt='csv', skip_invalid=False, before_commit=None):
+    """
+    Importa las filas de `stream` (texto) en `table` con COPY, en una sola
+    transacción que confirma o deshace. Si la importación se confirma, antes
+    del commit se llama a before_commit(cur) para que escriba en la misma
+    transacción (por ejemplo el aviso a los otros workers). Devuelve un dict con el resultado
+    ("committed", "inserted", "rejected", "errors"). Lanza ImportFormatError
+    si la tabla, el formato o el encabezado no son válidos, y Psycopg2Error
+    si falla la base por otro motivo que una fila.
+    """
+    if table not in TABLES:
+        raise ImportFormatError(f"No se puede importar '{table}', usar {', '.join(TABLES)}")
+    columns, records = _open_records(stream, fmt, table)
+    room_type_ids = set()
+    try:
+        with conn.cursor(cursor_factory=tuple_cursor) as cur:
+            if table == 'room':
+                cur.execute(ROOM_TYPE_IDS_QUERY)
+                room_type_ids = {row[0] for row in cur.fetchall()}
+            job = CatalogImport(table, records, columns, room_type_ids, skip_invalid)
+            copy = sql.SQL('COPY {} ({}) FROM STDIN').format(
+                sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, columns)))
+            try:
+                cur.copy_expert(copy.as_string(conn), _CopySource(job))
+            except Psycopg2Error as db_err:
+                line = job.line_of_copy_error(db_err)
+                if line is None:
+                    raise
+                # Una fila que la base rechaza (por ejemplo un id repetido) se
+                # informa como las demás; COPY no permite seguir con el resto
+                conn.rollback()
+                job.add_error(line, db_err.diag.message_primary or str(db_err))
+                return _result(job, committed=False)
+            if job.rejected and not skip_invalid:
+                conn.rollback()
+                return _result(job, committed=False)
+            if job.max_id is not None:
+                cur.execute(sql.SQL("SELECT setval(pg_get_serial_sequence(%s, 'id'), (SELECT MAX(id) FROM {}))")
+                            .format(sql.Identifier(table)), (table,))
+            if before_commit is not None:
+                before_commit(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return _result(job, committed=True)
+
+
+def _result(job, committed):
+    return {
+        "table": job.table,
+        "committed": committed,
+        "inserted": job.copied if committed else 0,
+        "rejected": job.rejected,
+        "errors": job.errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('table', choices=sorted(TABLES))
+    parser.add_argument('path', help="archivo a importar ('-' para la entrada estándar)")
+    parser.add_argument('--format', choices=FORMATS, help='formato del archivo (por defecto según la extensión)')
+    parser.add_argument('--skip-invalid', action='store_true', help='cargar las filas válidas aunque haya inválidas')
+    args = parser.parse_args()
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    # Los workers que estén corriendo invalidan su cache al confirmarse
+    from cache import publish_invalidation
+    notify = lambda cur: publish_invalidation(cur, args.table)
+    conn = psycopg2.connect(database_url)
+    try:
+        if args.path == '-':
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            result = import_catalog(conn, args.table, stream, fmt, args.skip_invalid, notify)
+        else:
+            with open(args.path, encoding='utf-8', newline='') as stream:
+                result = import_catalog(conn, args.table, stream, fmt, args.skip_invalid, notify)
+    except ImportFormatError as fe:
+        print(fe)
+        return 2
+    finally:
+        conn.close()
+    for error in result["errors"]:
+        print(f"Línea {error['line']}: {error['message']}")
+    if result["rejected"] > len(result["errors"]):
+        print(f"... y {result['rejected'] - len(result['errors'])} errores más")
+    if not result["committed"]:
+        print(f"No se importó nada: {result['rejected']} filas inválidas")
+        return 1
+    print(f"{result['inserted']} filas importadas en {args.table}, {result['rejected']} descartadas")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Avisos de cambios del catálogo entre workers, con LISTEN/NOTIFY de PostgreSQL.
+
+Cada worker guarda en memoria su propio cache del catálogo. Cuando un worker
+cambia el catálogo publica el cambio con publish() en la misma transacción:
+PostgreSQL lo entrega a todos los que escuchan recién al confirmarla (y
+nunca si se deshace). Cada worker tiene un thread con una conexión propia
+que escucha el canal y corre los handlers registrados con on_change; si esa
+conexión se cae, al reconectarse corre los de on_resync porque pudo perder
+avisos (también al conectarse la primera vez).
+
+Las reservas no se avisan así: NOTIFY serializa los commits de todas las
+transacciones que lo usan, y las reservas tienen que poder confirmarse en
+paralelo (el índice de ocupación se pone al día solo, ver occupancy.py).
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+import psycopg2
+from database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Escuchar los cambios de los otros workers (0 lo desactiva: cada worker ve
+# los cambios ajenos recién cuando vence su cache)
+CHANGE_NOTIFICATIONS = os.getenv("CHANGE_NOTIFICATIONS", "1") != "0"
+CHANGES_CHANNEL = "hotel_changes"
+# Segundos entre intentos de reconexión del thread que escucha
+LISTEN_RETRY_SECONDS = 1.0
+
+NOTIFY_QUERY = 'SELECT pg_notify(%s, %s);'
+
+_handlers = {}  # tipo de cambio -> [handler(data)]
+_resync_handlers = []
+_listener_pid = None
+
+
+def on_change(kind, handler):
+    """Registra handler(data) para los cambios de tipo `kind` hechos por otros procesos."""
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def on_resync(handler):
+    """Registra handler() para cuando se pudieron perder avisos (al conectar o reconectar)."""
+    _resync_handlers.append(handler)
+
+
+def publish(cur, kind, **data):
+    """Avisa el cambio a los otros workers cuando se confirme la transacción de `cur`."""
+    payload = json.dumps({"kind": kind, "pid": os.getpid(), **data})
+    cur.execute(NOTIFY_QUERY, (CHANGES_CHANNEL, payload))
+
+
+def _dispatch(payload):
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        logger.warning("Aviso de cambio inválido: %r", payload)
+        return
+    # Los cambios propios ya se aplicaron al confirmar
+    if data.pop("pid", None) == os.getpid():
+        return
+    for handler in _handlers.get(data.pop("kind", None), ()):
+        try:
+            handler(data)
+        except Exception:
+            logger.exception("Falló el handler del aviso de cambio %r", payload)
+
+
+def _resync():
+    for handler in _resync_handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception("Falló la resincronización después de reconectar")
+
+
+def _listen_loop():
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {CHANGES_CHANNEL};")
+            # Lo que cambió antes de escuchar (o mientras estuvo cortado) no se avisó
+            _resync()
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    # Sin avisos: se verifica que la conexión siga viva
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1;")
+                conn.poll()
+                while conn.notifies:
+                    _dispatch(conn.notifies.pop(0).payload)
+        except Exception as e:
+            logger.warning("Se cortó la escucha de cambios del catálogo (%s); reintentando", e)
+        finally:
+            if conn is not None:
+                conn.close()
+        time.sleep(LISTEN_RETRY_SECONDS)
+
+
+def start_listener():
+    """Arranca el thread que escucha los cambios (uno por proceso: los threads no sobreviven al fork)."""
+    global _listener_pid
+    if _listener_pid != os.getpid() and CHANGE_NOTIFICATIONS and DATABASE_URL:
+        _listener_pid = os.getpid()
+        threading.Thread(target=_listen_loop, name='change-listener', daemon=True).start()
+
+
+def init_app(app):
+    # En el primer request de cada worker, no en el master de gunicorn (preload)
+    app.before_request(start_listener)
@@ -1,12 +1,646 @@
+import itertools
+import logging
 import os
+import re
+import threading
+from contextlib import contextmanager
+import time
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+from flask import g, request
+from instrumentation import TimedCursor, metrics
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplicas de solo lectura, separadas por coma (opcional)
+DATABASE_REPLICA_URLS = [dsn.strip() for dsn in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if dsn.strip()]
+# Una réplica más atrasada que esto (en segundos) no recibe lecturas
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+# Cada cuánto se vuelve a verificar el estado y el atraso de cada réplica
+REPLICA_HEALTHCHECK_SECONDS = float(os.getenv("REPLICA_HEALTHCHECK_SECONDS", "5"))
+# Después de escribir, el cliente lee del primario durante estos segundos
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+PRIMARY_COOKIE = "db_primary_until"
+# Mismo valor en un header, para los clientes de otro origen (el frontend
+# con CORS) que no mandan cookies: lo devuelven en sus requests siguientes
+PRIMARY_HEADER = "X-DB-Primary-Until"
+
+# Configuración del pool (se puede ajustar por worker con variables de entorno)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Segundos que una conexión puede estar ociosa antes de verificarla con SELECT 1
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+# Ejecutar las consultas registradas como prepared statements del servidor
+# (0 lo desactiva, por ejemplo detrás de un pgbouncer en modo transacción)
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "1") != "0"
+
+
+class PoolTimeoutError(PoolError):
+    """No se pudo obtener una conexión del pool dentro del timeout."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    Conexión del pool; recuerda qué prepared statements ya se prepararon en
+    ella y los comandos diferidos con defer() que viajan con el próximo.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.stale = set()  # preparados con un plan que ya no sirve: se rehacen en el próximo uso
+        self.deferred = []
+
+    # Lo diferido es de la transacción: si termina sin mandarlo ya no hace falta
+    def commit(self):
+        self.deferred.clear()
+        super().commit()
+
+    def rollback(self):
+        self.deferred.clear()
+        super().rollback()
+
+
+def defer(cur, sql):
+    """
+    Manda `sql` (sin parámetros) junto con el próximo prepared statement de
+    la transacción, en el mismo viaje a la base, en vez de en uno propio. Es
+    para comandos cuyo efecto no se lee hasta ese statement (RELEASE o
+    ROLLBACK TO de un savepoint); si la transacción termina antes, se
+    descarta. En conexiones que no son del pool se ejecuta en el acto.
+    """
+    deferred = getattr(cur.connection, 'deferred', None)
+    if deferred is None:
+        cur.execute(sql)
+    else:
+        deferred.append(sql)
+
+
+_PLACEHOLDER_RE = re.compile(r'%\((\w+)\)s|%s|%%')
+
+
+class PreparedStatement:
+    """
+    Consulta caliente con parámetros que se prepara (PREPARE) una sola vez en
+    cada conexión del pool y después se ejecuta con EXECUTE: el servidor no
+    vuelve a parsearla y, pasadas algunas ejecuciones, reusa el plan. Acepta
+    los mismos placeholders que cursor.execute (%s o %(nombre)s). En
+    conexiones que no son del pool (scripts) se ejecuta como consulta común.
+    """
+
+    def __init__(self, name, query):
+        self.name = name
+        self.query = query
+        self.names = []  # nombres de los parámetros, en el orden de $1, $2...
+        positional = 0
+
+        def replace(match):
+            nonlocal positional
+            if match.group(0) == '%%':
+                return '%'
+            if match.group(1) is None:
+                positional += 1
+                return f'${positional}'
+            if match.group(1) not in self.names:
+                self.names.append(match.group(1))
+            return f'${self.names.index(match.group(1)) + 1}'
+
+        body = _PLACEHOLDER_RE.sub(replace, query.strip().rstrip(';'))
+        if positional and self.names:
+            raise ValueError(f"La consulta {name} mezcla parámetros posicionales y con nombre")
+        self.params_count = positional or len(self.names)
+        self.prepare_sql = f'PREPARE {name} AS {body}'
+        placeholders = ', '.join(['%s'] * self.params_count)
+        self.execute_sql = f'EXECUTE {name} ({placeholders})' if self.params_count else f'EXECUTE {name}'
+        self.prepares = 0
+        self.executions = 0
+
+    def bind(self, params):
+        """Valores de los parámetros en el orden del EXECUTE."""
+        return [params[name] for name in self.names] if self.names else list(params)
+
+    def execute(self, cur, params=(), prefix=''):
+        """
+        Ejecuta la consulta. `prefix` son comandos sin parámetros (por ejemplo
+        un SAVEPOINT) que se mandan antes en el mismo viaje, igual que los
+        diferidos con defer().
+        """
+        conn = cur.connection
+        deferred = getattr(conn, 'deferred', None)
+        if deferred:
+            prefix = ' '.join(deferred) + ' ' + prefix
+            deferred.clear()
+        prepared = getattr(conn, 'prepared', None)
+        if prepared is None or not DB_PREPARED_STATEMENTS:
+            return cur.execute(prefix + self.query, params)
+        if self.name not in prepared:
+            if self.name in conn.stale:
+                cur.execute(f'DEALLOCATE {self.name}')
+                conn.stale.discard(self.name)
+            # PREPARE no es transaccional: sobrevive al rollback y al savepoint
+            cur.execute(self.prepare_sql)
+            prepared.add(self.name)
+            self.prepares += 1
+        self.executions += 1
+        try:
+            return cur.execute(prefix + self.execute_sql, self.bind(params))
+        except psycopg2.errors.FeatureNotSupported:
+            # "cached plan must not change result type": una migración cambió
+            # las columnas de la tabla; el request falla pero la próxima vez se prepara de nuevo
+            prepared.discard(self.name)
+            conn.stale.add(self.name)
+            raise
+
+
+_statements = {}  # nombre -> PreparedStatement
+
+
+def prepared_statement(name, query):
+    """Registra una consulta caliente para ejecutarla como prepared statement."""
+    if name in _statements and _statements[name].query != query:
+        raise ValueError(f"Ya hay otra consulta registrada como {name}")
+    statement = _statements[name] = PreparedStatement(name, query)
+    return statement
 
 
-def get_db_connection():
-    if not DATABASE_URL:
+def get_prepared_statements():
+    return dict(_statements)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe con tamaño mínimo/máximo, timeout al pedir
+    una conexión y verificación de las conexiones que estuvieron ociosas.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamaño de pool inválido")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._cond = threading.Condition()
+        self._idle = []  # lista de (conexión, momento en que se devolvió)
+        self._in_use = set()
+        self._pending = 0
+        self._waiting = 0
+        self._closed = False
+        self._stats = {
+            "borrows": 0,
+            "timeouts": 0,
+            "healthcheck_failures": 0,
+            "connections_opened": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection, cursor_factory=TimedCursor)
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._stats["healthcheck_failures"] += 1
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            if self._closed:
+                raise PoolError("El pool de conexiones está cerrado")
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        # LIFO: la conexión usada más recientemente es la que menos chances tiene de estar caída
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if len(self._in_use) + self._pending < self.maxconn:
+                        conn, idle_since = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Timeout ({self.timeout}s) esperando una conexión del pool"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            # El lugar queda reservado mientras se verifica o se abre la conexión
+            self._pending += 1
+
+        # El connect y el healthcheck se hacen fuera del lock para no frenar al resto
+        try:
+            if conn is not None and not self._is_healthy(conn, idle_since):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._pending -= 1
+            self._in_use.add(conn)
+            self._stats["borrows"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return conn
+
+    def owns(self, conn):
+        with self._cond:
+            return conn in self._in_use
+
+    def putconn(self, conn):
+        with self._cond:
+            self._in_use.discard(conn)
+        if not conn.closed:
+            try:
+                # Nunca devolver una conexión con una transacción abierta
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+        with self._cond:
+            if conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            borrows = self._stats["borrows"]
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "borrows": borrows,
+                "timeouts": self._stats["timeouts"],
+                "healthcheck_failures": self._stats["healthcheck_failures"],
+                "connections_opened": self._stats["connections_opened"],
+                "wait_seconds_total": round(self._stats["wait_seconds_total"], 6),
+                "wait_seconds_avg": round(self._stats["wait_seconds_total"] / borrows, 6) if borrows else 0.0,
+                "wait_seconds_max": round(self._stats["wait_seconds_max"], 6),
+            }
+
+
+_pools = {}  # dsn -> ConnectionPool del proceso
+_pools_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(dsn=None):
+    """
+    Devuelve el pool del proceso actual para `dsn` (por defecto el primario).
+    Se crea la primera vez que se usa (y de nuevo si el proceso se forkeó),
+    así cada worker tiene los suyos.
+    """
+    global _pools, _pools_pid
+    dsn = dsn or DATABASE_URL
+    if not dsn:
         raise ValueError("No se encontró DATABASE_URL")
-    conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    pid = os.getpid()
+    pool = _pools.get(dsn) if _pools_pid == pid else None
+    if pool is None:
+        with _pool_lock:
+            if _pools_pid != pid:
+                # Los pools heredados no se cierran: sus sockets son del proceso padre
+                _pools, _pools_pid = {}, pid
+            pool = _pools.get(dsn)
+            if pool is None:
+                pool = _pools[dsn] = ConnectionPool(dsn)
+    return pool
+
+
+def close_pool():
+    """
+    Cierra los pools del proceso. El master de gunicorn lo llama antes de
+    forkear para que los workers no hereden conexiones abiertas.
+    """
+    global _pools, _pools_pid
+    with _pool_lock:
+        pools, pid = _pools, _pools_pid
+        _pools, _pools_pid = {}, None
+    # Un pool heredado de otro proceso no se cierra: sus sockets son del padre
+    if pid == os.getpid():
+        for pool in pools.values():
+            pool.closeall()
+
+
+def get_pool_stats():
+    pool = _pools.get(DATABASE_URL) if _pools_pid == os.getpid() else None
+    return pool.stats() if pool is not None else None
+
+
+REPLICA_STATUS_QUERY = """
+    SELECT pg_is_in_recovery() AS in_recovery,
+        CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag_seconds;
+"""
+
+
+class Replica:
+    """Estado de una réplica: si responde y cuánto atrasa respecto del primario."""
+
+    def __init__(self, number, dsn):
+        self.number = number
+        self.dsn = dsn
+        self.healthy = False
+        self.in_recovery = None
+        self.lag_seconds = None
+        self.error = None
+        self.checked_at = None
+        self._check_lock = threading.Lock()
+
+    def usable(self):
+        # Se verifica como mucho una vez por intervalo; el resto usa el último estado
+        if self.checked_at is None or time.monotonic() - self.checked_at >= REPLICA_HEALTHCHECK_SECONDS:
+            if self._check_lock.acquire(blocking=self.checked_at is None):
+                try:
+                    self.check()
+                finally:
+                    self._check_lock.release()
+        return self.healthy
+
+    def check(self):
+        try:
+            # Crear el pool ya abre DB_POOL_MIN conexiones, así que también puede fallar
+            pool = get_pool(self.dsn)
+            conn = pool.getconn()
+        except (psycopg2.Error, PoolError) as e:
+            self.mark_down(e)
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute(REPLICA_STATUS_QUERY)
+                row = cur.fetchone()
+            self.in_recovery = row["in_recovery"]
+            self.lag_seconds = float(row["lag_seconds"])
+            self.error = None
+            self.healthy = self.lag_seconds <= REPLICA_MAX_LAG_SECONDS
+            if not self.healthy:
+                logger.warning("Réplica %s atrasada %.1fs, las lecturas van al primario", self.number, self.lag_seconds)
+        except psycopg2.Error as e:
+            self.mark_down(e)
+        finally:
+            self.checked_at = time.monotonic()
+            pool.putconn(conn)
+
+    def mark_down(self, error):
+        if self.healthy or self.error is None:
+            logger.warning("Réplica %s no disponible, las lecturas van al primario: %s", self.number, error)
+        self.healthy = False
+        self.error = str(error).strip()
+        self.checked_at = time.monotonic()
+
+    def stats(self):
+        pool = _pools.get(self.dsn) if _pools_pid == os.getpid() else None
+        return {
+            "replica": self.number,
+            "healthy": self.healthy,
+            "in_recovery": self.in_recovery,
+            "lag_seconds": self.lag_seconds,
+            "error": self.error,
+            "pool": pool.stats() if pool is not None else None,
+        }
+
+
+_replicas = [Replica(number, dsn) for number, dsn in enumerate(DATABASE_REPLICA_URLS)]
+_replica_turn = itertools.count()
+# Hasta cuándo (monotonic) este worker lee del primario después de escribir el catálogo
+_primary_until = 0.0
+
+
+def get_replica_stats():
+    return [replica.stats() for replica in _replicas]
+
+
+def _replica_connection():
+    """Conexión a una réplica sana (en ronda), o None si no hay ninguna."""
+    start = next(_replica_turn)
+    for i in range(len(_replicas)):
+        replica = _replicas[(start + i) % len(_replicas)]
+        if not replica.usable():
+            continue
+        try:
+            return get_pool(replica.dsn).getconn()
+        except (psycopg2.Error, PoolError) as e:
+            replica.mark_down(e)
+    return None
+
+
+def _pinned_until(value):
+    """Hasta cuándo pide leer del primario el cliente (header o cookie), o 0 si no pide."""
+    try:
+        until = float(value or 0)
+    except ValueError:
+        return 0.0
+    # Un valor más lejano que el lapso de read-your-writes no vale (no se puede fijar al primario para siempre)
+    if until > time.time() + READ_YOUR_WRITES_SECONDS + 1:
+        return 0.0
+    return until
+
+
+def _reads_from_primary():
+    if time.monotonic() < _primary_until:
+        return True
+    until = max(_pinned_until(request.headers.get(PRIMARY_HEADER)),
+                _pinned_until(request.cookies.get(PRIMARY_COOKIE)))
+    return until > time.time()
+
+
+def stick_to_primary(worker=False):
+    """
+    Después de una escritura, las lecturas de este cliente van al primario
+    durante READ_YOUR_WRITES_SECONDS, así no ve datos viejos de una réplica
+    atrasada. La respuesta lleva el plazo en el header X-DB-Primary-Until
+    (que el cliente devuelve en sus requests) y en una cookie. Con
+    worker=True también este worker lee del primario en ese lapso, para que
+    el cache que se acaba de invalidar no se vuelva a llenar desde una
+    réplica atrasada.
+    """
+    global _primary_until
+    g.stick_to_primary = True
+    if worker:
+        _primary_until = time.monotonic() + READ_YOUR_WRITES_SECONDS
+
+
+def after_commit(callback):
+    """
+    Registra algo a hacer recién cuando se confirme la transacción del
+    request con commit() (por ejemplo, actualizar el índice de ocupación).
+    """
+    g.setdefault("after_commit", []).append(callback)
+
+
+def commit(conn):
+    """Confirma la transacción y corre lo registrado con after_commit."""
+    conn.commit()
+    for callback in g.pop("after_commit", []):
+        callback()
+
+
+def rollback(conn):
+    """Deshace la transacción y descarta lo registrado con after_commit."""
+    g.pop("after_commit", None)
+    conn.rollback()
+
+
+def _set_primary_pin(response):
+    if g.get("stick_to_primary") and _replicas:
+        until = time.time() + READ_YOUR_WRITES_SECONDS
+        response.headers[PRIMARY_HEADER] = f"{until:.0f}"
+        response.set_cookie(PRIMARY_COOKIE, f"{until:.0f}", max_age=int(READ_YOUR_WRITES_SECONDS) + 1,
+                            httponly=True, samesite="Lax")
+    return response
+
+
+def _pool_metrics():
+    stats = get_pool_stats()
+    replicas = [
+        ("db_replica_healthy", "gauge", "Réplica disponible para lecturas (1) o no (0)",
+         [({"replica": str(r.number)}, int(r.healthy)) for r in _replicas]),
+        ("db_replica_lag_seconds", "gauge", "Atraso de la réplica respecto del primario",
+         [({"replica": str(r.number)}, r.lag_seconds) for r in _replicas if r.lag_seconds is not None]),
+    ] if _replicas else []
+    if stats is None:
+        return replicas
+    return replicas + [
+        ("db_pool_connections", "gauge", "Conexiones del pool por estado",
+         [({"state": "in_use"}, stats["in_use"]), ({"state": "idle"}, stats["idle"])]),
+        ("db_pool_max_connections", "gauge", "Tamaño máximo del pool", [({}, stats["max_size"])]),
+        ("db_pool_waiting", "gauge", "Requests esperando una conexión", [({}, stats["waiting"])]),
+        ("db_pool_borrows_total", "counter", "Conexiones entregadas por el pool", [({}, stats["borrows"])]),
+        ("db_pool_timeouts_total", "counter", "Pedidos de conexión que vencieron", [({}, stats["timeouts"])]),
+        ("db_pool_wait_seconds_total", "counter", "Tiempo total esperando una conexión", [({}, stats["wait_seconds_total"])]),
+    ]
+
+
+metrics.add_collector(_pool_metrics)
+
+
+def _statement_metrics():
+    statements = sorted(_statements.values(), key=lambda st: st.name)
+    return [
+        ("db_prepared_statement_prepares_total", "counter", "Veces que se preparó cada consulta (una por conexión)",
+         [({"statement": st.name}, st.prepares) for st in statements]),
+        ("db_prepared_statement_executions_total", "counter", "Ejecuciones de cada consulta preparada",
+         [({"statement": st.name}, st.executions) for st in statements]),
+    ]
+
+
+metrics.add_collector(_statement_metrics)
+
+
+def get_db_connection(readonly=False):
+    """
+    Devuelve la conexión del request actual. Se pide al pool una sola vez por
+    request y se devuelve en el teardown (close_db_connection).
+    Con readonly=True la conexión sale de una réplica sana si hay alguna
+    configurada; si no (o si el cliente acaba de escribir) es la del primario.
+    """
+    if readonly and _replicas:
+        conn = g.get("db_replica_conn")
+        if conn is not None and not conn.closed:
+            return conn
+        # Si el request ya usó el primario sigue ahí, para leer lo que escribió
+        if g.get("db_conn") is None and not _reads_from_primary():
+            conn = _replica_connection()
+            if conn is not None:
+                g.db_replica_conn = conn
+                return conn
+    conn = g.get("db_conn")
+    if conn is None or conn.closed:
+        conn = get_pool().getconn()
+        g.db_conn = conn
     return conn
+
+
+@contextmanager
+def pooled_connection():
+    """Conexión del pool para usar fuera de un request (scripts, CLI)."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+def detach_db_connection(readonly=False):
+    """
+    Saca la conexión del request para que el teardown no la devuelva. Se usa
+    en respuestas en streaming, que siguen leyendo de la base después de que
+    termina el handler; quien la pide tiene que devolverla con
+    release_db_connection.
+    """
+    conn = get_db_connection(readonly)
+    for key in ("db_conn", "db_replica_conn"):
+        if g.get(key) is conn:
+            g.pop(key)
+    return conn
+
+
+def release_db_connection(conn):
+    """Devuelve la conexión al pool (del primario o de la réplica) del que salió."""
+    for pool in list(_pools.values()):
+        if pool.owns(conn):
+            pool.putconn(conn)
+            return
+    conn.close()
+
+
+def close_db_connection(exception=None):
+    for key in ("db_conn", "db_replica_conn"):
+        conn = g.pop(key, None)
+        if conn is not None:
+            release_db_connection(conn)
+
+
+def init_app(app):
+    app.after_request(_set_primary_pin)
+    app.teardown_appcontext(close_db_connection)
@@ -0,0 +1,52 @@
+"""
+Configuración de gunicorn para producción.
+
+La app se carga una sola vez en el proceso master (preload_app) y los
+workers se forkean ya con los módulos importados y el índice de ocupación
+cargado, así arrancan en milisegundos. Cada worker abre su propio pool de
+conexiones después del fork.
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+# admission.py deriva de este valor (mismo default) los límites de concurrencia y las colas
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+worker_class = "gthread"
+preload_app = True
+# Tiempo que tiene cada worker para terminar los requests en curso después de un SIGTERM
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Vacío desactiva el log de accesos
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+
+# Cada worker deja acá una copia de sus métricas y /metrics junta las de todos
+# (se define antes de que preload_app importe la app, que lo lee al arrancar)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"hotel-metrics-{os.getpid()}"))
+os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+# Las copias de una corrida anterior son de workers que ya no existen
+for _name in os.listdir(os.environ["METRICS_DIR"]):
+    if _name.endswith(".json"):
+        os.remove(os.path.join(os.environ["METRICS_DIR"], _name))
+
+
+def pre_fork(server, worker):
+    # Las conexiones que abrió el master al precargar la app (índice de
+    # ocupación) no se pueden compartir entre procesos: se cierran antes de
+    # forkear y cada worker crea su pool en el primer request
+    import database
+    database.close_pool()
+
+
+def post_worker_init(worker):
+    import lifecycle
+    lifecycle.install_drain_handler()
+
+
+def child_exit(server, worker):
+    # Las series del worker que terminó dejan de exponerse (el reemplazo tiene otro pid)
+    import instrumentation
+    instrumentation.remove_snapshot(worker.pid)
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+from psycopg2 import Error as Psycopg2Error
+from database import commit, get_db_connection, pooled_connection, rollback
+from serialization import json_response
+
+logger = logging.getLogger(__name__)
+
+# Horas que se guarda la respuesta de cada Idempotency-Key
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+# Segundos que un pedido repetido espera a que el primero guarde su respuesta
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+# Cada cuánto cada worker borra las claves vencidas
+IDEMPOTENCY_CLEANUP_SECONDS = float(os.getenv("IDEMPOTENCY_CLEANUP_SECONDS", "300"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Toma la clave; si ya existe pero venció, la reutiliza. Si otra transacción
+# la insertó y todavía no terminó, el INSERT espera a que termine.
+CLAIM_QUERY = """
+    INSERT INTO idempotency_key (key, fingerprint)
+    VALUES (%(key)s, %(fingerprint)s)
+    ON CONFLICT (key) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, status_code = NULL, response_body = NULL, created_at = now()
+        WHERE idempotency_key.created_at < now() - make_interval(secs => %(ttl)s)
+    RETURNING key;
+"""
+
+STORED_QUERY = 'SELECT fingerprint, status_code, response_body FROM idempotency_key WHERE key = %s;'
+
+STORE_QUERY = 'UPDATE idempotency_key SET status_code = %s, response_body = %s WHERE key = %s;'
+
+CLEANUP_QUERY = 'DELETE FROM idempotency_key WHERE created_at < now() - make_interval(secs => %s);'
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def _fingerprint():
+    digest = hashlib.sha256()
+    digest.update(f"{request.method} {request.path}\n".encode("utf-8"))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _cleanup_expired():
+    """Borra las claves vencidas, como mucho una vez cada IDEMPOTENCY_CLEANUP_SECONDS por worker."""
+    global _last_cleanup
+    if time.monotonic() - _last_cleanup < IDEMPOTENCY_CLEANUP_SECONDS or not _cleanup_lock.acquire(blocking=False):
+        return
+    try:
+        _last_cleanup = time.monotonic()
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CLEANUP_QUERY, (IDEMPOTENCY_KEY_TTL_HOURS * 3600,))
+            conn.commit()
+    except Psycopg2Error as e:
+        logger.warning("No se pudieron borrar las claves de idempotencia vencidas: %s", e)
+    finally:
+        _cleanup_lock.release()
+
+
+def _replay(conn, key, fingerprint):
+    """Respuesta guardada para la clave; si el primer pedido todavía no la guardó, la espera."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(STORED_QUERY, (key,))
+            stored = cur.fetchone()
+        conn.rollback()
+        if stored is None:
+            return None
+        if stored['fingerprint'] != fingerprint:
+            return jsonify({"status":"error","message":"La Idempotency-Key ya se usó con un pedido distinto"}), 422
+        if stored['status_code'] is not None:
+            response = json_response(bytes(stored['response_body']), stored['status_code'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if time.monotonic() >= deadline:
+            response = jsonify({"status":"error","message":"Hay un pedido con la misma Idempotency-Key en curso"})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        time.sleep(0.05)
+
+
+def idempotent(view):
+    """
+    Soporte del header Idempotency-Key para un POST que escribe en la
+    conexión del request. La vista no confirma: devuelve su respuesta y es
+    este wrapper el que confirma la transacción si es 2xx (o la deshace si
+    no). Con clave, la clave y la respuesta se guardan en esa misma
+    transacción antes del commit, así quedan confirmadas junto con la
+    reserva o no queda nada: un reintento con la misma clave devuelve la
+    respuesta guardada sin volver a asignar habitación, uno concurrente
+    espera (en el INSERT) a que el primero termine, y si el primero falla
+    el reintento se procesa de nuevo. Lo que la vista tiene que hacer
+    después de confirmar lo registra con database.after_commit.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is not None and (not key.strip() or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH):
+            return jsonify({"status":"error","message":f"Idempotency-Key debe tener entre 1 y {IDEMPOTENCY_KEY_MAX_LENGTH} caracteres"}), 400
+        conn = get_db_connection()
+        if key is not None:
+            _cleanup_expired()
+            fingerprint = _fingerprint()
+            while True:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(CLAIM_QUERY, {"key": key, "fingerprint": fingerprint, "ttl": IDEMPOTENCY_KEY_TTL_HOURS * 3600})
+                        claimed = cur.fetchone() is not None
+                    if claimed:
+                        break
+                    conn.rollback()
+                    replay = _replay(conn, key, fingerprint)
+                except Psycopg2Error as db_err:
+                    conn.rollback()
+                    return jsonify({"status":"error","message":"Error DB al verificar la Idempotency-Key","error_details": str(db_err)}), 500
+                # None: la clave se borró entre el INSERT y la lectura (venció); se vuelve a tomar
+                if replay is not None:
+                    return replay
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            rollback(conn)
+            raise
+        if not 200 <= response.status_code < 300:
+            # Se descarta lo que haya escrito el handler, y también la clave
+            rollback(conn)
+            return response
+        try:
+            if key is not None:
+                with conn.cursor() as cur:
+                    cur.execute(STORE_QUERY, (response.status_code, response.get_data(), key))
+            commit(conn)
+        except Psycopg2Error as db_err:
+            # No se confirmó nada (ni la reserva ni la clave): el reintento se procesa de nuevo
+            rollback(conn)
+            logger.warning("No se pudo confirmar la reserva con Idempotency-Key %s: %s", key, db_err)
+            return jsonify({"status":"error","message":"Error DB al confirmar la reserva","error_details": str(db_err)}), 500
+        return response
+    return wrapper
@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import threading
+import time
+from psycopg2.extras import RealDictCursor
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Las consultas más lentas que esto (en milisegundos) se loguean
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Límites de los buckets del histograma de latencia, en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Directorio donde cada worker de gunicorn deja una copia de sus métricas para
+# que /metrics devuelva las de todos (gunicorn.conf.py lo define; sin él cada
+# proceso expone solo las suyas)
+METRICS_DIR = os.getenv("METRICS_DIR")
+# Cada cuántos segundos cada worker actualiza su copia: es el atraso máximo de
+# las métricas de los otros workers en /metrics
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor que mide cada consulta y la suma a las métricas del request."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            _record_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            _record_query(query, time.perf_counter() - start)
+
+
+def _record_query(query, elapsed):
+    if not has_request_context():
+        return
+    g.db_queries = g.get("db_queries", 0) + 1
+    g.db_time = g.get("db_time", 0.0) + elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        logger.warning(
+            "Consulta lenta (%.1f ms) en %s [%s]: %s",
+            elapsed * 1000, request.endpoint, request.blueprint, " ".join(str(query).split())[:500],
+        )
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Métricas por endpoint del proceso, en memoria."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> cantidad
+        self.latency = {}  # endpoint -> Histogram
+        self.db_queries = {}  # endpoint -> cantidad de consultas
+        self.db_time = {}  # endpoint -> segundos en la base
+        self._collectors = []
+
+    def observe_request(self, endpoint, method, status, duration, queries, db_time):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if endpoint not in self.latency:
+                self.latency[endpoint] = Histogram(LATENCY_BUCKETS)
+            self.latency[endpoint].observe(duration)
+            self.db_queries[endpoint] = self.db_queries.get(endpoint, 0) + queries
+            self.db_time[endpoint] = self.db_time.get(endpoint, 0.0) + db_time
+
+    def add_collector(self, collector):
+        """
+        Registra una función que devuelve [(nombre, tipo, ayuda, [(labels, valor)])]
+        para exponer métricas de otros módulos (pool, cache, etc.).
+        """
+        self._collectors.append(collector)
+
+    def families(self):
+        """
+        Las métricas del proceso como [(nombre, tipo, ayuda, [(muestra, labels, valor)])],
+        las propias y las de los collectors.
+        """
+        families = []
+        with self._lock:
+            families.append(("http_requests_total", "counter", "Requests atendidos",
+                             [("http_requests_total", {"endpoint": e, "method": m, "status": str(s)}, v)
+                              for (e, m, s), v in sorted(self.requests.items())]))
+            samples = []
+            for endpoint, hist in sorted(self.latency.items()):
+                for bound, count in zip(hist.buckets, hist.counts):
+                    samples.append(("http_request_duration_seconds_bucket", {"endpoint": endpoint, "le": repr(bound)}, count))
+                samples.append(("http_request_duration_seconds_bucket", {"endpoint": endpoint, "le": "+Inf"}, hist.count))
+                samples.append(("http_request_duration_seconds_sum", {"endpoint": endpoint}, hist.sum))
+                samples.append(("http_request_duration_seconds_count", {"endpoint": endpoint}, hist.count))
+            families.append(("http_request_duration_seconds", "histogram", "Latencia de los requests", samples))
+            families.append(("db_queries_total", "counter", "Consultas SQL ejecutadas",
+                             [("db_queries_total", {"endpoint": e}, v) for e, v in sorted(self.db_queries.items())]))
+            families.append(("db_query_seconds_total", "counter", "Tiempo total en consultas SQL",
+                             [("db_query_seconds_total", {"endpoint": e}, v) for e, v in sorted(self.db_time.items())]))
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                families.append((name, kind, help_text, [(name, labels, value) for labels, value in samples]))
+        return families
+
+    def render(self):
+        """
+        Todas las métricas en formato de texto de Prometheus, con el label
+        `worker` (pid). Con METRICS_DIR (gunicorn) incluye también las de los
+        otros workers según su última copia, así cualquier worker que atienda
+        /metrics devuelve las de todos y cada serie es monótona.
+        """
+        snapshots = _read_snapshots()
+        snapshots[os.getpid()] = self.families()
+        merged = {}  # nombre -> (tipo, ayuda, muestras), en el orden en que aparecen
+        for pid, families in sorted(snapshots.items()):
+            for name, kind, help_text, samples in families:
+                family = merged.setdefault(name, (kind, help_text, []))
+                family[2].extend((sample, dict(labels, worker=str(pid)), value) for sample, labels, value in samples)
+        lines = []
+        for name, (kind, help_text, samples) in merged.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [_sample(sample, labels, value) for sample, labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{label_text}}} {value}"
+    return f"{name} {value}"
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def _read_snapshots():
+    """Última copia de las métricas de cada uno de los otros workers: {pid: familias}."""
+    snapshots = {}
+    if not METRICS_DIR:
+        return snapshots
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        return snapshots
+    for name in names:
+        pid, ext = os.path.splitext(name)
+        if ext != ".json" or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), encoding="utf-8") as f:
+                snapshots[int(pid)] = json.load(f)
+        except (OSError, ValueError):
+            # El worker terminó (o está escribiendo) justo ahora
+            continue
+    return snapshots
+
+
+def write_snapshot():
+    """Guarda las métricas del proceso en METRICS_DIR para que las lean los otros workers."""
+    path = _snapshot_path(os.getpid())
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metrics.families(), f)
+    # Reemplazo atómico: quien lee ve la copia anterior o la nueva, nunca una a medias
+    os.replace(tmp, path)
+
+
+def remove_snapshot(pid):
+    """Borra la copia de un worker que terminó (hook child_exit de gunicorn)."""
+    if not METRICS_DIR:
+        return
+    try:
+        os.remove(_snapshot_path(pid))
+    except OSError:
+        pass
+
+
+def _snapshot_loop():
+    while True:
+        time.sleep(METRICS_SNAPSHOT_SECONDS)
+        try:
+            write_snapshot()
+        except Exception:
+            logger.exception("No se pudieron guardar las métricas del worker")
+
+
+_snapshot_pid = None
+
+
+def start_snapshots():
+    """Arranca el thread que guarda las métricas del worker (uno por proceso)."""
+    global _snapshot_pid
+    if METRICS_DIR and _snapshot_pid != os.getpid():
+        _snapshot_pid = os.getpid()
+        threading.Thread(target=_snapshot_loop, name='metrics-snapshot', daemon=True).start()
+
+
+metrics = Metrics()
+
+
+def _before_request():
+    g.request_start = time.perf_counter()
+    g.db_queries = 0
+    g.db_time = 0.0
+
+
+def _after_request(response):
+    start = g.get("request_start")
+    if start is None:
+        return response
+    duration = time.perf_counter() - start
+    queries = g.get("db_queries", 0)
+    db_time = g.get("db_time", 0.0)
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_time * 1000:.2f};desc="{queries} queries", '
+        f'app;dur={(duration - db_time) * 1000:.2f}, total;dur={duration * 1000:.2f}',
+    )
+    observe = (request.endpoint or "unmatched", request.method, response.status_code)
+    if response.is_streamed:
+        # Una exportación en streaming sigue generando el cuerpo después de
+        # que termina la vista: su latencia es hasta que el servidor cierra
+        # la respuesta (el Server-Timing solo cubre hasta los headers)
+        response.call_on_close(
+            lambda: metrics.observe_request(*observe, time.perf_counter() - start, queries, db_time)
+        )
+    else:
+        metrics.observe_request(*observe, duration, queries, db_time)
+    return response
+
+
+def init_app(app):
+    # La copia de las métricas la arranca cada worker en su primer request (no el master de gunicorn)
+    app.before_request(start_snapshots)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
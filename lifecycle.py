@@ -0,0 +1,51 @@
+import logging
+import os
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Segundos que el worker sigue atendiendo (con /ready en 503) después de un
+# SIGTERM, para que el balanceador deje de mandarle tráfico antes de cerrar
+DRAIN_DELAY_SECONDS = float(os.getenv("DRAIN_DELAY_SECONDS", "5"))
+
+_draining = threading.Event()
+_started_at = time.monotonic()
+
+
+def is_draining():
+    return _draining.is_set()
+
+
+def start_draining():
+    if not _draining.is_set():
+        logger.info("Worker %s drenando: /ready responde 503", os.getpid())
+        _draining.set()
+
+
+def uptime():
+    return time.monotonic() - _started_at
+
+
+def install_drain_handler():
+    """
+    Envuelve el handler de SIGTERM del worker: primero marca el proceso como
+    drenando y recién después de DRAIN_DELAY_SECONDS deja que el servidor
+    haga su cierre ordenado (deja de aceptar conexiones y termina las que
+    están en curso). Se llama desde el hook post_worker_init de gunicorn.
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_sigterm(signum, frame):
+        start_draining()
+        if not callable(previous):
+            return
+        if DRAIN_DELAY_SECONDS > 0:
+            timer = threading.Timer(DRAIN_DELAY_SECONDS, previous, (signum, frame))
+            timer.daemon = True
+            timer.start()
+        else:
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
@@ -0,0 +1,129 @@
+import os
+from flask import current_app, jsonify, request
+from psycopg2 import Error as Psycopg2Error
+from database import get_db_connection, detach_db_connection, release_db_connection
+from cache import cached_response
+
+# Máximo de filas por página en ?limit=
+LIST_MAX_LIMIT = int(os.getenv("LIST_MAX_LIMIT", "1000"))
+# Filas que trae el cursor del servidor en cada viaje cuando se usa ?stream=1
+LIST_STREAM_BATCH = int(os.getenv("LIST_STREAM_BATCH", "500"))
+
+
+def page_args():
+    """
+    Lee ?limit= y ?after= (paginación por id). Devuelve (limit, after), con
+    limit en None si no se pidió paginar. Lanza ValueError si son inválidos.
+    """
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    if limit is None:
+        if after is not None:
+            raise ValueError("'after' requiere 'limit'")
+        return None, None
+    try:
+        limit = int(limit)
+        after = int(after) if after is not None else 0
+    except ValueError:
+        raise ValueError("'limit' y 'after' deben ser enteros")
+    if limit < 1 or limit > LIST_MAX_LIMIT:
+        raise ValueError(f"'limit' debe estar entre 1 y {LIST_MAX_LIMIT}")
+    return limit, after
+
+
+def page_query(table, page):
+    """SELECT por id para la tabla; con límite usa la clave `id > after`."""
+    limit, after = page
+    if limit is None:
+        return f'SELECT * FROM {table} ORDER BY id;', ()
+    return f'SELECT * FROM {table} WHERE id > %s ORDER BY id LIMIT %s;', (after, limit)
+
+
+def with_page_info(payload, rows, page):
+    limit, _ = page
+    if limit is not None:
+        # Si la página vino llena puede haber más: el cliente sigue con ?after=next_after
+        payload["next_after"] = rows[-1]['id'] if len(rows) == limit else None
+    return payload
+
+
+def list_table(table, ok_message, empty_message, error_message):
+    """
+    Respuesta de un listado de catálogo: cacheada (con ETag), paginada por id
+    con ?limit=&after= y, con ?stream=1, escrita de a una fila desde un
+    cursor del lado del servidor para no tener la tabla entera en memoria.
+    """
+    try:
+        page = page_args()
+    except ValueError as ve:
+        return jsonify({"status":"error","message": str(ve)}), 400
+    if request.args.get('stream') == '1':
+        return stream_table(table, page, ok_message, empty_message, error_message)
+
+    def build():
+        try:
+            conn = get_db_connection(readonly=True)
+            with conn.cursor() as cur:
+                cur.execute(*page_query(table, page))
+                rows = cur.fetchall()
+        except Psycopg2Error as db_err:
+            return {"status":"error","message": error_message,"error_details": str(db_err)}, 500
+        if not rows:
+            return {"status":"error","message": empty_message}, 404
+        return with_page_info({"status":"success","message": ok_message,"data": rows}, rows, page), 200
+
+    return cached_response((table, 'page') + page if page[0] else (table,), build, tags=(table,))
+
+
+def stream_table(table, page, ok_message, empty_message, error_message):
+    # La respuesta se sigue generando después del teardown del request, así
+    # que la conexión se saca del request y se devuelve al cerrar la respuesta
+    conn = detach_db_connection(readonly=True)
+    cur = conn.cursor(name=f'stream_{table}')
+    cur.itersize = LIST_STREAM_BATCH
+    closed = []
+
+    def cleanup():
+        if not closed:
+            closed.append(True)
+            try:
+                cur.close()
+            except Psycopg2Error:
+                pass
+            release_db_connection(conn)
+
+    try:
+        cur.execute(*page_query(table, page))
+        rows = iter(cur)
+        first = next(rows, None)
+    except Psycopg2Error as db_err:
+        cleanup()
+        return jsonify({"status":"error","message": error_message,"error_details": str(db_err)}), 500
+    if first is None:
+        cleanup()
+        return jsonify({"status":"error","message": empty_message}), 404
+
+    dumps = current_app.json.dumps_bytes
+
+    def generate():
+        last, count = first, 1
+        yield b'{"status":"success","message":' + dumps(ok_message) + b',"data":[' + dumps(first)
+        # Se escribe de a tandas para no hacer un write por fila
+        chunk = []
+        for row in rows:
+            chunk.append(dumps(row))
+            last, count = row, count + 1
+            if len(chunk) >= LIST_STREAM_BATCH:
+                yield b',' + b','.join(chunk)
+                chunk = []
+        if chunk:
+            yield b',' + b','.join(chunk)
+        tail = b']'
+        limit = page[0]
+        if limit is not None:
+            tail += b',"next_after":' + dumps(last['id'] if count == limit else None)
+        yield tail + b'}\n'
+
+    response = current_app.response_class(generate(), mimetype='application/json')
+    response.call_on_close(cleanup)
+    return response
@@ -0,0 +1,226 @@
+"""
+Migraciones versionadas del esquema de la base.
+
+Cada migración tiene un número de versión, una descripción y el SQL a
+ejecutar. Las aplicadas se registran en la tabla schema_migrations, así que
+correr el script de nuevo solo aplica las pendientes. Todo el SQL usa
+IF NOT EXISTS para poder aplicarse sobre la base que ya existe en producción.
+
+Uso:
+    python migrations.py            # aplica las migraciones pendientes
+    python migrations.py --status   # muestra la versión actual y las pendientes
+    python migrations.py --target 2 # aplica hasta la versión 2 inclusive
+"""
+import argparse
+import os
+import sys
+
+MIGRATIONS = [
+    (1, "Tablas base del hotel", """
+        CREATE TABLE IF NOT EXISTS room_type (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            capacity INTEGER,
+            gallery TEXT
+        );
+        CREATE TABLE IF NOT EXISTS room (
+            id SERIAL PRIMARY KEY,
+            type_id INTEGER NOT NULL REFERENCES room_type(id),
+            number TEXT,
+            price_per_night NUMERIC(10, 2) NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS activity (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            price NUMERIC(10, 2) NOT NULL,
+            gallery TEXT,
+            schedule TEXT
+        );
+        CREATE TABLE IF NOT EXISTS service (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            price NUMERIC(10, 2) NOT NULL,
+            gallery TEXT
+        );
+        CREATE TABLE IF NOT EXISTS package (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            days INTEGER,
+            nights INTEGER NOT NULL,
+            price NUMERIC(10, 2) NOT NULL,
+            gallery TEXT
+        );
+        CREATE TABLE IF NOT EXISTS package_room_type (
+            package_id INTEGER NOT NULL REFERENCES package(id),
+            room_type_id INTEGER NOT NULL REFERENCES room_type(id)
+        );
+        CREATE TABLE IF NOT EXISTS package_activity (
+            package_id INTEGER NOT NULL REFERENCES package(id),
+            activity_id INTEGER NOT NULL REFERENCES activity(id)
+        );
+        CREATE TABLE IF NOT EXISTS package_service (
+            package_id INTEGER NOT NULL REFERENCES package(id),
+            service_id INTEGER NOT NULL REFERENCES service(id)
+        );
+        CREATE TABLE IF NOT EXISTS reservation (
+            id SERIAL PRIMARY KEY,
+            package_id INTEGER REFERENCES package(id),
+            check_in_date DATE NOT NULL,
+            check_out_date DATE NOT NULL,
+            adults INTEGER NOT NULL,
+            children INTEGER NOT NULL DEFAULT 0,
+            amount NUMERIC(12, 2) NOT NULL,
+            customer_name TEXT NOT NULL,
+            customer_email TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS reservation_room (
+            reservation_id INTEGER NOT NULL REFERENCES reservation(id),
+            room_id INTEGER NOT NULL REFERENCES room(id)
+        );
+        CREATE TABLE IF NOT EXISTS reservation_activity (
+            reservation_id INTEGER NOT NULL REFERENCES reservation(id),
+            activity_id INTEGER NOT NULL REFERENCES activity(id)
+        );
+        CREATE TABLE IF NOT EXISTS reservation_service (
+            reservation_id INTEGER NOT NULL REFERENCES reservation(id),
+            service_id INTEGER NOT NULL REFERENCES service(id)
+        );
+    """),
+    (2, "Índices de los caminos calientes", """
+        -- Habitaciones de un tipo (asignación e índice de ocupación)
+        CREATE INDEX IF NOT EXISTS room_type_id_idx ON room (type_id);
+
+        -- Reservas de una habitación: confirmación de disponibilidad al reservar
+        CREATE INDEX IF NOT EXISTS reservation_room_room_id_idx ON reservation_room (room_id, reservation_id);
+        CREATE INDEX IF NOT EXISTS reservation_room_reservation_id_idx ON reservation_room (reservation_id);
+        CREATE INDEX IF NOT EXISTS reservation_activity_reservation_id_idx ON reservation_activity (reservation_id);
+        CREATE INDEX IF NOT EXISTS reservation_activity_activity_id_idx ON reservation_activity (activity_id);
+        CREATE INDEX IF NOT EXISTS reservation_service_reservation_id_idx ON reservation_service (reservation_id);
+        CREATE INDEX IF NOT EXISTS reservation_service_service_id_idx ON reservation_service (service_id);
+
+        -- Estadías por rango de fechas (operador && sobre daterange)
+        CREATE INDEX IF NOT EXISTS reservation_stay_gist ON reservation USING gist (daterange(check_in_date, check_out_date));
+        CREATE INDEX IF NOT EXISTS reservation_package_id_idx ON reservation (package_id);
+
+        -- Tablas de unión de los paquetes, en las dos direcciones
+        CREATE INDEX IF NOT EXISTS package_room_type_package_id_idx ON package_room_type (package_id);
+        CREATE INDEX IF NOT EXISTS package_room_type_room_type_id_idx ON package_room_type (room_type_id);
+        CREATE INDEX IF NOT EXISTS package_activity_package_id_idx ON package_activity (package_id);
+        CREATE INDEX IF NOT EXISTS package_activity_activity_id_idx ON package_activity (activity_id);
+        CREATE INDEX IF NOT EXISTS package_service_package_id_idx ON package_service (package_id);
+        CREATE INDEX IF NOT EXISTS package_service_service_id_idx ON package_service (service_id);
+    """),
+    (3, "Claves de idempotencia de las reservas", """
+        CREATE TABLE IF NOT EXISTS idempotency_key (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            status_code INTEGER,
+            response_body BYTEA,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        CREATE INDEX IF NOT EXISTS idempotency_key_created_at_idx ON idempotency_key (created_at);
+    """),
+    (4, "Tablas de resumen para los reportes", """
+        -- Noches vendidas e ingreso por habitación, por día y tipo de habitación
+        CREATE TABLE IF NOT EXISTS report_occupancy_daily (
+            day DATE NOT NULL,
+            room_type_id INTEGER NOT NULL,
+            rooms_sold INTEGER NOT NULL,
+            room_revenue NUMERIC(14, 2) NOT NULL,
+            PRIMARY KEY (day, room_type_id)
+        );
+        -- Reservas e ingreso por paquete, actividad o servicio, por día de check-in
+        CREATE TABLE IF NOT EXISTS report_revenue_daily (
+            day DATE NOT NULL,
+            kind TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            bookings INTEGER NOT NULL,
+            revenue NUMERIC(14, 2) NOT NULL,
+            PRIMARY KEY (day, kind, item_id)
+        );
+    """),
+    (5, "Cola de reservas pendientes de sumar a los reportes", """
+        -- Cada reserva deja acá su id al confirmarse; reports.apply_pending las
+        -- suma a las tablas de resumen fuera de la transacción de la reserva
+        CREATE TABLE IF NOT EXISTS report_queue (
+            reservation_id INTEGER PRIMARY KEY
+        );
+    """),
+]
+
+
+def current_version(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+    """)
+    cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations;")
+    row = cur.fetchone()
+    return row['version'] if isinstance(row, dict) else row[0]
+
+
+def pending_migrations(version, target=None):
+    return [m for m in MIGRATIONS if m[0] > version and (target is None or m[0] <= target)]
+
+
+def migrate(conn, target=None, log=print):
+    """Aplica las migraciones pendientes, cada una en su propia transacción."""
+    with conn.cursor() as cur:
+        # Un lock de advisory evita que dos procesos migren a la vez
+        cur.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'));")
+        try:
+            version = current_version(cur)
+            conn.commit()
+            for number, description, sql in pending_migrations(version, target):
+                log(f"Aplicando migración {number}: {description}")
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s);", (number, description))
+                conn.commit()
+            return current_version(cur)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'));")
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', type=int, help='versión hasta la que migrar')
+    parser.add_argument('--status', action='store_true', help='solo mostrar el estado')
+    args = parser.parse_args()
+
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    conn = psycopg2.connect(database_url)
+    try:
+        if args.status:
+            with conn.cursor() as cur:
+                version = current_version(cur)
+            conn.commit()
+            print(f"Versión actual: {version}")
+            for number, description, _ in pending_migrations(version, args.target):
+                print(f"Pendiente {number}: {description}")
+            return 0
+        version = migrate(conn, args.target)
+        print(f"Esquema en la versión {version}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
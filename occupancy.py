@@ -0,0 +1,394 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from psycopg2.extensions import cursor as tuple_cursor
+import changes
+from database import pooled_connection
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántos segundos como mucho un request trae de la base las habitaciones
+# y reservas nuevas (las de otros workers); es el atraso máximo del índice
+# respecto de los otros workers (0 lo desactiva)
+OCCUPANCY_SYNC_SECONDS = float(os.getenv("OCCUPANCY_SYNC_SECONDS", "1"))
+# Reservas anteriores a la última vista que se vuelven a leer en cada
+# sincronización: los ids se asignan antes del commit y una reserva con id
+# menor puede confirmarse después que otra con id mayor
+OCCUPANCY_SYNC_LOOKBACK = int(os.getenv("OCCUPANCY_SYNC_LOOKBACK", "200"))
+# Cada cuántos segundos se recarga el índice entero desde la base para
+# corregir desvíos (reservas borradas, o confirmadas fuera de la ventana anterior)
+OCCUPANCY_RECONCILE_SECONDS = float(os.getenv("OCCUPANCY_RECONCILE_SECONDS", "300"))
+
+ROOMS_QUERY = 'SELECT id, type_id FROM room;'
+STAYS_QUERY = """
+    SELECT rr.room_id, re.check_in_date, re.check_out_date, re.id
+    FROM reservation_room rr
+    JOIN reservation re ON re.id = rr.reservation_id;
+"""
+
+# Habitaciones y reservas nuevas desde la última carga o sincronización (por clave primaria)
+SYNC_QUERY = """
+    SELECT 'room' AS kind, id, type_id AS room_id, NULL::date AS check_in_date, NULL::date AS check_out_date
+    FROM room
+    WHERE id > %(room_id)s
+    UNION ALL
+    SELECT 'stay', re.id, rr.room_id, re.check_in_date, re.check_out_date
+    FROM reservation re
+    JOIN reservation_room rr ON rr.reservation_id = re.id
+    -- El límite va en las dos tablas: así las dos se leen por rango de su
+    -- índice y el planificador no recorre reservation_room entera
+    WHERE re.id > %(reservation_id)s AND rr.reservation_id > %(reservation_id)s
+    ORDER BY 1, 2;
+"""
+
+
+def as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # fromisoformat es mucho más rápido que strptime para 'YYYY-MM-DD'
+    return date.fromisoformat(value)
+
+
+def _merge_sorted(stays):
+    """Une los intervalos [checkin, checkout) ordenados que se pisan o se tocan."""
+    starts, ends = [], []
+    for checkin, checkout in stays:
+        if ends and checkin <= ends[-1]:
+            if checkout > ends[-1]:
+                ends[-1] = checkout
+        else:
+            starts.append(checkin)
+            ends.append(checkout)
+    return starts, ends
+
+
+class OccupancyIndex:
+    """
+    Índice en memoria de la ocupación de cada habitación. Por habitación se
+    guardan los intervalos ocupados [checkin, checkout) unidos y ordenados
+    (dos listas paralelas de inicios y fines), así saber si está libre en un
+    rango es una búsqueda binaria y no depende del largo del historial.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms_by_type = {}  # type_id -> [room_id, ...] ordenado
+        self._starts = {}  # room_id -> [date, ...]
+        self._ends = {}  # room_id -> [date, ...]
+        self._pending = None  # estadías agregadas mientras se recarga
+        self.loaded_at = None
+        # Mayores ids de habitación y de reserva leídos de la base
+        self.max_room_id = 0
+        self.max_reservation_id = 0
+        self.synced_at = 0.0  # monotonic de la última sincronización
+        # Aumenta con cada cambio; sirve como parte de la clave de los resultados cacheados
+        self.version = 0
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def load(self, conn):
+        """Reconstruye el índice completo a partir de la base."""
+        with self._lock:
+            self._pending = []
+        try:
+            with conn.cursor() as cur:
+                cur.execute(ROOMS_QUERY)
+                rooms = cur.fetchall()
+            by_room = {}
+            max_reservation_id = 0
+            # Cursor del lado del servidor para no traer todo el historial de una
+            # vez; con tuplas en vez de dicts la carga (y el arranque) es ~3x más rápida
+            with conn.cursor(name='occupancy_index_load', cursor_factory=tuple_cursor) as cur:
+                cur.itersize = 10000
+                cur.execute(STAYS_QUERY)
+                for room_id, checkin, checkout, reservation_id in cur:
+                    by_room.setdefault(room_id, []).append((checkin, checkout))
+                    if reservation_id > max_reservation_id:
+                        max_reservation_id = reservation_id
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        rooms_by_type = {}
+        for row in rooms:
+            rooms_by_type.setdefault(row['type_id'], []).append(row['id'])
+        for room_ids in rooms_by_type.values():
+            room_ids.sort()
+        starts, ends = {}, {}
+        for room_id, stays in by_room.items():
+            stays.sort()
+            starts[room_id], ends[room_id] = _merge_sorted(stays)
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._rooms_by_type = rooms_by_type
+            self._starts = starts
+            self._ends = ends
+            for room_id, checkin, checkout in pending:
+                self._insert(room_id, checkin, checkout)
+            self.max_room_id = max((row['id'] for row in rooms), default=0)
+            self.max_reservation_id = max_reservation_id
+            self.loaded_at = time.time()
+            self.synced_at = time.monotonic()
+            self.version += 1
+
+    def sync(self, conn):
+        """
+        Suma al índice las habitaciones y reservas que se confirmaron desde la
+        última carga, por ejemplo en otros workers. Es una consulta por clave
+        primaria que trae solo lo nuevo (más las últimas
+        OCCUPANCY_SYNC_LOOKBACK reservas, que pueden haberse confirmado tarde).
+        """
+        with self._lock:
+            if self._pending is not None:
+                # Se está recargando todo: la carga ya trae lo nuevo
+                return
+            params = {
+                'room_id': self.max_room_id,
+                'reservation_id': max(self.max_reservation_id - OCCUPANCY_SYNC_LOOKBACK, 0),
+            }
+        with conn.cursor(cursor_factory=tuple_cursor) as cur:
+            cur.execute(SYNC_QUERY, params)
+            rows = cur.fetchall()
+        with self._lock:
+            changed = False
+            for kind, row_id, room_id, checkin, checkout in rows:
+                if kind == 'room':
+                    # room_id es el tipo de la habitación row_id
+                    if row_id > self.max_room_id:
+                        insort(self._rooms_by_type.setdefault(room_id, []), row_id)
+                        self.max_room_id = row_id
+                        changed = True
+                    continue
+                if not self._covers(room_id, checkin, checkout):
+                    self._insert(room_id, checkin, checkout)
+                    changed = True
+                if row_id > self.max_reservation_id:
+                    self.max_reservation_id = row_id
+            self.synced_at = time.monotonic()
+            if changed:
+                self.version += 1
+
+    def sync_rooms(self, conn):
+        """
+        Suma las habitaciones que no tiene, con cualquier id (una importación
+        puede traer ids menores que el último visto, que sync() no ve). Lee
+        solo la tabla room, que es chica: no recarga las reservas.
+        """
+        with conn.cursor(cursor_factory=tuple_cursor) as cur:
+            cur.execute(ROOMS_QUERY)
+            rows = cur.fetchall()
+        with self._lock:
+            known = {room_id for room_ids in self._rooms_by_type.values() for room_id in room_ids}
+            added = 0
+            for room_id, type_id in rows:
+                if room_id not in known:
+                    insort(self._rooms_by_type.setdefault(type_id, []), room_id)
+                    added += 1
+            self.max_room_id = max(self.max_room_id, max((row[0] for row in rows), default=0))
+            if added:
+                self.version += 1
+        return added
+
+    def add_stay(self, room_id, checkin, checkout):
+        """Registra una estadía ya confirmada (después del commit)."""
+        checkin, checkout = as_date(checkin), as_date(checkout)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((room_id, checkin, checkout))
+            self._insert(room_id, checkin, checkout)
+            self.version += 1
+
+    def _insert(self, room_id, checkin, checkout):
+        starts = self._starts.setdefault(room_id, [])
+        ends = self._ends.setdefault(room_id, [])
+        # Intervalos que se pisan o tocan con el nuevo: [lo, hi)
+        lo = bisect_left(ends, checkin)
+        hi = bisect_right(starts, checkout)
+        if lo < hi:
+            checkin = min(checkin, starts[lo])
+            checkout = max(checkout, ends[hi - 1])
+        starts[lo:hi] = [checkin]
+        ends[lo:hi] = [checkout]
+
+    def _covers(self, room_id, checkin, checkout):
+        """Si [checkin, checkout) ya está dentro de un intervalo ocupado de la habitación."""
+        starts = self._starts.get(room_id)
+        if not starts:
+            return False
+        i = bisect_right(starts, checkin) - 1
+        return i >= 0 and self._ends[room_id][i] >= checkout
+
+    def is_free(self, room_id, checkin, checkout):
+        checkin, checkout = as_date(checkin), as_date(checkout)
+        with self._lock:
+            return self._is_free(room_id, checkin, checkout)
+
+    def _is_free(self, room_id, checkin, checkout):
+        starts = self._starts.get(room_id)
+        if not starts:
+            return True
+        # Último intervalo que empieza antes del checkout pedido
+        i = bisect_left(starts, checkout)
+        return i == 0 or self._ends[room_id][i - 1] <= checkin
+
+    def room_ids(self, room_type_id):
+        with self._lock:
+            return list(self._rooms_by_type.get(room_type_id, ()))
+
+    def free_rooms(self, room_type_id, checkin, checkout):
+        """Habitaciones del tipo pedido libres en [checkin, checkout), por id."""
+        checkin, checkout = as_date(checkin), as_date(checkout)
+        with self._lock:
+            return [
+                room_id for room_id in self._rooms_by_type.get(room_type_id, ())
+                if self._is_free(room_id, checkin, checkout)
+            ]
+
+    def free_counts(self, checkin, checkout):
+        """Cantidad de habitaciones libres por tipo (solo tipos con alguna libre)."""
+        checkin, checkout = as_date(checkin), as_date(checkout)
+        counts = {}
+        with self._lock:
+            for type_id, room_ids in self._rooms_by_type.items():
+                free = sum(1 for room_id in room_ids if self._is_free(room_id, checkin, checkout))
+                if free:
+                    counts[type_id] = free
+        return counts
+
+    def daily_free_counts(self, first_day, last_day):
+        """
+        Para cada noche entre first_day y last_day (inclusive) y cada tipo de
+        habitación, cuántas habitaciones están libres. Se resuelve en una sola
+        pasada por habitación con un arreglo de diferencias, sin consultar día
+        por día. Devuelve {type_id: (total_habitaciones, [libres por día])}.
+        """
+        first_day, last_day = as_date(first_day), as_date(last_day)
+        days = (last_day - first_day).days + 1
+        window_end = last_day + timedelta(days=1)
+        result = {}
+        with self._lock:
+            for type_id, room_ids in self._rooms_by_type.items():
+                diff = [0] * (days + 1)
+                for room_id in room_ids:
+                    starts = self._starts.get(room_id)
+                    if not starts:
+                        continue
+                    ends = self._ends[room_id]
+                    # Primer intervalo que termina después del comienzo de la ventana
+                    i = bisect_right(ends, first_day)
+                    while i < len(starts) and starts[i] < window_end:
+                        diff[(max(starts[i], first_day) - first_day).days] += 1
+                        diff[(min(ends[i], window_end) - first_day).days] -= 1
+                        i += 1
+                free, occupied = [], 0
+                for day in range(days):
+                    occupied += diff[day]
+                    free.append(len(room_ids) - occupied)
+                result[type_id] = (len(room_ids), free)
+        return result
+
+
+_index = OccupancyIndex()
+_load_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_reconcile_pid = None
+
+
+def _reconcile_loop():
+    while True:
+        time.sleep(OCCUPANCY_RECONCILE_SECONDS)
+        try:
+            with _load_lock, pooled_connection() as conn:
+                _index.load(conn)
+        except Exception:
+            logger.exception("No se pudo reconciliar el índice de ocupación")
+
+
+def _start_reconcile():
+    global _reconcile_pid
+    # Los threads no sobreviven a un fork: cada worker arranca el suyo
+    if _reconcile_pid != os.getpid() and OCCUPANCY_RECONCILE_SECONDS > 0:
+        _reconcile_pid = os.getpid()
+        threading.Thread(target=_reconcile_loop, name='occupancy-reconcile', daemon=True).start()
+
+
+def _load_index(get_conn=None):
+    if not _index.loaded:
+        with _load_lock:
+            if not _index.loaded:
+                if get_conn is not None:
+                    _index.load(get_conn())
+                else:
+                    with pooled_connection() as conn:
+                        _index.load(conn)
+
+
+def _sync_index(get_conn=None):
+    """Trae lo nuevo de la base si pasaron OCCUPANCY_SYNC_SECONDS; un solo thread a la vez."""
+    if OCCUPANCY_SYNC_SECONDS <= 0 or time.monotonic() - _index.synced_at < OCCUPANCY_SYNC_SECONDS:
+        return
+    # Si otro thread ya está sincronizando, se usa el índice como está
+    if not _sync_lock.acquire(blocking=False):
+        return
+    try:
+        if get_conn is not None:
+            _index.sync(get_conn())
+        else:
+            with pooled_connection() as conn:
+                _index.sync(conn)
+    finally:
+        _sync_lock.release()
+
+
+def get_occupancy_index(get_conn=None):
+    """
+    Devuelve el índice del proceso, cargándolo la primera vez y poniéndolo
+    al día con lo que confirmaron los otros workers. `get_conn` es una
+    función que devuelve la conexión a usar (por ejemplo la del request); si
+    no se pasa se usa una conexión del pool.
+    """
+    _load_index(get_conn)
+    _sync_index(get_conn)
+    _start_reconcile()
+    return _index
+
+
+def refresh_rooms(get_conn=None):
+    """Suma al índice las habitaciones nuevas (por ejemplo después de importarlas) sin recargar las reservas."""
+    if not _index.loaded:
+        # La carga completa ya va a leer todas las habitaciones
+        return 0
+    if get_conn is not None:
+        return _index.sync_rooms(get_conn())
+    with pooled_connection() as conn:
+        return _index.sync_rooms(conn)
+
+
+def _on_catalog_change(data):
+    # Habitaciones importadas en otro worker, quizás con ids menores que el último visto
+    if data.get('tag') == 'room':
+        refresh_rooms()
+
+
+changes.on_change('catalog', _on_catalog_change)
+
+
+def warm_up():
+    """
+    Carga el índice al iniciar la app; si la base no responde se carga en el
+    primer uso. El thread de reconciliación no se arranca acá sino en el
+    primer request, así el master de gunicorn (preload) no corre uno propio.
+    """
+    try:
+        _load_index()
+    except Exception as e:
+        logger.warning("No se pudo precargar el índice de ocupación: %s", e)
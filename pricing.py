@@ -0,0 +1,128 @@
+from datetime import timedelta
+from cache import catalog_cache
+from occupancy import as_date
+
+# Todos los precios del catálogo en una sola consulta
+PRICING_SNAPSHOT_QUERY = """
+    SELECT 'room' AS kind, id, type_id AS ref_id, price_per_night AS price, NULL::int AS nights FROM room
+    UNION ALL
+    SELECT 'activity', id, NULL, price, NULL FROM activity
+    UNION ALL
+    SELECT 'service', id, NULL, price, NULL FROM service
+    UNION ALL
+    SELECT 'package', p.id,
+        (SELECT prt.room_type_id FROM package_room_type prt WHERE prt.package_id = p.id LIMIT 1),
+        p.price, p.nights
+    FROM package p;
+"""
+
+# El snapshot depende de todas estas tablas
+PRICING_TAGS = ('room', 'room_type', 'activity', 'service', 'package')
+
+
+class PricingSnapshot:
+    """Precios del catálogo en memoria para cotizar sin consultar la base."""
+
+    def __init__(self, rows):
+        self.room_type_prices = {}  # type_id -> (mínimo, máximo) por noche
+        self.activities = {}
+        self.services = {}
+        self.packages = {}  # package_id -> (precio, noches, room_type_id)
+        for row in rows:
+            kind = row['kind']
+            if kind == 'room':
+                low, high = self.room_type_prices.get(row['ref_id'], (row['price'], row['price']))
+                self.room_type_prices[row['ref_id']] = (min(low, row['price']), max(high, row['price']))
+            elif kind == 'activity':
+                self.activities[row['id']] = row['price']
+            elif kind == 'service':
+                self.services[row['id']] = row['price']
+            else:
+                self.packages[row['id']] = (row['price'], row['nights'], row['ref_id'])
+
+
+def get_pricing_snapshot(cur):
+    snapshot = catalog_cache.get(('pricing_snapshot',))
+    if snapshot is None:
+        cur.execute(PRICING_SNAPSHOT_QUERY)
+        snapshot = PricingSnapshot(cur.fetchall())
+        catalog_cache.set(('pricing_snapshot',), snapshot, PRICING_TAGS)
+    return snapshot
+
+
+def _parse_date(value, field):
+    try:
+        return as_date(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' inválida, se espera YYYY-MM-DD")
+
+
+def _parse_id(value, label):
+    """El ID como int (acepta enteros y strings numéricos); lanza ValueError con cualquier otro tipo."""
+    # bool es subclase de int, y las listas/dicts no se pueden buscar en los precios
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"ID inválido en {label}: se espera un entero")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"ID inválido en {label}: se espera un entero")
+
+
+def _extras_total(prices, ids, label):
+    if not isinstance(ids, list):
+        raise ValueError(f"Los IDs de {label} deben ser una lista")
+    total = 0
+    # Como en la reserva, cada actividad/servicio se cobra una vez aunque venga repetido
+    for item_id in {_parse_id(item_id, label) for item_id in ids}:
+        price = prices.get(item_id)
+        if price is None:
+            raise ValueError(f"No existe el ID {item_id} en {label}")
+        total += price
+    return total
+
+
+def quote_itinerary(snapshot, itinerary):
+    """
+    Cotiza un itinerario (paquete o reserva personalizada) con los precios
+    del snapshot. Devuelve un dict con el monto, o lanza ValueError.
+    Las habitaciones de un mismo tipo pueden tener distinta tarifa: se
+    devuelve el rango (amount es el mínimo y amount_max el máximo).
+    """
+    if not isinstance(itinerary, dict):
+        raise ValueError("Cada itinerario debe ser un objeto")
+    package_id = itinerary.get('package_id')
+    checkin = _parse_date(itinerary.get('checkin_date'), 'checkin_date')
+    if package_id:
+        package_id = _parse_id(package_id, 'package_id')
+        package = snapshot.packages.get(package_id)
+        if package is None:
+            raise ValueError(f"Paquete con ID {package_id} no encontrado")
+        price, nights, room_type_id = package
+        return {
+            "package_id": package_id,
+            "room_type_id": room_type_id,
+            "checkin_date": checkin.isoformat(),
+            "checkout_date": (checkin + timedelta(days=nights)).isoformat(),
+            "nights": nights,
+            "amount": price,
+            "amount_max": price,
+        }
+
+    room_type_id = _parse_id(itinerary.get('room_type_id'), 'room_type_id')
+    checkout = _parse_date(itinerary.get('checkout_date'), 'checkout_date')
+    nights = (checkout - checkin).days
+    if nights <= 0:
+        raise ValueError("Check-out debe ser posterior a check-in")
+    rate = snapshot.room_type_prices.get(room_type_id)
+    if rate is None:
+        raise ValueError(f"Tipo de habitación con ID {room_type_id} no encontrado")
+    extras = _extras_total(snapshot.activities, itinerary.get('activity_ids', []), 'actividades')
+    extras += _extras_total(snapshot.services, itinerary.get('service_ids', []), 'servicios')
+    return {
+        "room_type_id": room_type_id,
+        "checkin_date": checkin.isoformat(),
+        "checkout_date": checkout.isoformat(),
+        "nights": nights,
+        "amount": nights * rate[0] + extras,
+        "amount_max": nights * rate[1] + extras,
+    }
@@ -0,0 +1,288 @@
+"""
+Tablas de resumen de ocupación e ingresos.
+
+report_occupancy_daily guarda, por día y tipo de habitación, las noches
+vendidas y el ingreso por habitación; report_revenue_daily, por día de
+check-in, las reservas y el ingreso de cada paquete, actividad y servicio.
+Así los reportes no recorren las reservas.
+
+Las reservas no tocan estas tablas: si las actualizaran en su transacción,
+todas las que caen en los mismos días esperarían el lock de las mismas
+filas de resumen. Cada reserva deja su id en report_queue (en el mismo
+INSERT) y un thread de cada worker las suma cada REPORT_APPLY_SECONDS en
+tandas (apply_pending); un advisory lock hace que lo haga un worker por vez.
+Los reportes quedan atrasados como mucho eso más lo que tarde la tanda.
+
+Se pueden reconstruir enteras o para un rango de fechas (rebuild_rollups)
+sin bloquear a quien las lee ni a las reservas.
+
+Uso:
+    python reports.py                                  # reconstruye todo
+    python reports.py --from 2024-01-01 --to 2024-12-31
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from psycopg2.extensions import cursor as tuple_cursor
+from database import DATABASE_URL, pooled_connection, prepared_statement
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre tandas de reservas sumadas a los resúmenes (0 desactiva el thread)
+REPORT_APPLY_SECONDS = float(os.getenv("REPORT_APPLY_SECONDS", "2"))
+# Reservas sumadas por transacción
+REPORT_APPLY_BATCH = int(os.getenv("REPORT_APPLY_BATCH", "1000"))
+
+# Ingreso por habitación de cada noche: la tarifa de la habitación en las
+# reservas personalizadas y el precio del paquete repartido entre sus noches
+# en las de paquete. Las noches se recortan al rango pedido (sin rango, NULL:
+# GREATEST y LEAST ignoran los nulos).
+OCCUPANCY_ROLLUP_SELECT = """
+    SELECT day::date, ro.type_id, count(*),
+        sum(CASE WHEN re.package_id IS NULL THEN ro.price_per_night
+                 ELSE re.amount / (re.check_out_date - re.check_in_date) END)
+    FROM reservation re
+    JOIN reservation_room rr ON rr.reservation_id = re.id
+    JOIN room ro ON ro.id = rr.room_id
+    CROSS JOIN LATERAL generate_series(
+        GREATEST(re.check_in_date, %(first_day)s::date),
+        LEAST(re.check_out_date, %(last_day)s::date + 1) - 1,
+        interval '1 day') AS day
+    WHERE {where}
+    GROUP BY 1, 2
+"""
+
+# El ingreso de un paquete es el de la reserva; las actividades y servicios
+# suman su precio solo en las reservas personalizadas (en las de paquete ya
+# está en el precio del paquete) y, como al cobrar, una vez aunque se repitan
+REVENUE_ROLLUP_SELECT = """
+    SELECT re.check_in_date, 'package', re.package_id, count(*), sum(re.amount)
+    FROM reservation re
+    WHERE {where} AND re.package_id IS NOT NULL AND {check_in}
+    GROUP BY 1, 3
+    UNION ALL
+    SELECT x.check_in_date, 'activity', a.id, count(*), sum(CASE WHEN x.package_id IS NULL THEN a.price ELSE 0 END)
+    FROM (
+        SELECT DISTINCT re.id, re.check_in_date, re.package_id, ra.activity_id
+        FROM reservation re
+        JOIN reservation_activity ra ON ra.reservation_id = re.id
+        WHERE {where} AND {check_in}
+    ) x
+    JOIN activity a ON a.id = x.activity_id
+    GROUP BY 1, 3
+    UNION ALL
+    SELECT x.check_in_date, 'service', s.id, count(*), sum(CASE WHEN x.package_id IS NULL THEN s.price ELSE 0 END)
+    FROM (
+        SELECT DISTINCT re.id, re.check_in_date, re.package_id, rs.service_id
+        FROM reservation re
+        JOIN reservation_service rs ON rs.reservation_id = re.id
+        WHERE {where} AND {check_in}
+    ) x
+    JOIN service s ON s.id = x.service_id
+    GROUP BY 1, 3
+"""
+
+CHECK_IN_IN_RANGE = "re.check_in_date BETWEEN COALESCE(%(first_day)s::date, '-infinity') AND COALESCE(%(last_day)s::date, 'infinity')"
+
+# Las filas se insertan ordenadas por clave para que dos reservas simultáneas
+# tomen los locks de las filas de resumen en el mismo orden
+UPSERT_OCCUPANCY = """
+    INSERT INTO report_occupancy_daily (day, room_type_id, rooms_sold, room_revenue)
+    SELECT * FROM ({select}) AS t ORDER BY 1, 2
+    ON CONFLICT (day, room_type_id) DO UPDATE
+        SET rooms_sold = report_occupancy_daily.rooms_sold + EXCLUDED.rooms_sold,
+            room_revenue = report_occupancy_daily.room_revenue + EXCLUDED.room_revenue;
+"""
+
+UPSERT_REVENUE = """
+    INSERT INTO report_revenue_daily (day, kind, item_id, bookings, revenue)
+    SELECT * FROM ({select}) AS t ORDER BY 1, 2, 3
+    ON CONFLICT (day, kind, item_id) DO UPDATE
+        SET bookings = report_revenue_daily.bookings + EXCLUDED.bookings,
+            revenue = report_revenue_daily.revenue + EXCLUDED.revenue;
+"""
+
+# Solo las reservas recién insertadas (por clave primaria)
+NEW_RESERVATIONS = "re.id = ANY(%(ids)s)"
+# Estadías que tocan el rango; usa el índice GiST sobre daterange(check_in_date, check_out_date)
+STAYS_IN_RANGE = "daterange(re.check_in_date, re.check_out_date) && daterange(%(first_day)s::date, %(last_day)s::date, '[]')"
+
+UPDATE_OCCUPANCY_QUERY = UPSERT_OCCUPANCY.format(select=OCCUPANCY_ROLLUP_SELECT.format(where=NEW_RESERVATIONS))
+UPDATE_REVENUE_QUERY = UPSERT_REVENUE.format(select=REVENUE_ROLLUP_SELECT.format(where=NEW_RESERVATIONS, check_in="TRUE"))
+REBUILD_OCCUPANCY_QUERY = UPSERT_OCCUPANCY.format(select=OCCUPANCY_ROLLUP_SELECT.format(where=STAYS_IN_RANGE))
+REBUILD_REVENUE_QUERY = UPSERT_REVENUE.format(select=REVENUE_ROLLUP_SELECT.format(where=STAYS_IN_RANGE, check_in=CHECK_IN_IN_RANGE))
+
+# Solo una sesión por vez escribe en las tablas de resumen (la tanda de
+# apply_pending o la reconstrucción) y solo una reconstruye
+ROLLUPS_LOCK_KEY = "hashtext('report_rollups')"
+REBUILD_LOCK_KEY = "hashtext('report_rebuild')"
+TRY_LOCK_ROLLUPS_QUERY = f"SELECT pg_try_advisory_xact_lock({ROLLUPS_LOCK_KEY});"
+LOCK_ROLLUPS_QUERY = f"SELECT pg_advisory_lock({ROLLUPS_LOCK_KEY});"
+UNLOCK_ROLLUPS_QUERY = f"SELECT pg_advisory_unlock({ROLLUPS_LOCK_KEY});"
+TRY_LOCK_REBUILD_QUERY = f"SELECT pg_try_advisory_lock({REBUILD_LOCK_KEY});"
+UNLOCK_REBUILD_QUERY = f"SELECT pg_advisory_unlock({REBUILD_LOCK_KEY});"
+
+# Saca de la cola las reservas pendientes más viejas (sin límite, todas)
+DEQUEUE_QUERY = """
+    DELETE FROM report_queue
+    WHERE reservation_id IN (
+        SELECT reservation_id FROM report_queue ORDER BY reservation_id LIMIT %s
+    )
+    RETURNING reservation_id;
+"""
+
+DELETE_OCCUPANCY_QUERY = """
+    DELETE FROM report_occupancy_daily
+    WHERE day BETWEEN COALESCE(%(first_day)s::date, '-infinity') AND COALESCE(%(last_day)s::date, 'infinity');
+"""
+DELETE_REVENUE_QUERY = """
+    DELETE FROM report_revenue_daily
+    WHERE day BETWEEN COALESCE(%(first_day)s::date, '-infinity') AND COALESCE(%(last_day)s::date, 'infinity');
+"""
+
+
+UPDATE_OCCUPANCY = prepared_statement('update_occupancy_rollup', UPDATE_OCCUPANCY_QUERY)
+UPDATE_REVENUE = prepared_statement('update_revenue_rollup', UPDATE_REVENUE_QUERY)
+
+
+class RebuildInProgress(Exception):
+    """Ya hay otra reconstrucción de los resúmenes en curso."""
+
+
+def update_rollups(cur, reservation_ids):
+    """Suma las reservas indicadas a las tablas de resumen (una sola vez cada una)."""
+    params = {'ids': list(reservation_ids), 'first_day': None, 'last_day': None}
+    UPDATE_OCCUPANCY.execute(cur, params)
+    UPDATE_REVENUE.execute(cur, params)
+
+
+def _apply_queue(cur, limit=None):
+    """Saca reservas de la cola y las suma a los resúmenes; devuelve cuántas."""
+    cur.execute(DEQUEUE_QUERY, (limit,))
+    ids = [row[0] for row in cur.fetchall()]
+    if ids:
+        update_rollups(cur, ids)
+    return len(ids)
+
+
+def apply_pending(conn, batch=REPORT_APPLY_BATCH):
+    """
+    Suma a los resúmenes las reservas de la cola, en transacciones de hasta
+    `batch` reservas. Si otro proceso las está sumando (o reconstruyendo)
+    no hace nada. Devuelve cuántas sumó.
+    """
+    applied = 0
+    while True:
+        with conn.cursor(cursor_factory=tuple_cursor) as cur:
+            cur.execute(TRY_LOCK_ROLLUPS_QUERY)
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return applied
+            count = _apply_queue(cur, batch)
+        conn.commit()
+        applied += count
+        if count < batch:
+            return applied
+
+
+def rebuild_rollups(conn, first_day=None, last_day=None):
+    """
+    Recalcula las tablas de resumen para los días entre first_day y last_day
+    (inclusive; sin fechas, todo) y confirma. Devuelve las filas escritas en
+    cada tabla. Lanza RebuildInProgress si ya hay otra en curso.
+
+    No bloquea las tablas: quien lee los reportes ve los resúmenes viejos
+    hasta que se confirma. Trabaja sobre una foto (REPEATABLE READ) en la que
+    saca de la cola lo pendiente: las reservas de la foto se cuentan una
+    vez, y las que se confirman después quedan en la cola para la próxima
+    tanda de apply_pending, que espera a que termine.
+    """
+    params = {'first_day': first_day, 'last_day': last_day}
+    with conn.cursor(cursor_factory=tuple_cursor) as cur:
+        cur.execute(TRY_LOCK_REBUILD_QUERY)
+        if not cur.fetchone()[0]:
+            conn.rollback()
+            raise RebuildInProgress("Ya hay una reconstrucción de los reportes en curso")
+        try:
+            # Espera la tanda que se esté sumando; la foto se toma recién después
+            cur.execute(LOCK_ROLLUPS_QUERY)
+            conn.commit()
+            try:
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ;")
+                _apply_queue(cur)
+                cur.execute(DELETE_OCCUPANCY_QUERY, params)
+                cur.execute(DELETE_REVENUE_QUERY, params)
+                cur.execute(REBUILD_OCCUPANCY_QUERY, params)
+                occupancy_rows = cur.rowcount
+                cur.execute(REBUILD_REVENUE_QUERY, params)
+                revenue_rows = cur.rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cur.execute(UNLOCK_ROLLUPS_QUERY)
+        finally:
+            cur.execute(UNLOCK_REBUILD_QUERY)
+            conn.commit()
+    return {"occupancy_rows": occupancy_rows, "revenue_rows": revenue_rows}
+
+
+_applier_pid = None
+
+
+def _apply_loop():
+    while True:
+        time.sleep(REPORT_APPLY_SECONDS)
+        try:
+            with pooled_connection() as conn:
+                apply_pending(conn)
+        except Exception:
+            logger.exception("No se pudieron sumar las reservas nuevas a los reportes")
+
+
+def start_applier():
+    """Arranca el thread que suma la cola a los resúmenes (uno por proceso: los threads no sobreviven al fork)."""
+    global _applier_pid
+    if _applier_pid != os.getpid() and REPORT_APPLY_SECONDS > 0 and DATABASE_URL:
+        _applier_pid = os.getpid()
+        threading.Thread(target=_apply_loop, name='report-applier', daemon=True).start()
+
+
+def init_app(app):
+    # En el primer request de cada worker, no en el master de gunicorn (preload)
+    app.before_request(start_applier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='first_day', help='primer día a reconstruir (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='last_day', help='último día a reconstruir (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    import psycopg2
+    from dotenv import load_dotenv
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("No se encontró DATABASE_URL")
+        return 1
+    conn = psycopg2.connect(database_url)
+    try:
+        started = time.perf_counter()
+        result = rebuild_rollups(conn, args.first_day, args.last_day)
+    except RebuildInProgress as e:
+        print(e)
+        return 1
+    finally:
+        conn.close()
+    print(f"Resúmenes reconstruidos en {time.perf_counter() - started:.1f}s: "
+          f"{result['occupancy_rows']} filas de ocupación, {result['revenue_rows']} de ingresos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,41 +1,99 @@
+import os
+from datetime import timedelta
 from flask import Blueprint, jsonify, request
-from database import get_db_connection
+from database import get_db_connection, prepared_statement
+from cache import cached_response
+from occupancy import get_occupancy_index, as_date
 from psycopg2 import Error as Psycopg2Error
 
 availability_bp = Blueprint('availability_bp', __name__)
 
+# Máximo de días que se pueden pedir en /availability/calendar
+CALENDAR_MAX_DAYS = int(os.getenv("CALENDAR_MAX_DAYS", "366"))
+
+# Tipos de habitación con lugar libre (el conteo sale del índice de ocupación)
+AVAILABLE_ROOM_TYPES = prepared_statement('available_room_types', 'SELECT * FROM room_type WHERE id = ANY(%s::int[]) ORDER BY id;')
+
+
+def read_connection():
+    # La disponibilidad es de solo lectura: puede salir de una réplica
+    return get_db_connection(readonly=True)
+
 @availability_bp.route('/availability', methods=['GET'])
 def get_availability():
     checkin = request.args.get('checkin')
     checkout = request.args.get('checkout')
     if not checkin or not checkout:
         return jsonify({"status":"error","message":"Faltan parámetros 'checkin' o 'checkout'"}), 418
-    conn = None
+    try:
+        checkin = as_date(checkin)
+        checkout = as_date(checkout)
+    except ValueError:
+        return jsonify({"status":"error","message":"Formato de fecha inválido, se espera YYYY-MM-DD"}), 400
     data = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            query = """
-                SELECT rt.*
-                FROM room_type rt
-                INNER JOIN room rm
-                ON rt.id = rm.type_id
-                WHERE rm.id NOT IN (
-                    SELECT rr.room_id
-                    FROM reservation_room rr
-                    JOIN reservation re ON re.id = rr.reservation_id
-                    WHERE re.check_in_date < %s
-                    AND re.check_out_date > %s
-                )
-                GROUP BY rt.id;
-            """
-            cur.execute(query, (checkout, checkin))
-            data = cur.fetchall()
+        # La ocupación se resuelve con el índice en memoria, sin recorrer las reservas
+        free_counts = get_occupancy_index(read_connection).free_counts(checkin, checkout)
+        if free_counts:
+            with read_connection().cursor() as cur:
+                AVAILABLE_ROOM_TYPES.execute(cur, (list(free_counts),))
+                data = cur.fetchall()
+            for room_type in data:
+                room_type['free_rooms'] = free_counts[room_type['id']]
     except Psycopg2Error as db_err:
         return jsonify({"status":"error","message":"Error DB al obtener disponibilidad","error_details": str(db_err)}), 500
-    finally:
-        if conn:
-            conn.close()
     if not data:
         return jsonify({"status":"error","message":"No hay habitaciones disponibles","data": []}), 404
     return jsonify({"status":"success","message":"Disponibilidad obtenida","data": data}), 200
+
+
+@availability_bp.route('/availability/calendar', methods=['GET'])
+def get_availability_calendar():
+    first_day = request.args.get('from')
+    last_day = request.args.get('to')
+    if not first_day or not last_day:
+        return jsonify({"status":"error","message":"Faltan parámetros 'from' o 'to'"}), 418
+    try:
+        first_day = as_date(first_day)
+        last_day = as_date(last_day)
+    except ValueError:
+        return jsonify({"status":"error","message":"Formato de fecha inválido, se espera YYYY-MM-DD"}), 400
+    days = (last_day - first_day).days + 1
+    if days < 1 or days > CALENDAR_MAX_DAYS:
+        return jsonify({"status":"error","message":f"El rango debe tener entre 1 y {CALENDAR_MAX_DAYS} días"}), 400
+    try:
+        index = get_occupancy_index(read_connection)
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al obtener disponibilidad","error_details": str(db_err)}), 500
+    # La versión del índice es parte de la clave: una reserva nueva deja viejas las ventanas cacheadas
+    key = ('availability_calendar', first_day, last_day, index.version)
+    return cached_response(key, lambda: _calendar_payload(index, first_day, last_day), tags=('room_type', 'room'))
+
+
+def _calendar_payload(index, first_day, last_day):
+    try:
+        conn = read_connection()
+        with conn.cursor() as cur:
+            cur.execute('SELECT id, name FROM room_type ORDER BY id;')
+            room_types = cur.fetchall()
+    except Psycopg2Error as db_err:
+        return {"status":"error","message":"Error DB al obtener disponibilidad","error_details": str(db_err)}, 500
+    counts = index.daily_free_counts(first_day, last_day)
+    room_types = [rt for rt in room_types if rt['id'] in counts]
+    if not room_types:
+        return {"status":"error","message":"No hay habitaciones cargadas","data": []}, 404
+    data = []
+    for offset in range((last_day - first_day).days + 1):
+        data.append({
+            "date": (first_day + timedelta(days=offset)).isoformat(),
+            "room_types": [
+                {
+                    "room_type_id": rt['id'],
+                    "name": rt['name'],
+                    "free_rooms": counts[rt['id']][1][offset],
+                    "total_rooms": counts[rt['id']][0],
+                }
+                for rt in room_types
+            ],
+        })
+    return {"status":"success","message":"Calendario de disponibilidad obtenido","data": data}, 200
@@ -1,15 +1,21 @@
-import os
-from flask import Blueprint, send_from_directory, redirect
+from flask import Blueprint, jsonify, redirect
+from static_assets import asset_response, get_asset
 
 docs_bp = Blueprint('docs_bp', __name__)
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-SWAGGER_UI_DIR = os.path.join(BASE_DIR, "swagger-ui")
+SPEC_FILES = ("swagger.yaml", "swagger.json")
+
+
+def serve_asset(name):
+    asset = get_asset(name)
+    if asset is None:
+        return jsonify({"status":"error","message":"Archivo no encontrado"}), 404
+    return asset_response(asset)
 
 
 @docs_bp.route("/docs/")
 def swagger_ui():
-    return send_from_directory(SWAGGER_UI_DIR, "index.html")
+    return serve_asset("index.html")
 
 
 @docs_bp.route("/docs")
@@ -20,9 +26,18 @@ def swagger_ui_no_slash():
 
 @docs_bp.route("/docs/<path:filename>")
 def swagger_static(filename):
-    return send_from_directory(SWAGGER_UI_DIR, filename)
+    # Solo se sirven los archivos cargados en memoria (sin acceso a otros del disco);
+    # la spec tiene sus propias rutas
+    if filename in SPEC_FILES:
+        filename = None
+    return serve_asset(filename)
 
 
 @docs_bp.route("/swagger.yaml")
 def swagger_spec():
-    return send_from_directory(BASE_DIR, "swagger.yaml")
\ No newline at end of file
+    return serve_asset("swagger.yaml")
+
+
+@docs_bp.route("/swagger.json")
+def swagger_spec_json():
+    return serve_asset("swagger.json")
@@ -1,12 +1,12 @@
 from flask import Blueprint, jsonify
-from database import get_db_connection
+from database import get_db_connection, get_pool_stats, get_replica_stats
 from psycopg2 import Error as Psycopg2Error
+import lifecycle
 
 home_bp = Blueprint('home_bp', __name__)
 
 @home_bp.route('/')
 def index():
-    conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
@@ -15,7 +15,33 @@ def index():
         return jsonify({"status":"error","message":"Error DB al verificar conexión","error_details": str(db_err)}), 500
     except Exception as e:
         return jsonify({"status":"error","message":"Error inesperado al verificar conexión","error_details": str(e)}), 500
-    finally:
-        if conn:
-            conn.close()
     return jsonify({"status": "success", "message": "Back funcionando y conectado a la BDD"}), 200
+
+
+@home_bp.route('/db_pool')
+def db_pool_stats():
+    stats = get_pool_stats()
+    if stats is None:
+        return jsonify({"status":"error","message":"El pool de conexiones todavía no se inicializó en este worker"}), 404
+    replicas = get_replica_stats()
+    if replicas:
+        stats = dict(stats, replicas=replicas)
+    return jsonify({"status": "success", "message": "Estadísticas del pool de conexiones", "data": stats}), 200
+
+
+@home_bp.route('/live')
+def live():
+    # Liveness: el proceso responde. No toca la base
+    return jsonify({"status": "success", "message": "Proceso vivo"}), 200
+
+
+@home_bp.route('/ready')
+def ready():
+    # Readiness: no toca la base; deja de estar listo al recibir SIGTERM
+    if lifecycle.is_draining():
+        return jsonify({"status":"error","message":"Worker drenando, no enviar tráfico"}), 503
+    return jsonify({
+        "status": "success",
+        "message": "Listo para recibir tráfico",
+        "data": {"uptime_seconds": round(lifecycle.uptime(), 3)},
+    }), 200
@@ -0,0 +1,48 @@
+import io
+from flask import Blueprint, jsonify, request
+from database import get_db_connection, stick_to_primary
+from cache import catalog_cache, publish_invalidation
+from catalog_import import FORMATS, ImportFormatError, import_catalog
+from psycopg2 import Error as Psycopg2Error
+import occupancy
+
+imports_bp = Blueprint('imports_bp', __name__)
+
+# Content-Type -> formato, cuando no se indica ?format=
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+@imports_bp.route('/import/<table>', methods=['POST'])
+def import_table(table):
+    fmt = request.args.get('format') or CONTENT_TYPES.get(request.mimetype)
+    if fmt not in FORMATS:
+        return jsonify({"status":"error","message":"Indicar el formato con ?format=csv|ndjson o el Content-Type (text/csv, application/x-ndjson)"}), 415
+    skip_invalid = request.args.get('skip_invalid') == '1'
+    # El cuerpo se lee de a bloques a medida que COPY pide filas
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    conn = get_db_connection()
+    try:
+        # El aviso a los otros workers se confirma junto con las filas
+        result = import_catalog(conn, table, stream, fmt, skip_invalid,
+                                before_commit=lambda cur: publish_invalidation(cur, table))
+    except ImportFormatError as fe:
+        return jsonify({"status":"error","message": str(fe)}), 400
+    except UnicodeDecodeError:
+        return jsonify({"status":"error","message":"El archivo tiene que estar en UTF-8"}), 400
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":f"Error DB al importar {table}","error_details": str(db_err)}), 500
+
+    if not result["committed"]:
+        return jsonify({"status":"error","message":"Hay filas inválidas, no se importó ninguna","data": result}), 422
+    catalog_cache.invalidate(table)
+    if table == 'room':
+        # Las habitaciones nuevas tienen que aparecer en la disponibilidad: se
+        # suman al índice sin recargar las reservas (los otros workers lo
+        # hacen al recibir el aviso)
+        occupancy.refresh_rooms(get_db_connection)
+    stick_to_primary(worker=True)
+    return jsonify({"status": "success", "message": f"{result['inserted']} filas importadas", "data": result}), 201
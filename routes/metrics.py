@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from instrumentation import metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+
+@metrics_bp.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -1,59 +1,92 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from database import get_db_connection
+from cache import cached_response
+from listing import list_table, page_args, with_page_info
 
 packages_bp = Blueprint('packages_bp', __name__)
 
+# Los paquetes completos dependen de estas tablas: si cambia alguna se invalidan
+PACKAGE_TAGS = ('package', 'room_type', 'activity', 'service')
+
+
+def load_packages(cur, package_ids=None):
+    """
+    Arma los paquetes con su tipo de habitación, actividades y servicios con
+    4 consultas fijas (no una por paquete). Si package_ids es None trae todos.
+    """
+    where = '' if package_ids is None else 'WHERE {} = ANY(%s)'
+    params = () if package_ids is None else (list(package_ids),)
+
+    cur.execute(f'SELECT * FROM package {where.format("id")} ORDER BY id;', params)
+    packages = cur.fetchall()
+    by_id = {}
+    for package in packages:
+        package['room_type'] = None
+        package['activities'] = []
+        package['services'] = []
+        by_id[package['id']] = package
+    if not packages:
+        return packages
+
+    # Un tipo de habitación por paquete (el primero, como antes con LIMIT 1)
+    cur.execute(
+        f'SELECT DISTINCT ON (prt.package_id) prt.package_id, rt.id, rt.name, rt.description, rt.gallery FROM room_type rt JOIN package_room_type prt ON rt.id = prt.room_type_id {where.format("prt.package_id")} ORDER BY prt.package_id;',
+        params
+    )
+    for row in cur.fetchall():
+        by_id[row.pop('package_id')]['room_type'] = row
+
+    cur.execute(
+        f'SELECT pa.package_id, a.id, a.name, a.description, a.price, a.gallery, a.schedule FROM activity a JOIN package_activity pa ON a.id = pa.activity_id {where.format("pa.package_id")} ORDER BY pa.package_id, a.id;',
+        params
+    )
+    for row in cur.fetchall():
+        by_id[row.pop('package_id')]['activities'].append(row)
+
+    cur.execute(
+        f'SELECT ps.package_id, s.id, s.name, s.description, s.price, s.gallery FROM service s JOIN package_service ps ON s.id = ps.service_id {where.format("ps.package_id")} ORDER BY ps.package_id, s.id;',
+        params
+    )
+    for row in cur.fetchall():
+        by_id[row.pop('package_id')]['services'].append(row)
+    return packages
+
+
 @packages_bp.route('/package', methods=['GET'])
 def get_packages():
-    conn = None
-    data = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute('SELECT * FROM package ORDER BY id;')
-            data = cur.fetchall()
-    finally:
-        if conn:
-            conn.close()
+    # ?expand=full devuelve cada paquete con su tipo de habitación, actividades y servicios
+    if request.args.get('expand') == 'full':
+        try:
+            page = page_args()
+        except ValueError as ve:
+            return jsonify({"status":"error","message": str(ve)}), 400
+        key = ('package', 'full') + page if page[0] else ('package', 'full')
+        return cached_response(key, lambda: _packages_full_payload(page), tags=PACKAGE_TAGS)
+    return list_table('package', "Datos de packs obtenidos", "Tabla 'package' vacía o no existe", "Error DB al obtener packages")
+
+
+def _packages_full_payload(page):
+    conn = get_db_connection(readonly=True)
+    with conn.cursor() as cur:
+        package_ids = None
+        if page[0] is not None:
+            cur.execute('SELECT id FROM package WHERE id > %s ORDER BY id LIMIT %s;', (page[1], page[0]))
+            package_ids = [row['id'] for row in cur.fetchall()]
+        data = load_packages(cur, package_ids)
     if not data:
-        return jsonify({"status":"error","message":"Tabla 'package' vacía o no existe"}), 404
-    return jsonify({"status":"success","message":"Datos de packs obtenidos","data": data}), 200
+        return {"status":"error","message":"Tabla 'package' vacía o no existe"}, 404
+    return with_page_info({"status":"success","message":"Datos de packs obtenidos","data": data}, data, page), 200
+
 
 @packages_bp.route('/package/<int:package_id>', methods=['GET'])
 def get_package_by_id(package_id):
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            # 1. Obtener datos base del paquete
-            cur.execute('SELECT * FROM package WHERE id = %s;', (package_id,))
-            package_data = cur.fetchone()
-            if not package_data:
-                return jsonify({"status": "error", "message": "Paquete no encontrado"}), 404
-
-            # 2. Obtener tipo de habitación (asumiendo uno por paquete)
-            cur.execute(
-                'SELECT rt.id, rt.name, rt.description, rt.gallery FROM room_type rt JOIN package_room_type prt ON rt.id = prt.room_type_id WHERE prt.package_id = %s LIMIT 1;',
-                (package_id,)
-            )
-            room_type_data = cur.fetchone()
-            package_data['room_type'] = room_type_data
-
-            # 3. Obtener actividades
-            cur.execute(
-                'SELECT a.id, a.name, a.description, a.price, a.gallery, a.schedule FROM activity a JOIN package_activity pa ON a.id = pa.activity_id WHERE pa.package_id = %s;',
-                (package_id,)
-            )
-            package_data['activities'] = cur.fetchall()
-
-            # 4. Obtener servicios
-            cur.execute(
-                'SELECT s.id, s.name, s.description, s.price, s.gallery FROM service s JOIN package_service ps ON s.id = ps.service_id WHERE ps.package_id = %s;',
-                (package_id,)
-            )
-            package_data['services'] = cur.fetchall()
-
-            return jsonify({"status": "success", "data": package_data}), 200
-    finally:
-        if conn:
-            conn.close()
+    return cached_response(('package', package_id), lambda: _package_payload(package_id), tags=PACKAGE_TAGS)
+
+
+def _package_payload(package_id):
+    conn = get_db_connection(readonly=True)
+    with conn.cursor() as cur:
+        packages = load_packages(cur, [package_id])
+    if not packages:
+        return {"status": "error", "message": "Paquete no encontrado"}, 404
+    return {"status": "success", "data": packages[0]}, 200
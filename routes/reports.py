@@ -0,0 +1,237 @@
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from flask import Blueprint, jsonify, request
+from database import get_db_connection
+from occupancy import as_date
+from reports import RebuildInProgress, rebuild_rollups
+from admin import require_admin
+from psycopg2 import Error as Psycopg2Error
+
+reports_bp = Blueprint('reports_bp', __name__)
+
+# Máximo de días que se pueden pedir en un reporte
+REPORT_MAX_DAYS = int(os.getenv("REPORT_MAX_DAYS", "1096"))
+
+REVENUE_KINDS = ('package', 'activity', 'service')
+
+# Habitaciones de cada tipo según el inventario actual (denominador de la ocupación)
+ROOM_TYPES_QUERY = """
+    SELECT rt.id, rt.name, count(ro.id) AS total_rooms
+    FROM room_type rt
+    JOIN room ro ON ro.type_id = rt.id
+    WHERE %(room_type_id)s::int IS NULL OR rt.id = %(room_type_id)s::int
+    GROUP BY rt.id, rt.name
+    ORDER BY rt.id;
+"""
+
+OCCUPANCY_QUERY = """
+    SELECT day, room_type_id, rooms_sold, room_revenue
+    FROM report_occupancy_daily
+    WHERE day BETWEEN %(first_day)s AND %(last_day)s
+    AND (%(room_type_id)s::int IS NULL OR room_type_id = %(room_type_id)s::int);
+"""
+
+TOTALS_QUERY = """
+    SELECT room_type_id, sum(rooms_sold) AS rooms_sold, sum(room_revenue) AS room_revenue
+    FROM report_occupancy_daily
+    WHERE day BETWEEN %(first_day)s AND %(last_day)s
+    GROUP BY room_type_id;
+"""
+
+REVENUE_QUERY = """
+    SELECT r.kind, r.item_id, COALESCE(p.name, a.name, s.name) AS name,
+        sum(r.bookings) AS bookings, sum(r.revenue) AS revenue
+    FROM report_revenue_daily r
+    LEFT JOIN package p ON r.kind = 'package' AND p.id = r.item_id
+    LEFT JOIN activity a ON r.kind = 'activity' AND a.id = r.item_id
+    LEFT JOIN service s ON r.kind = 'service' AND s.id = r.item_id
+    WHERE r.day BETWEEN %(first_day)s AND %(last_day)s
+    AND (%(kind)s::text IS NULL OR r.kind = %(kind)s::text)
+    GROUP BY r.kind, r.item_id, p.name, a.name, s.name
+    ORDER BY r.kind, revenue DESC, r.item_id;
+"""
+
+CENTS = Decimal('0.01')
+
+
+def date_range_args():
+    """Lee ?from= y ?to= (inclusive). Lanza ValueError si faltan o son inválidos."""
+    first_day = request.args.get('from')
+    last_day = request.args.get('to')
+    if not first_day or not last_day:
+        raise ValueError("Faltan parámetros 'from' o 'to'")
+    try:
+        first_day = as_date(first_day)
+        last_day = as_date(last_day)
+    except ValueError:
+        raise ValueError("Formato de fecha inválido, se espera YYYY-MM-DD")
+    days = (last_day - first_day).days + 1
+    if days < 1 or days > REPORT_MAX_DAYS:
+        raise ValueError(f"El rango debe tener entre 1 y {REPORT_MAX_DAYS} días")
+    return first_day, last_day
+
+
+def room_type_arg():
+    """Lee ?room_type_id= opcional. Lanza ValueError si no es un entero."""
+    room_type_id = request.args.get('room_type_id')
+    if room_type_id is None:
+        return None
+    try:
+        return int(room_type_id)
+    except ValueError:
+        raise ValueError("El parámetro 'room_type_id' debe ser un entero")
+
+
+def ratio(numerator, denominator):
+    if not denominator:
+        return None
+    return (Decimal(numerator) / Decimal(denominator)).quantize(CENTS)
+
+
+@reports_bp.route('/reports/occupancy', methods=['GET'])
+def get_occupancy_report():
+    """Noches vendidas, ocupación e ingreso por habitación, por día y tipo de habitación."""
+    try:
+        first_day, last_day = date_range_args()
+        room_type_id = room_type_arg()
+    except ValueError as ve:
+        return jsonify({"status":"error","message": str(ve)}), 400
+    params = {'first_day': first_day, 'last_day': last_day, 'room_type_id': room_type_id}
+    try:
+        # Los reportes son de solo lectura: pueden salir de una réplica
+        with get_db_connection(readonly=True).cursor() as cur:
+            cur.execute(ROOM_TYPES_QUERY, params)
+            room_types = cur.fetchall()
+            cur.execute(OCCUPANCY_QUERY, params)
+            sold = {(row['day'], row['room_type_id']): row for row in cur.fetchall()}
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al obtener el reporte de ocupación","error_details": str(db_err)}), 500
+    if not room_types:
+        return jsonify({"status":"error","message":"No hay habitaciones cargadas","data": []}), 404
+    data = []
+    for offset in range((last_day - first_day).days + 1):
+        day = first_day + timedelta(days=offset)
+        entries = []
+        for rt in room_types:
+            row = sold.get((day, rt['id']))
+            rooms_sold = row['rooms_sold'] if row else 0
+            entries.append({
+                "room_type_id": rt['id'],
+                "name": rt['name'],
+                "rooms_sold": rooms_sold,
+                "total_rooms": rt['total_rooms'],
+                "occupancy": round(rooms_sold / rt['total_rooms'], 4),
+                "room_revenue": row['room_revenue'] if row else Decimal('0.00'),
+            })
+        data.append({"date": day.isoformat(), "room_types": entries})
+    return jsonify({"status":"success","message":"Reporte de ocupación obtenido","data": data}), 200
+
+
+@reports_bp.route('/reports/revenue', methods=['GET'])
+def get_revenue_report():
+    """Reservas e ingreso de cada paquete, actividad y servicio con check-in en el rango."""
+    try:
+        first_day, last_day = date_range_args()
+    except ValueError as ve:
+        return jsonify({"status":"error","message": str(ve)}), 400
+    kind = request.args.get('kind')
+    if kind is not None and kind not in REVENUE_KINDS:
+        return jsonify({"status":"error","message":f"'kind' debe ser {', '.join(REVENUE_KINDS)}"}), 400
+    try:
+        with get_db_connection(readonly=True).cursor() as cur:
+            cur.execute(REVENUE_QUERY, {'first_day': first_day, 'last_day': last_day, 'kind': kind})
+            rows = cur.fetchall()
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al obtener el reporte de ingresos","error_details": str(db_err)}), 500
+    data = {k: [] for k in REVENUE_KINDS if kind in (None, k)}
+    for row in rows:
+        data[row['kind']].append({
+            "id": row['item_id'],
+            "name": row['name'],
+            "bookings": row['bookings'],
+            "revenue": row['revenue'],
+        })
+    return jsonify({"status":"success","message":"Reporte de ingresos obtenido","data": data}), 200
+
+
+@reports_bp.route('/reports/kpis', methods=['GET'])
+def get_kpis_report():
+    """
+    Ocupación, ADR (ingreso por habitación vendida) y RevPAR (ingreso por
+    habitación disponible) del rango, por tipo de habitación y en total.
+    """
+    try:
+        first_day, last_day = date_range_args()
+    except ValueError as ve:
+        return jsonify({"status":"error","message": str(ve)}), 400
+    days = (last_day - first_day).days + 1
+    params = {'first_day': first_day, 'last_day': last_day, 'room_type_id': None}
+    try:
+        with get_db_connection(readonly=True).cursor() as cur:
+            cur.execute(ROOM_TYPES_QUERY, params)
+            room_types = cur.fetchall()
+            cur.execute(TOTALS_QUERY, params)
+            totals = {row['room_type_id']: row for row in cur.fetchall()}
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al obtener los indicadores","error_details": str(db_err)}), 500
+    if not room_types:
+        return jsonify({"status":"error","message":"No hay habitaciones cargadas","data": {}}), 404
+
+    def kpis(rooms_sold, room_revenue, rooms_available):
+        return {
+            "rooms_sold": rooms_sold,
+            "rooms_available": rooms_available,
+            "occupancy": round(rooms_sold / rooms_available, 4),
+            "room_revenue": room_revenue,
+            "adr": ratio(room_revenue, rooms_sold),
+            "revpar": ratio(room_revenue, rooms_available),
+        }
+
+    per_type = []
+    all_sold, all_revenue, all_available = 0, Decimal('0.00'), 0
+    for rt in room_types:
+        row = totals.get(rt['id'])
+        rooms_sold = int(row['rooms_sold']) if row else 0
+        room_revenue = row['room_revenue'] if row else Decimal('0.00')
+        rooms_available = rt['total_rooms'] * days
+        per_type.append(dict(kpis(rooms_sold, room_revenue, rooms_available), room_type_id=rt['id'], name=rt['name']))
+        all_sold += rooms_sold
+        all_revenue += room_revenue
+        all_available += rooms_available
+    return jsonify({
+        "status": "success",
+        "message": "Indicadores obtenidos",
+        "data": {
+            "from": first_day.isoformat(),
+            "to": last_day.isoformat(),
+            "total": kpis(all_sold, all_revenue, all_available),
+            "room_types": per_type,
+        },
+    }), 200
+
+
+@reports_bp.route('/reports/rebuild', methods=['POST'])
+@require_admin
+def rebuild_reports():
+    """
+    Recalcula las tablas de resumen, enteras o para el rango ?from=&to=.
+    Mientras dura, los reportes muestran los resúmenes anteriores y las
+    reservas nuevas se suman cuando termina.
+    """
+    first_day = last_day = None
+    if request.args.get('from') or request.args.get('to'):
+        try:
+            first_day, last_day = date_range_args()
+        except ValueError as ve:
+            return jsonify({"status":"error","message": str(ve)}), 400
+    started = time.perf_counter()
+    try:
+        result = rebuild_rollups(get_db_connection(), first_day, last_day)
+    except RebuildInProgress as e:
+        return jsonify({"status":"error","message": str(e)}), 409
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al reconstruir los reportes","error_details": str(db_err)}), 500
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return jsonify({"status":"success","message":"Reportes reconstruidos","data": result}), 200
@@ -1,79 +1,279 @@
+import os
 from flask import Blueprint, jsonify, request
-from database import get_db_connection
+from database import after_commit, defer, get_db_connection, prepared_statement, stick_to_primary
+from occupancy import get_occupancy_index
+from pricing import get_pricing_snapshot, quote_itinerary
+from idempotency import idempotent
+from psycopg2 import Error as Psycopg2Error
 from datetime import datetime, timedelta
 
 reservations_bp = Blueprint('reservations_bp', __name__)
 
+ROOM_OVERLAP_QUERY = """
+    SELECT re.check_in_date, re.check_out_date
+    FROM reservation_room rr
+    JOIN reservation re ON re.id = rr.reservation_id
+    WHERE rr.room_id = %s
+    AND re.check_in_date < %s
+    AND re.check_out_date > %s;
+"""
 
-def find_available_room(cur, room_type_id, checkin, checkout):
+LOCK_ROOM_SKIP_LOCKED_QUERY = 'SELECT id FROM room WHERE id = %s FOR UPDATE SKIP LOCKED;'
+LOCK_ROOM_QUERY = 'SELECT id FROM room WHERE id = %s FOR UPDATE;'
+# Suelta el lock de una habitación descartada (y el savepoint, para no anidarlos)
+DISCARD_CLAIM = 'ROLLBACK TO SAVEPOINT claim_room; RELEASE SAVEPOINT claim_room;'
+
+# Paquete con su tipo de habitación, actividades y servicios en una sola consulta
+PACKAGE_BOOKING_QUERY = """
+    SELECT p.*,
+        (SELECT prt.room_type_id FROM package_room_type prt WHERE prt.package_id = p.id LIMIT 1) AS room_type_id,
+        ARRAY(SELECT pa.activity_id FROM package_activity pa WHERE pa.package_id = p.id) AS activity_ids,
+        ARRAY(SELECT ps.service_id FROM package_service ps WHERE ps.package_id = p.id) AS service_ids
+    FROM package p
+    WHERE p.id = %s;
+"""
+
+PRICES_QUERY = """
+    SELECT 'room' AS kind, id, price_per_night AS price FROM room WHERE id = ANY(%s)
+    UNION ALL
+    SELECT 'activity', id, price FROM activity WHERE id = ANY(%s)
+    UNION ALL
+    SELECT 'service', id, price FROM service WHERE id = ANY(%s);
+"""
+
+# Inserta N reservas con sus habitaciones, actividades y servicios en un solo
+# statement y devuelve los IDs en el orden de las habitaciones. Las
+# actividades y servicios indican su reserva por posición (n, desde 1); rows
+# se materializa una vez, así que cada reserva toma un solo nextval.
+INSERT_RESERVATIONS_QUERY = """
+    WITH rows AS (
+        SELECT nextval(pg_get_serial_sequence('reservation', 'id'))::int AS id, t.*
+        FROM unnest(%(room_ids)s::int[], %(adults)s::int[], %(children)s::int[], %(amounts)s::numeric[])
+            WITH ORDINALITY AS t(room_id, adults, children, amount, n)
+    ), new_reservations AS (
+        INSERT INTO reservation (id, package_id, check_in_date, check_out_date, adults, children, amount, customer_name, customer_email)
+        SELECT id, %(package_id)s::int, %(checkin)s::date, %(checkout)s::date, adults, children, amount,
+            %(customer_name)s::text, %(customer_email)s::text
+        FROM rows
+    ), new_rooms AS (
+        INSERT INTO reservation_room (reservation_id, room_id)
+        SELECT id, room_id FROM rows
+    ), new_activities AS (
+        INSERT INTO reservation_activity (reservation_id, activity_id)
+        SELECT rows.id, a.activity_id
+        FROM unnest(%(activity_rows)s::int[], %(activity_ids)s::int[]) AS a(n, activity_id)
+        JOIN rows USING (n)
+    ), new_services AS (
+        INSERT INTO reservation_service (reservation_id, service_id)
+        SELECT rows.id, s.service_id
+        FROM unnest(%(service_rows)s::int[], %(service_ids)s::int[]) AS s(n, service_id)
+        JOIN rows USING (n)
+    ), new_report_queue AS (
+        -- Los resúmenes de los reportes se actualizan después, fuera de esta transacción (reports.py)
+        INSERT INTO report_queue (reservation_id)
+        SELECT id FROM rows
+    )
+    SELECT id FROM rows ORDER BY n;
+"""
+
+# Consultas del camino de la reserva, preparadas una vez por conexión (los
+# tipos de los parámetros van explícitos donde el PREPARE no los puede deducir)
+ROOM_OVERLAP = prepared_statement('room_overlap', ROOM_OVERLAP_QUERY)
+LOCK_ROOM_SKIP_LOCKED = prepared_statement('lock_room_skip_locked', LOCK_ROOM_SKIP_LOCKED_QUERY)
+LOCK_ROOM = prepared_statement('lock_room', LOCK_ROOM_QUERY)
+PACKAGE_BOOKING = prepared_statement('package_booking', PACKAGE_BOOKING_QUERY)
+PRICES = prepared_statement('prices', PRICES_QUERY)
+INSERT_RESERVATIONS = prepared_statement('insert_reservations', INSERT_RESERVATIONS_QUERY)
+
+# Máximo de habitaciones por reserva grupal
+BULK_MAX_ROOMS = int(os.getenv("BULK_MAX_ROOMS", "50"))
+# Máximo de itinerarios por pedido de cotización
+QUOTE_MAX_ITINERARIES = int(os.getenv("QUOTE_MAX_ITINERARIES", "1000"))
+
+
+def find_available_room(cur, room_type_id, checkin, checkout, exclude=()):
     """
     Busca rápidamente una habitación del tipo pedido que no tenga reservas
     que se solapen con las fechas seleccionadas.
+    Los candidatos salen del índice de ocupación en memoria; como el índice
+    puede estar atrasado (reservas de otros workers), cada candidato se
+    confirma contra la base mirando solo las reservas de esa habitación.
+    Antes de confirmar se bloquea la fila de la habitación (FOR UPDATE) hasta
+    el commit, así dos reservas simultáneas no pueden quedarse con la misma.
+    Las habitaciones que otra transacción tiene bloqueadas se saltean en la
+    primera pasada y solo se esperan si no quedó otra opción, de modo que las
+    reservas de distintas habitaciones o tipos no se serializan entre sí.
     """
-    query = f"""
-        SELECT r.id
-        FROM room r
-        WHERE r.type_id = {room_type_id}
-        AND r.id NOT IN (
-            SELECT rr.room_id
-            FROM reservation_room rr
-            JOIN reservation re ON re.id = rr.reservation_id
-            WHERE re.check_in_date < '{checkout}'
-            AND re.check_out_date > '{checkin}'
-        )
-        ORDER BY r.id
-        LIMIT 1;
-    """
-    cur.execute(query)
-    room = cur.fetchone()
-    if not room:
-        raise ValueError("No quedan habitaciones disponibles de ese tipo para esas fechas")
-    return room['id']
+    index = get_occupancy_index(lambda: cur.connection)
+    skipped = []
+    for room_id in index.free_rooms(int(room_type_id), checkin, checkout):
+        # exclude: habitaciones ya tomadas por esta misma transacción (reservas grupales)
+        if room_id in exclude:
+            continue
+        locked = _claim_room(cur, index, room_id, checkin, checkout, LOCK_ROOM_SKIP_LOCKED)
+        if locked is None:
+            skipped.append(room_id)
+        elif locked:
+            return room_id
+    for room_id in skipped:
+        if _claim_room(cur, index, room_id, checkin, checkout, LOCK_ROOM):
+            return room_id
+    raise ValueError("No quedan habitaciones disponibles de ese tipo para esas fechas")
 
 
-def calculate_reservation_amount(cur, room_id, checkin, checkout, activity_ids, service_ids):
+def _claim_room(cur, index, room_id, checkin, checkout, lock_statement):
     """
-    Suma noches * tarifa + precios de las actividades/servicios seleccionados.
+    Bloquea la habitación y confirma que esté libre. Devuelve None si estaba
+    bloqueada por otra transacción (SKIP LOCKED), True si quedó tomada y False
+    si ya estaba ocupada. El lock se toma dentro de un savepoint para poder
+    soltarlo si la habitación se descarta: así una transacción nunca espera
+    por una habitación mientras retiene otra que no va a usar. El SAVEPOINT
+    viaja con el lock y el RELEASE o ROLLBACK TO con el statement siguiente
+    (defer): tomar una habitación cuesta dos viajes a la base, el lock y el
+    control de solapamiento.
     """
+    lock_statement.execute(cur, (room_id,), prefix='SAVEPOINT claim_room;')
+    if cur.fetchone() is None:
+        defer(cur, DISCARD_CLAIM)
+        return None
+    # Se ejecuta después de tomar el lock: en READ COMMITTED ve las reservas
+    # que confirmó la transacción que tenía la habitación antes
+    ROOM_OVERLAP.execute(cur, (room_id, checkout, checkin))
+    overlaps = cur.fetchall()
+    if overlaps:
+        defer(cur, DISCARD_CLAIM)
+        for stay in overlaps:
+            index.add_stay(room_id, stay['check_in_date'], stay['check_out_date'])
+        return False
+    defer(cur, 'RELEASE SAVEPOINT claim_room;')
+    return True
+
+
+def fetch_prices(cur, room_ids, activity_ids, service_ids):
+    """Precios de habitaciones, actividades y servicios en una sola consulta."""
+    PRICES.execute(cur, (list(room_ids), list(activity_ids), list(service_ids)))
+    prices = {'room': {}, 'activity': {}, 'service': {}}
+    for row in cur.fetchall():
+        prices[row['kind']][row['id']] = row['price']
+    return prices
+
+
+def nights_between(checkin, checkout):
     checkin_date = datetime.strptime(checkin, '%Y-%m-%d')
     checkout_date = datetime.strptime(checkout, '%Y-%m-%d')
     nights = (checkout_date - checkin_date).days
     if nights <= 0:
         raise ValueError("Check-out debe ser posterior a check-in")
-    cur.execute(f"SELECT price_per_night FROM room WHERE id={room_id};")
-    room_price = cur.fetchone()['price_per_night']
+    return nights
+
+
+def amount_from_prices(prices, room_id, nights, activity_ids, service_ids):
+    room_price = prices['room'].get(room_id)
+    if room_price is None:
+        raise ValueError(f"Habitación con ID {room_id} no encontrada")
     total = nights * room_price
-    if activity_ids:
-        cur.execute(f"SELECT COALESCE(SUM(price),0) AS sum FROM activity WHERE id IN ({','.join(map(str,activity_ids))});")
-        total += cur.fetchone()['sum']
-    if service_ids:
-        cur.execute(f"SELECT COALESCE(SUM(price),0) AS sum FROM service WHERE id IN ({','.join(map(str,service_ids))});")
-        total += cur.fetchone()['sum']
+    # Como en un IN (...), cada actividad/servicio se cobra una vez aunque venga repetido
+    total += sum(prices['activity'].get(aid, 0) for aid in set(activity_ids))
+    total += sum(prices['service'].get(sid, 0) for sid in set(service_ids))
     return total
 
+
+def calculate_reservation_amount(cur, room_id, checkin, checkout, activity_ids, service_ids):
+    """
+    Suma noches * tarifa + precios de las actividades/servicios seleccionados.
+    """
+    nights = nights_between(checkin, checkout)
+    prices = fetch_prices(cur, [room_id], activity_ids, service_ids)
+    return amount_from_prices(prices, room_id, nights, activity_ids, service_ids)
+
+
+def parse_ids(values):
+    if values is None:
+        return []
+    if not isinstance(values, list):
+        raise ValueError("Los IDs de actividades y servicios deben ser una lista")
+    try:
+        return [int(v) for v in values]
+    except (TypeError, ValueError):
+        raise ValueError("Los IDs de actividades y servicios deben ser enteros")
+
+
+def parse_guests(data):
+    """Valida adultos/niños; devuelve None si son inválidos."""
+    try:
+        adults = int(data.get('adults'))
+        children = int(data.get('children', 0))
+    except (TypeError, ValueError):
+        return None
+    if adults < 1 or children < 0:
+        return None
+    return adults, children
+
+
+def load_package_for_booking(cur, package_id):
+    PACKAGE_BOOKING.execute(cur, (package_id,))
+    return cur.fetchone()
+
+
+def insert_reservations(cur, package_id, checkin, checkout, customer_name, customer_email, bookings):
+    """
+    Inserta las reservas (una por habitación) en un solo statement sin
+    importar cuántas sean: toma los IDs, inserta reservation,
+    reservation_room, reservation_activity y reservation_service y las deja
+    en la cola de los reportes.
+    Cada booking es un dict con room_id, adults, children, amount,
+    activity_ids y service_ids. Devuelve los IDs en el mismo orden.
+    """
+    params = {
+        'room_ids': [b['room_id'] for b in bookings],
+        'adults': [b['adults'] for b in bookings],
+        'children': [b['children'] for b in bookings],
+        'amounts': [b['amount'] for b in bookings],
+        'activity_rows': [],
+        'activity_ids': [],
+        'service_rows': [],
+        'service_ids': [],
+        'package_id': package_id,
+        'checkin': checkin,
+        'checkout': checkout,
+        'customer_name': customer_name,
+        'customer_email': customer_email,
+    }
+    for n, booking in enumerate(bookings, start=1):
+        for aid in booking['activity_ids']:
+            params['activity_rows'].append(n)
+            params['activity_ids'].append(aid)
+        for sid in booking['service_ids']:
+            params['service_rows'].append(n)
+            params['service_ids'].append(sid)
+    INSERT_RESERVATIONS.execute(cur, params)
+    return [row['id'] for row in cur.fetchall()]
+
+
+def package_dates(package_info, checkin_str):
+    checkin_date_obj = datetime.strptime(checkin_str, '%Y-%m-%d')
+    checkout_date_obj = checkin_date_obj + timedelta(days=package_info['nights'])
+    return checkout_date_obj.strftime('%Y-%m-%d')
+
+
 @reservations_bp.route('/reservations', methods=['POST'])
+@idempotent
 def create_reservation():
     data = request.get_json()
     if not data:
         return jsonify({"status":"error","message":"No se recibieron datos"}), 400
-    conn = None
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
             package_id = data.get('package_id')
             customer_name = data.get('customer_name', '')
             customer_email = data.get('customer_email', '')
-            adults = data.get('adults')
-            children = data.get('children', 0)
 
             # Validaciones básicas de pasajeros
-            try:
-                adults = int(adults)
-                children = int(children)
-            except (TypeError, ValueError):
-                return jsonify({"status":"error","message":"Cantidad de pasajeros inválida"}), 400
-            if adults < 1 or children < 0:
+            guests = parse_guests(data)
+            if guests is None:
                 return jsonify({"status":"error","message":"Cantidad de pasajeros inválida"}), 400
+            adults, children = guests
 
             if package_id:
                 # --- FLUJO DE RESERVA POR PAQUETE ---
@@ -81,53 +281,32 @@ def create_reservation():
                 if not all([checkin_str, customer_name, customer_email]):
                     return jsonify({"status": "error", "message": "Faltan datos obligatorios para la reserva de paquete"}), 400
 
-                # 1. Obtener datos completos del paquete
-                cur.execute('SELECT * FROM package WHERE id = %s;', (package_id,))
-                package_info = cur.fetchone()
+                # 1. Obtener datos completos del paquete (con tipo de habitación, actividades y servicios)
+                package_info = load_package_for_booking(cur, package_id)
                 if not package_info:
                     return jsonify({"status": "error", "message": f"Paquete con ID {package_id} no encontrado"}), 404
-
-                # Obtener el room_type_id del paquete
-                cur.execute('SELECT room_type_id FROM package_room_type WHERE package_id = %s LIMIT 1;', (package_id,))
-                package_room_type_data = cur.fetchone()
-                if not package_room_type_data:
+                if not package_info['room_type_id']:
                     return jsonify({"status": "error", "message": f"Paquete con ID {package_id} no tiene tipo de habitación asociado"}), 500
-                room_type_id_from_package = package_room_type_data['room_type_id']
 
                 # 2. Calcular checkout_date
-                checkin_date_obj = datetime.strptime(checkin_str, '%Y-%m-%d')
-                checkout_date_obj = checkin_date_obj + timedelta(days=package_info['nights'])
-                checkout_str = checkout_date_obj.strftime('%Y-%m-%d')
+                checkout_str = package_dates(package_info, checkin_str)
 
                 # 3. Encontrar una habitación disponible del tipo de paquete
-                room_id = find_available_room(cur, room_type_id_from_package, checkin_str, checkout_str)
-
-                # 4. Usar el precio del paquete como monto total
-                total_amount = package_info['price']
-
-                # Insertar en reservation
-                cur.execute(
-                    f"INSERT INTO reservation (package_id, check_in_date, check_out_date, adults, children, amount, customer_name, customer_email) "
-                    f"VALUES ({package_id},'{checkin_str}','{checkout_str}',{adults},{children},{total_amount},'{customer_name}','{customer_email}') RETURNING id;"
-                )
-                reservation_id = cur.fetchone()['id']
-
-                # Insertar en reservation_room
-                cur.execute(f"INSERT INTO reservation_room (reservation_id, room_id) VALUES ({reservation_id},{room_id});")
+                room_id = find_available_room(cur, package_info['room_type_id'], checkin_str, checkout_str)
 
-                # Insertar actividades del paquete en reservation_activity
-                cur.execute('SELECT activity_id FROM package_activity WHERE package_id = %s;', (package_id,))
-                package_activity_ids = [row['activity_id'] for row in cur.fetchall()]
-                for aid in package_activity_ids:
-                    cur.execute(f"INSERT INTO reservation_activity (reservation_id, activity_id) VALUES ({reservation_id},{aid});")
+                # 4. Usar el precio del paquete como monto total e insertar todo junto
+                reservation_id, = insert_reservations(cur, package_id, checkin_str, checkout_str, customer_name, customer_email, [{
+                    'room_id': room_id,
+                    'adults': adults,
+                    'children': children,
+                    'amount': package_info['price'],
+                    'activity_ids': package_info['activity_ids'],
+                    'service_ids': package_info['service_ids'],
+                }])
 
-                # Insertar servicios del paquete en reservation_service
-                cur.execute('SELECT service_id FROM package_service WHERE package_id = %s;', (package_id,))
-                package_service_ids = [row['service_id'] for row in cur.fetchall()]
-                for sid in package_service_ids:
-                    cur.execute(f"INSERT INTO reservation_service (reservation_id, service_id) VALUES ({reservation_id},{sid});")
-
-                conn.commit()
+                # La transacción la confirma @idempotent
+                after_commit(lambda: get_occupancy_index().add_stay(room_id, checkin_str, checkout_str))
+                stick_to_primary()
                 return jsonify({"status":"success","message":"Reserva de paquete creada","reservation_id": reservation_id, "room_id": room_id }), 201
 
             else:
@@ -135,31 +314,163 @@ def create_reservation():
                 room_type_id = data.get('room_type_id')
                 checkin = data.get('checkin_date')
                 checkout = data.get('checkout_date')
-                activity_ids = data.get('activity_ids', [])
-                service_ids = data.get('service_ids', [])
+                activity_ids = parse_ids(data.get('activity_ids', []))
+                service_ids = parse_ids(data.get('service_ids', []))
 
                 if not room_type_id or not all([checkin,checkout,customer_name,customer_email]):
                     return jsonify({"status":"error","message":"Faltan datos obligatorios para la reserva personalizada"}), 400
-                
+
                 room_id = find_available_room(cur, room_type_id, checkin, checkout)
                 total_amount = calculate_reservation_amount(cur, room_id, checkin, checkout, activity_ids, service_ids)
-                
-                # package_sql will be NULL for personalized reservations
-                package_sql = 'NULL' 
-                cur.execute(
-                    f"INSERT INTO reservation (package_id, check_in_date, check_out_date, adults, children, amount, customer_name, customer_email) "
-                    f"VALUES ({package_sql},'{checkin}','{checkout}',{adults},{children},{total_amount},'{customer_name}','{customer_email}') RETURNING id;"
-                )
-                reservation_id = cur.fetchone()['id']
-                for aid in activity_ids:
-                    cur.execute(f"INSERT INTO reservation_activity (reservation_id, activity_id) VALUES ({reservation_id},{aid});")
-                for sid in service_ids:
-                    cur.execute(f"INSERT INTO reservation_service (reservation_id, service_id) VALUES ({reservation_id},{sid});")
-                cur.execute(f"INSERT INTO reservation_room (reservation_id, room_id) VALUES ({reservation_id},{room_id});")
-                conn.commit()
+
+                # package_id queda en NULL para las reservas personalizadas
+                reservation_id, = insert_reservations(cur, None, checkin, checkout, customer_name, customer_email, [{
+                    'room_id': room_id,
+                    'adults': adults,
+                    'children': children,
+                    'amount': total_amount,
+                    'activity_ids': activity_ids,
+                    'service_ids': service_ids,
+                }])
+                after_commit(lambda: get_occupancy_index().add_stay(room_id, checkin, checkout))
+                stick_to_primary()
                 return jsonify({"status":"success","message":"Reserva personalizada creada","reservation_id": reservation_id, "room_id": room_id }), 201
     except ValueError as ve:
         return jsonify({"status":"error","message": str(ve)}), 400
-    finally:
-        if conn:
-            conn.close()
+
+
+@reservations_bp.route('/reservations/bulk', methods=['POST'])
+@idempotent
+def create_bulk_reservation():
+    """
+    Reserva varias habitaciones para un grupo en una sola transacción: o se
+    confirman todas o ninguna. Cada elemento de 'rooms' indica los pasajeros
+    (y opcionalmente actividades/servicios) de una habitación.
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"status":"error","message":"No se recibieron datos"}), 400
+    rooms = data.get('rooms')
+    if not isinstance(rooms, list) or not rooms:
+        return jsonify({"status":"error","message":"Falta la lista 'rooms' con las habitaciones a reservar"}), 400
+    if len(rooms) > BULK_MAX_ROOMS:
+        return jsonify({"status":"error","message":f"No se pueden reservar más de {BULK_MAX_ROOMS} habitaciones por pedido"}), 400
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            package_id = data.get('package_id')
+            customer_name = data.get('customer_name', '')
+            customer_email = data.get('customer_email', '')
+            checkin = data.get('checkin_date')
+
+            guests = [parse_guests(room) if isinstance(room, dict) else None for room in rooms]
+            if None in guests:
+                return jsonify({"status":"error","message":"Cantidad de pasajeros inválida"}), 400
+
+            if package_id:
+                if not all([checkin, customer_name, customer_email]):
+                    return jsonify({"status": "error", "message": "Faltan datos obligatorios para la reserva de paquete"}), 400
+                package_info = load_package_for_booking(cur, package_id)
+                if not package_info:
+                    return jsonify({"status": "error", "message": f"Paquete con ID {package_id} no encontrado"}), 404
+                if not package_info['room_type_id']:
+                    return jsonify({"status": "error", "message": f"Paquete con ID {package_id} no tiene tipo de habitación asociado"}), 500
+                room_type_id = package_info['room_type_id']
+                checkout = package_dates(package_info, checkin)
+            else:
+                room_type_id = data.get('room_type_id')
+                checkout = data.get('checkout_date')
+                if not room_type_id or not all([checkin, checkout, customer_name, customer_email]):
+                    return jsonify({"status":"error","message":"Faltan datos obligatorios para la reserva personalizada"}), 400
+                nights = nights_between(checkin, checkout)
+
+            # Asignar una habitación distinta a cada integrante del grupo
+            room_ids = []
+            for _ in rooms:
+                room_ids.append(find_available_room(cur, room_type_id, checkin, checkout, exclude=set(room_ids)))
+
+            bookings = []
+            if package_id:
+                for room_id, (adults, children) in zip(room_ids, guests):
+                    bookings.append({
+                        'room_id': room_id, 'adults': adults, 'children': children,
+                        'amount': package_info['price'],
+                        'activity_ids': package_info['activity_ids'],
+                        'service_ids': package_info['service_ids'],
+                    })
+            else:
+                per_room_ids = [
+                    (parse_ids(room.get('activity_ids', data.get('activity_ids', []))),
+                     parse_ids(room.get('service_ids', data.get('service_ids', []))))
+                    for room in rooms
+                ]
+                prices = fetch_prices(
+                    cur, room_ids,
+                    {aid for aids, _ in per_room_ids for aid in aids},
+                    {sid for _, sids in per_room_ids for sid in sids},
+                )
+                for room_id, (adults, children), (activity_ids, service_ids) in zip(room_ids, guests, per_room_ids):
+                    bookings.append({
+                        'room_id': room_id, 'adults': adults, 'children': children,
+                        'amount': amount_from_prices(prices, room_id, nights, activity_ids, service_ids),
+                        'activity_ids': activity_ids,
+                        'service_ids': service_ids,
+                    })
+
+            reservation_ids = insert_reservations(cur, package_id or None, checkin, checkout, customer_name, customer_email, bookings)
+            def add_stays():
+                index = get_occupancy_index()
+                for room_id in room_ids:
+                    index.add_stay(room_id, checkin, checkout)
+            after_commit(add_stays)
+            stick_to_primary()
+            return jsonify({
+                "status": "success",
+                "message": "Reserva grupal creada",
+                "data": [
+                    {"reservation_id": reservation_id, "room_id": booking['room_id'], "amount": booking['amount']}
+                    for reservation_id, booking in zip(reservation_ids, bookings)
+                ],
+            }), 201
+    except ValueError as ve:
+        return jsonify({"status":"error","message": str(ve)}), 400
+
+
+@reservations_bp.route('/reservations/quote', methods=['POST'])
+def quote_reservations():
+    """
+    Cotiza muchos itinerarios de una vez sin escribir nada. Los precios salen
+    de un snapshot cacheado del catálogo y la disponibilidad del índice de
+    ocupación, así que el costo no depende de cuántos itinerarios lleguen.
+    """
+    data = request.get_json(silent=True)
+    itineraries = data.get('itineraries') if isinstance(data, dict) else None
+    if not isinstance(itineraries, list) or not itineraries:
+        return jsonify({"status":"error","message":"Falta la lista 'itineraries' a cotizar"}), 400
+    if len(itineraries) > QUOTE_MAX_ITINERARIES:
+        return jsonify({"status":"error","message":f"No se pueden cotizar más de {QUOTE_MAX_ITINERARIES} itinerarios por pedido"}), 400
+    try:
+        with get_db_connection(readonly=True).cursor() as cur:
+            snapshot = get_pricing_snapshot(cur)
+        index = get_occupancy_index(lambda: get_db_connection(readonly=True))
+    except Psycopg2Error as db_err:
+        return jsonify({"status":"error","message":"Error DB al cotizar","error_details": str(db_err)}), 500
+
+    free_rooms = {}
+    results = []
+    for itinerary in itineraries:
+        try:
+            quote = quote_itinerary(snapshot, itinerary)
+        except ValueError as ve:
+            results.append({"status": "error", "message": str(ve)})
+            continue
+        except TypeError:
+            # Un itinerario mal armado no tira abajo al resto del lote
+            results.append({"status": "error", "message": "Itinerario inválido"})
+            continue
+        key = (quote['room_type_id'], quote['checkin_date'], quote['checkout_date'])
+        if key not in free_rooms:
+            free_rooms[key] = len(index.free_rooms(*key)) if key[0] is not None else 0
+        quote['available_rooms'] = free_rooms[key]
+        results.append({"status": "success", **quote})
+    return jsonify({"status":"success","message":"Cotizaciones calculadas","data": results}), 200
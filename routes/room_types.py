@@ -1,12 +1,14 @@
 from flask import Blueprint, jsonify, request
-from database import get_db_connection
+from database import get_db_connection, stick_to_primary
+from cache import catalog_cache, publish_invalidation
+from listing import list_table
 from psycopg2 import Error as Psycopg2Error
 
 room_types_bp = Blueprint('room_types_bp', __name__)
 
 def get_room_types_post(conn,cur):
       query = """
-                    INSERT room_type (name, description, gallery)
+                    INSERT INTO room_type (name, description, gallery)
                     VALUES (%s, %s, %s)
                 """
       data_new = request.json
@@ -21,7 +23,10 @@ def get_room_types_post(conn,cur):
         #409 Conflict: El request no se pudo completar debido a un conflicto con el estado actual del recurso
       else:
         cur.execute(query,(name_new, description_new, gallery_new))
+        publish_invalidation(cur, 'room_type')
         conn.commit()
+        catalog_cache.invalidate('room_type')
+        stick_to_primary(worker=True)
         return jsonify({
             "status": "success",
             "message": "Datos cargados con éxito",
@@ -30,23 +35,12 @@ def get_room_types_post(conn,cur):
 
 @room_types_bp.route('/room_types', methods=['GET', 'POST'])
 def get_room_types():
-    conn = None
-    data = None
+    if (request.method != 'POST'):
+        return list_table('room_type', "Datos de room_type obtenidos", "Tabla 'room_type' vacía o no existe", "Error DB al obtener room_types")
     try:
         conn = get_db_connection()
         with conn.cursor() as cur:
-            if (request.method == 'POST'):
-                get_room_types_post(conn,cur)
-                cur.close()
-            else:
-                cur.execute('SELECT * FROM room_type ORDER BY id;')
-                data = cur.fetchall()
-                cur.close()
-                if not data:
-                    return jsonify({"status":"error","message":"Tabla 'room_type' vacía o no existe"}), 404
-                return jsonify({"status":"success","message":"Datos de room_type obtenidos","data": data}), 200
+            return get_room_types_post(conn,cur)
     except Psycopg2Error as db_err:
         return jsonify({"status":"error","message":"Error DB al obtener room_types","error_details": str(db_err)}), 500
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+
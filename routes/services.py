@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
-from database import get_db_connection
+from database import get_db_connection, stick_to_primary
+from cache import catalog_cache, publish_invalidation
+from listing import list_table
 
 services_bp = Blueprint('services_bp', __name__)
 
@@ -20,7 +22,10 @@ def get_room_types_post(conn,cur):
     #409 Conflict: El request no se pudo completar debido a un conflicto con el estado actual del recurso
     else:
         cur.execute(query,(name_new, description_new, price_new))
+        publish_invalidation(cur, 'service')
         conn.commit()
+        catalog_cache.invalidate('service')
+        stick_to_primary(worker=True)
         return jsonify({
             "status": "success",
             "message": "Datos cargados con éxito",
@@ -28,25 +33,10 @@ def get_room_types_post(conn,cur):
 
 @services_bp.route('/services', methods=['GET', 'POST'])
 def get_services():
-    conn = None
-    data = None
-    try:
+    if (request.method == 'POST'):
         conn = get_db_connection()
         with conn.cursor() as cur:
+            return get_room_types_post(conn,cur)
+    #Si es GET
+    return list_table('service', "Datos de servicios obtenidos", "Tabla 'service' vacía o no existe", "Error DB al obtener services")
 
-            if (request.method == 'POST'):
-                get_room_types_post(conn,cur)
-                cur.close()
-            else:
-                #Si es GET
-                cur.execute('SELECT * FROM service ORDER BY id;')
-                data = cur.fetchall()
-                cur.close()
-
-                if not data:
-                    return jsonify({"status":"error","message":"Tabla 'service' vacía o no existe"}), 404
-                else:
-                    return jsonify({"status":"success","message":"Datos de servicios obtenidos","data": data}), 200
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import decimal
+from datetime import date
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _default(o):
+    """Tipos que no son JSON nativo, serializados igual que el provider de Flask."""
+    # Los precios son mucho más frecuentes que las fechas en las filas del catálogo
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, date):
+        return http_date(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Provider de JSON de la app. Con orjson instalado serializa en C; los
+    precios (Decimal) y las fechas (date) se escriben igual que con el
+    provider por defecto de Flask (string y fecha HTTP), así que los clientes
+    no ven cambios. Sin orjson se comporta como el provider por defecto.
+    """
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serializa a bytes UTF-8, listos para mandar o guardar en el cache."""
+        if orjson is None:
+            if indent:
+                return self.dumps(obj, indent=2).encode("utf-8")
+            return self.dumps(obj).encode("utf-8")
+        # Como json.dumps, acepta claves int/float/bool/None y las escribe como
+        # string (los dicts por id de tipo de habitación, por ejemplo)
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        # Con argumentos propios de json.dumps (indent, separators, ...) se usa el camino de Flask
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return json_response(self.dumps_bytes(obj, indent) + b"\n")
+
+
+def json_response(body, status=200):
+    """
+    Respuesta con un cuerpo JSON ya codificado (bytes), por ejemplo guardado
+    en el cache: se manda tal cual, sin volver a serializar.
+    """
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+def init_app(app):
+    app.json = JSONProvider(app)
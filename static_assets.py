@@ -0,0 +1,242 @@
+"""
+Archivos estáticos de la documentación (Swagger UI y la spec) servidos desde memoria.
+
+Al arrancar se leen una sola vez los archivos de swagger-ui/ y swagger.yaml
+y se guarda cada uno en memoria con sus versiones comprimidas (gzip y, si
+está instalado el paquete brotli, br). Si el deploy ya generó los .gz/.br
+con este script se usan esos (compresión máxima); si no, se comprimen al
+cargar con un nivel más rápido.
+
+Cada archivo tiene una versión (hash de su contenido) que se usa como ETag
+y en las URLs que arma index.html (?v=...): esas URLs se pueden cachear un
+año como inmutables porque si el archivo cambia cambia la URL. La spec se
+parsea una vez y se sirve también como JSON, que es lo que carga la UI.
+
+Uso:
+    python static_assets.py      # precomprime swagger-ui/ antes del deploy
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+from datetime import date
+from flask import current_app, request
+import yaml
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SWAGGER_UI_DIR = os.path.join(BASE_DIR, "swagger-ui")
+SWAGGER_SPEC_PATH = os.path.join(BASE_DIR, "swagger.yaml")
+
+# Los archivos más chicos que esto no se comprimen (el ahorro no paga los headers)
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Codificaciones en orden de preferencia: extensión del archivo precomprimido
+# y compresión al cargar (rápida) y al precomprimir (máxima)
+ENCODINGS = ("br", "gzip")
+EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+
+
+def _compress(encoding, body, best=False):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+    return brotli.compress(body, quality=11 if best else 5)
+
+
+def _available(encoding):
+    return encoding == "gzip" or brotli is not None
+
+
+class Asset:
+    """Un archivo en memoria: el contenido, su versión y sus variantes comprimidas."""
+
+    def __init__(self, body, mimetype, path=None):
+        self.mimetype = mimetype
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.bodies = {"identity": body}
+        if len(body) < MIN_COMPRESS_BYTES:
+            return
+        for encoding in ENCODINGS:
+            compressed = self._precompressed(path, encoding)
+            if compressed is None and _available(encoding):
+                compressed = _compress(encoding, body)
+            # Solo se guarda si realmente achica (las imágenes ya vienen comprimidas)
+            if compressed is not None and len(compressed) < len(body):
+                self.bodies[encoding] = compressed
+
+    @staticmethod
+    def _precompressed(path, encoding):
+        """El .gz/.br generado en el deploy, si existe y no es más viejo que el original."""
+        if path is None:
+            return None
+        compressed_path = path + EXTENSIONS[encoding]
+        try:
+            if os.path.getmtime(compressed_path) < os.path.getmtime(path):
+                return None
+            with open(compressed_path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def negotiate(self, accept_encodings):
+        """La codificación a mandar según Accept-Encoding: la de mayor q, br antes que gzip si empatan."""
+        best, best_quality = "identity", 0
+        for encoding in ENCODINGS:
+            if encoding not in self.bodies:
+                continue
+            quality = accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def etag(self, encoding):
+        # Cada variante es una representación distinta y necesita su propio ETag fuerte
+        return self.version if encoding == "identity" else f"{self.version}-{encoding}"
+
+
+_assets = None
+_spec = None
+_load_lock = threading.Lock()
+
+
+def _mimetype(filename):
+    if filename.endswith((".yaml", ".yml")):
+        return "application/yaml"
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def _json_default(o):
+    # PyYAML convierte las fechas sin comillas en date
+    if isinstance(o, date):
+        return o.isoformat()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _versioned(match, assets):
+    attribute, name = match.group(1), match.group(2)
+    if name not in assets:
+        return match.group(0)
+    return f'{attribute}="./{name}?v={assets[name].version}"'
+
+
+def load():
+    """
+    Carga los archivos en memoria. Se llama al arrancar (en el master con
+    preload_app, así los workers comparten la memoria); las llamadas
+    siguientes no hacen nada.
+    """
+    global _assets, _spec
+    with _load_lock:
+        if _assets is not None:
+            return
+        assets = {}
+        for filename in sorted(os.listdir(SWAGGER_UI_DIR)):
+            path = os.path.join(SWAGGER_UI_DIR, filename)
+            if filename.endswith(tuple(EXTENSIONS.values())) or not os.path.isfile(path):
+                continue
+            if filename in ("index.html", "swagger-initializer.js"):
+                continue
+            with open(path, "rb") as f:
+                assets[filename] = Asset(f.read(), _mimetype(filename), path)
+
+        with open(SWAGGER_SPEC_PATH, "rb") as f:
+            spec_yaml = f.read()
+        spec = yaml.safe_load(spec_yaml)
+        spec_json = json.dumps(spec, ensure_ascii=False, default=_json_default).encode("utf-8")
+        assets["swagger.yaml"] = Asset(spec_yaml, "application/yaml", SWAGGER_SPEC_PATH)
+        assets["swagger.json"] = Asset(spec_json, "application/json")
+
+        # La UI carga la spec en JSON (más rápido que parsear YAML en el navegador) con su versión
+        with open(os.path.join(SWAGGER_UI_DIR, "swagger-initializer.js"), encoding="utf-8") as f:
+            initializer = f.read().replace('"/swagger.yaml"', f'"/swagger.json?v={assets["swagger.json"].version}"')
+        assets["swagger-initializer.js"] = Asset(initializer.encode("utf-8"), "text/javascript")
+
+        # index.html pide cada archivo con su versión; él mismo se revalida siempre
+        with open(os.path.join(SWAGGER_UI_DIR, "index.html"), encoding="utf-8") as f:
+            index = re.sub(r'(href|src)="(?:\./)?([^"?#:/]+)"', lambda m: _versioned(m, assets), f.read())
+        assets["index.html"] = Asset(index.encode("utf-8"), "text/html")
+
+        _spec = spec
+        _assets = assets
+
+
+def get_asset(name):
+    """El archivo `name` (de swagger-ui/, swagger.yaml o swagger.json) o None si no existe."""
+    if _assets is None:
+        load()
+    return _assets.get(name)
+
+
+def get_spec():
+    """La spec de la API ya parseada."""
+    if _spec is None:
+        load()
+    return _spec
+
+
+def asset_response(asset):
+    """
+    Respuesta con la variante de `asset` que acepta el cliente. Si la URL
+    trae la versión actual (?v=) se cachea como inmutable; si no, el
+    cliente la revalida con el ETag y recibe 304 si no cambió.
+    """
+    encoding = asset.negotiate(request.accept_encodings)
+    etag = asset.etag(encoding)
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(asset.bodies[encoding], mimetype=asset.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    if len(asset.bodies) > 1:
+        response.vary.add("Accept-Encoding")
+    if request.args.get("v") == asset.version:
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def precompress(directory=SWAGGER_UI_DIR):
+    """Escribe el .gz (y el .br si brotli está instalado) de cada archivo con compresión máxima."""
+    written = []
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.endswith(tuple(EXTENSIONS.values())) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            body = f.read()
+        if len(body) < MIN_COMPRESS_BYTES:
+            continue
+        for encoding in ENCODINGS:
+            if not _available(encoding):
+                continue
+            compressed = _compress(encoding, body, best=True)
+            if len(compressed) >= len(body):
+                continue
+            with open(path + EXTENSIONS[encoding], "wb") as f:
+                f.write(compressed)
+            written.append((filename, encoding, len(body), len(compressed)))
+    return written
+
+
+def main():
+    if brotli is None:
+        print("brotli no está instalado: solo se generan los .gz")
+    for filename, encoding, size, compressed in precompress():
+        print(f"{filename:<34} {encoding:<5} {size:>9} -> {compressed:>8} bytes ({compressed / size:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
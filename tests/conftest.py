@@ -0,0 +1,75 @@
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+# Los módulos de la app están en la raíz del repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app():
+    """La app contra la base de DATABASE_URL (una base de prueba con las migraciones aplicadas)."""
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL no está definida")
+    os.environ.setdefault("OCCUPANCY_RECONCILE_SECONDS", "0")
+    # Los tests suman la cola de los reportes a mano (reports.apply_pending)
+    os.environ.setdefault("REPORT_APPLY_SECONDS", "0")
+    from app import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def booking(app):
+    """
+    Datos para reservas de prueba: un tipo de habitación con habitaciones,
+    fechas lejanas y un email propio. Al terminar borra las reservas creadas
+    y las saca de los resúmenes de los reportes.
+    """
+    from database import pooled_connection
+    from reports import rebuild_rollups
+
+    email = f"test-{uuid.uuid4().hex[:12]}@example.com"
+    checkin = date(2090, 1, 1) + timedelta(days=uuid.uuid4().int % 3000)
+    checkout = checkin + timedelta(days=2)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT type_id FROM room GROUP BY type_id ORDER BY count(*) DESC LIMIT 1;")
+            row = cur.fetchone()
+        conn.rollback()
+    if row is None:
+        pytest.skip("La base no tiene habitaciones")
+    yield {
+        "room_type_id": row["type_id"],
+        "checkin_date": checkin.isoformat(),
+        "checkout_date": checkout.isoformat(),
+        "customer_name": "Test",
+        "customer_email": email,
+        "adults": 2,
+    }
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            ids = "(SELECT id FROM reservation WHERE customer_email = %s)"
+            for table in ("reservation_room", "reservation_activity", "reservation_service"):
+                cur.execute(f"DELETE FROM {table} WHERE reservation_id IN {ids};", (email,))
+            cur.execute("DELETE FROM reservation WHERE customer_email = %s;", (email,))
+        conn.commit()
+        rebuild_rollups(conn, checkin, checkout)
+
+
+def reservations_for(email):
+    from database import pooled_connection
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM reservation WHERE customer_email = %s ORDER BY id;", (email,))
+            ids = [row["id"] for row in cur.fetchall()]
+        conn.rollback()
+    return ids
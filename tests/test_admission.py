@@ -0,0 +1,168 @@
+import importlib.util
+import os
+import threading
+import time
+
+import pytest
+
+from instrumentation import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS = ("GUNICORN_THREADS", "DB_POOL_MAX", "ADMISSION_")
+
+
+def load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def defaults(monkeypatch, tmp_path):
+    """admission.py y gunicorn.conf.py cargados sin ninguna variable de entorno propia (los defaults de producción)."""
+    for key in list(os.environ):
+        if key.startswith(SETTINGS):
+            monkeypatch.delenv(key)
+    # gunicorn.conf.py borra las métricas que encuentra en METRICS_DIR: que
+    # sea un directorio del test y no el de la app o de un servidor corriendo
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    admission = load_module("admission_defaults", "admission.py")
+    gunicorn_conf = load_module("gunicorn_conf_defaults", "gunicorn.conf.py")
+    yield admission, gunicorn_conf
+    metrics._collectors.remove(admission._admission_metrics)
+
+
+def saturate(controller, group, clients):
+    """`clients` requests simultáneos del grupo, como los threads de un worker. Devuelve los motivos y el evento que los libera."""
+    results, done = [], threading.Event()
+    lock = threading.Lock()
+
+    def client():
+        reason = controller.acquire(group)
+        with lock:
+            results.append(reason)
+        if reason is None:
+            done.wait()
+            controller.release(group)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    return results, done, threads
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_default_limits_fit_worker_threads(defaults):
+    admission, gunicorn_conf = defaults
+    controller = admission.controller
+    assert admission.WORKER_THREADS == gunicorn_conf.threads
+    assert controller.reserved < controller.total < gunicorn_conf.threads
+    for group in controller.groups.values():
+        assert min(group.limit, controller.total) + group.queue <= gunicorn_conf.threads
+    assert admission.check_limits(controller, gunicorn_conf.threads) == []
+
+
+def test_default_limits_shed_load(defaults):
+    """Con todos los threads del worker pidiendo búsquedas, unas entran, otras esperan y el resto recibe 503."""
+    admission, gunicorn_conf = defaults
+    controller = admission.controller
+    search = controller.groups['search']
+    clients = gunicorn_conf.threads
+    results, done, threads = saturate(controller, search, clients)
+    try:
+        # Los que no entran ni caben en la cola se rechazan en el acto
+        wait_for(lambda: len(results) == clients - search.queue and search.waiting == search.queue)
+        assert results.count(None) == search.limit
+        assert results.count("queue_full") == clients - search.limit - search.queue
+        assert search.active == search.limit < controller.total
+
+        # Los lugares reservados siguen libres para una reserva
+        booking = controller.groups['booking']
+        assert controller.acquire(booking) is None
+        controller.release(booking)
+
+        # Los que esperan se rinden al vencer el timeout de la cola
+        wait_for(lambda: len(results) == clients, timeout=search.timeout + 5)
+        assert results.count("timeout") == search.queue
+    finally:
+        done.set()
+        for t in threads:
+            t.join()
+    assert controller.active == 0
+
+
+def test_check_limits_detects_unreachable_limits(defaults):
+    admission, _ = defaults
+    controller = admission.AdmissionController(10, 2, [admission.AdmissionGroup('search', 8, 20, 1)])
+    problems = admission.check_limits(controller, threads=4)
+    assert len(problems) == 2
+
+
+def test_streamed_export_holds_its_slot_until_closed(client):
+    import admission
+
+    catalog = admission.controller.groups['catalog']
+    active = catalog.active
+    response = client.get("/rooms?stream=1")
+    if response.status_code != 200:
+        response.close()
+        pytest.skip("La base no tiene habitaciones")
+    # La vista ya terminó pero el cuerpo todavía se está generando
+    assert catalog.active == active + 1
+    assert response.get_data().startswith(b'{"status":"success"')
+    response.close()
+    assert catalog.active == active
+
+
+def test_waiting_booking_goes_before_other_groups():
+    import admission
+
+    booking = admission.AdmissionGroup('booking', 2, 2, 5, priority=True)
+    search = admission.AdmissionGroup('search', 2, 2, 0.05)
+    controller = admission.AdmissionController(2, 1, [booking, search])
+    assert controller.acquire(search) is None
+    # El último lugar está reservado para las reservas
+    assert controller.acquire(search) == "timeout"
+    assert controller.acquire(booking) is None
+    results, done, threads = saturate(controller, booking, 1)
+    try:
+        wait_for(lambda: booking.waiting == 1)
+        controller.release(search)
+        # El lugar que se liberó es de la reserva que esperaba, no de una búsqueda nueva
+        wait_for(lambda: results == [None])
+        assert controller.acquire(search) == "timeout"
+    finally:
+        done.set()
+        for t in threads:
+            t.join()
+    controller.release(booking)
+    assert controller.active == 0
+
+
+def test_route_groups_name_existing_endpoints(app):
+    import admission
+
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()}
+    assert set(admission.ROUTE_GROUPS) <= endpoints
+    assert "home_bp.live" not in admission.ROUTE_GROUPS
+
+
+def test_saturated_group_answers_503(client, monkeypatch):
+    import admission
+
+    catalog = admission.AdmissionGroup('catalog', 1, 0, 0)
+    monkeypatch.setattr(admission, "controller", admission.AdmissionController(2, 0, [catalog]))
+    catalog.active = 1
+    response = client.get("/room_types")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(admission.ADMISSION_RETRY_AFTER)
+    assert catalog.rejected["queue_full"] == 1
+    # Las rutas sin grupo no se limitan
+    assert client.get("/live").status_code == 200
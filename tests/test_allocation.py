@@ -0,0 +1,67 @@
+import threading
+
+import occupancy
+from conftest import reservations_for
+from database import pooled_connection
+
+
+def first_free_room(booking):
+    index = occupancy.get_occupancy_index()
+    return index.free_rooms(booking["room_type_id"], booking["checkin_date"], booking["checkout_date"])[0]
+
+
+def test_concurrent_bookings_get_different_rooms(client, booking):
+    responses = []
+    lock = threading.Lock()
+
+    def book():
+        response = client.post("/reservations", json=booking)
+        with lock:
+            responses.append(response)
+
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [r.status_code for r in responses] == [201] * 4
+    assert len({r.json["room_id"] for r in responses}) == 4
+    assert len(reservations_for(booking["customer_email"])) == 4
+
+
+def test_room_booked_behind_the_index_is_skipped(client, booking):
+    room_id = first_free_room(booking)
+    # Una reserva que el índice de este worker todavía no vio (como si la hubiera hecho otro)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO reservation (check_in_date, check_out_date, adults, children, amount, customer_name, customer_email)"
+                " VALUES (%s, %s, 1, 0, 1, 'Test', %s) RETURNING id;",
+                (booking["checkin_date"], booking["checkout_date"], booking["customer_email"]),
+            )
+            cur.execute("INSERT INTO reservation_room (reservation_id, room_id) VALUES (%s, %s);", (cur.fetchone()["id"], room_id))
+        conn.commit()
+    response = client.post("/reservations", json=booking)
+    assert response.status_code == 201
+    assert response.json["room_id"] != room_id
+    # El índice aprendió la reserva que no tenía
+    assert not occupancy.get_occupancy_index().is_free(room_id, booking["checkin_date"], booking["checkout_date"])
+
+
+def test_room_locked_by_another_booking_is_skipped_without_waiting(client, booking):
+    room_id = first_free_room(booking)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            # Otra transacción está tomando esa habitación
+            cur.execute("SELECT id FROM room WHERE id = %s FOR UPDATE;", (room_id,))
+            responses = []
+            request = threading.Thread(target=lambda: responses.append(client.post("/reservations", json=booking)))
+            request.start()
+            request.join(timeout=10)
+            waited = request.is_alive()
+        conn.rollback()
+    request.join()
+    assert not waited
+    response, = responses
+    assert response.status_code == 201
+    assert response.json["room_id"] != room_id
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+def calendar(client, first_day, last_day):
+    return client.get(f"/availability/calendar?from={first_day}&to={last_day}")
+
+
+def free_rooms(response, room_type_id):
+    return [
+        next(rt["free_rooms"] for rt in day["room_types"] if rt["room_type_id"] == room_type_id)
+        for day in response.get_json()["data"]
+    ]
+
+
+@pytest.mark.parametrize("query, status", [
+    ("", 418),
+    ("?from=2030-01-01", 418),
+    ("?from=2030-01-01&to=enero", 400),
+    ("?from=2030-01-05&to=2030-01-01", 400),
+    ("?from=2030-01-01&to=2035-01-01", 400),
+])
+def test_calendar_rejects_invalid_ranges(client, query, status):
+    response = client.get("/availability/calendar" + query)
+    assert response.status_code == status
+    assert response.get_json()["status"] == "error"
+
+
+def test_calendar_reflects_a_new_booking(client, booking):
+    checkin = date.fromisoformat(booking["checkin_date"])
+    first_day, last_day = checkin - timedelta(days=1), checkin + timedelta(days=3)
+    before = calendar(client, first_day, last_day)
+    assert before.status_code == 200
+    assert [day["date"] for day in before.get_json()["data"]] == [
+        (first_day + timedelta(days=offset)).isoformat() for offset in range(5)
+    ]
+    assert client.post("/reservations", json=booking).status_code == 201
+    after = calendar(client, first_day, last_day)
+    assert after.headers["ETag"] != before.headers["ETag"]
+    # Solo las dos noches de la estadía tienen una habitación menos
+    expected = free_rooms(before, booking["room_type_id"])
+    expected[1] -= 1
+    expected[2] -= 1
+    assert free_rooms(after, booking["room_type_id"]) == expected
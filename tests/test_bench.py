@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import uuid
+from datetime import date
+
+import psycopg2
+import pytest
+from psycopg2.extensions import make_dsn
+
+# Los scripts de bench/ se importan entre sí como módulos sueltos
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import run_benchmarks  # noqa: E402
+import seed as seed_module  # noqa: E402
+
+
+def seed_args(*argv):
+    parser = argparse.ArgumentParser()
+    seed_module.add_seed_arguments(parser)
+    return parser.parse_args(list(argv))
+
+
+@pytest.mark.parametrize("argv", [("--slot-days", "1"), ("--rooms", "0"), ("--packages", "0")])
+def test_seed_rejects_impossible_datasets(argv):
+    # Se valida antes de tocar la base
+    with pytest.raises(ValueError):
+        seed_module.seed(None, seed_args(*argv))
+
+
+def test_percentile():
+    values = list(range(1, 12))
+    assert run_benchmarks.percentile(values, 0.5) == 6
+    assert run_benchmarks.percentile(values, 0.99) == 11
+    assert run_benchmarks.percentile([7], 0.95) == 7
+    assert run_benchmarks.percentile([], 0.5) is None
+
+
+class FakeTransport:
+    name = "fake"
+
+    def __init__(self):
+        self.paths = []
+
+    def client(self):
+        def send(method, path, body):
+            self.paths.append(path)
+            if path.endswith("/3"):
+                raise OSError("conexión cerrada")
+            return 503 if path.endswith("/4") else 200
+        return send
+
+
+def test_run_scenario_counts_every_request():
+    transport = FakeTransport()
+    scenario = ("GET /x", "GET", lambda i: (f"/x/{i}", None))
+    result = run_benchmarks.run_scenario(transport, scenario, concurrency=3, total_requests=10, offset=0)
+    assert sorted(transport.paths) == sorted(f"/x/{i}" for i in range(10))
+    assert result["statuses"] == {"200": 8, "503": 1, "error": 1}
+    assert result["errors"] == 2
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+def test_scenarios_use_the_catalog_ids():
+    catalog = {"room_type_ids": [4, 5], "package_ids": [7], "activity_ids": [8], "service_ids": [9]}
+    scenarios = {name: make for name, _, make in run_benchmarks.build_scenarios(catalog, "bench@example.com")}
+    assert scenarios["GET /package/<id>"](3) == ("/package/7", None)
+    path, body = scenarios["POST /reservations"](1)
+    assert path == "/reservations"
+    assert (body["room_type_id"], body["customer_email"]) == (5, "bench@example.com")
+    assert body["checkin_date"] > date.today().isoformat()
+
+
+@pytest.fixture
+def scratch_database():
+    """Una base vacía propia, para cargar el hotel sintético sin tocar la de los tests."""
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("DATABASE_URL no está definida")
+    name = f"seed_test_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(os.getenv("DATABASE_URL"))
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f"CREATE DATABASE {name} ENCODING 'UTF8' TEMPLATE template0;")
+    except psycopg2.Error as e:
+        admin.close()
+        pytest.skip(f"No se puede crear una base de prueba: {e}")
+    conn = psycopg2.connect(make_dsn(os.getenv("DATABASE_URL"), dbname=name))
+    try:
+        yield conn
+    finally:
+        conn.close()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP DATABASE {name};")
+        admin.close()
+
+
+def test_seed_loads_non_overlapping_past_stays(scratch_database):
+    conn = scratch_database
+    seed_module.seed(conn, seed_args("--rooms", "20", "--packages", "5", "--reservations", "500"), log=lambda message: None)
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM reservation;")
+        assert cur.fetchone()[0] == 500
+        cur.execute("SELECT count(*) FROM room;")
+        assert cur.fetchone()[0] == 20
+        cur.execute("SELECT max(check_out_date) FROM reservation;")
+        assert cur.fetchone()[0] <= date.today()
+        cur.execute("""
+            SELECT count(*)
+            FROM reservation_room a
+            JOIN reservation ra ON ra.id = a.reservation_id
+            JOIN reservation_room b ON b.room_id = a.room_id AND b.reservation_id > a.reservation_id
+            JOIN reservation rb ON rb.id = b.reservation_id
+            WHERE ra.check_in_date < rb.check_out_date AND rb.check_in_date < ra.check_out_date;
+        """)
+        assert cur.fetchone()[0] == 0
+        # La secuencia sigue después de las reservas cargadas
+        cur.execute("SELECT nextval(pg_get_serial_sequence('reservation', 'id')) > (SELECT max(id) FROM reservation);")
+        assert cur.fetchone()[0]
+    conn.rollback()
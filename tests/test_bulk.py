@@ -0,0 +1,84 @@
+import re
+
+import database
+import routes.reservations as reservations
+from conftest import reservations_for
+
+
+def db_queries(response):
+    return int(re.search(r'desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+def test_bulk_booking_gets_one_room_per_guest_group(client, booking):
+    response = client.post("/reservations/bulk", json=dict(booking, rooms=[{"adults": 2}, {"adults": 1, "children": 1}, {"adults": 1}]))
+    assert response.status_code == 201
+    data = response.json["data"]
+    assert len({item["room_id"] for item in data}) == 3
+    assert sorted(item["reservation_id"] for item in data) == reservations_for(booking["customer_email"])
+
+
+def test_bulk_booking_is_all_or_nothing(client, booking, monkeypatch):
+    real_find = reservations.find_available_room
+    calls = []
+
+    def find_then_run_out(cur, room_type_id, checkin, checkout, exclude=()):
+        calls.append(room_type_id)
+        if len(calls) == 3:
+            raise ValueError("No quedan habitaciones disponibles de ese tipo para esas fechas")
+        return real_find(cur, room_type_id, checkin, checkout, exclude)
+
+    monkeypatch.setattr(reservations, "find_available_room", find_then_run_out)
+    response = client.post("/reservations/bulk", json=dict(booking, rooms=[{"adults": 1}] * 3))
+    assert response.status_code == 400
+    assert reservations_for(booking["customer_email"]) == []
+
+
+def test_bulk_booking_validates_rooms(client, booking):
+    for rooms in (None, [], [{"adults": 1}] * (reservations.BULK_MAX_ROOMS + 1), [{"adults": 1}, "suite"]):
+        response = client.post("/reservations/bulk", json=dict(booking, rooms=rooms))
+        assert response.status_code == 400, rooms
+    assert reservations_for(booking["customer_email"]) == []
+
+
+def test_booking_round_trips(client, booking, monkeypatch):
+    # Sin prepared statements no hay PREPARE que dependa de la conexión que toque
+    monkeypatch.setattr(database, "DB_PREPARED_STATEMENTS", False)
+    # Lock de la habitación, control de solapamiento, precios e inserción de todo junto
+    single = client.post("/reservations", json=booking)
+    assert single.status_code == 201
+    assert db_queries(single) <= 4
+    # Además del lock y el control de cada habitación, una consulta de precios y una inserción para todas
+    group = client.post("/reservations/bulk", json=dict(booking, rooms=[{"adults": 1}] * 3))
+    assert group.status_code == 201
+    assert db_queries(group) <= 2 * 3 + 2
+
+
+class RecordingCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.queries = []
+
+    def execute(self, query, vars=None):
+        self.queries.append(query)
+
+
+class Connection:
+    pass
+
+
+def test_defer_sends_commands_with_the_next_statement():
+    conn = Connection()
+    conn.deferred = []
+    cur = RecordingCursor(conn)
+    database.defer(cur, "RELEASE SAVEPOINT claim_room;")
+    assert cur.queries == []
+    statement = database.PreparedStatement("test_defer", "SELECT %s;")
+    statement.execute(cur, (1,))
+    assert cur.queries == ["RELEASE SAVEPOINT claim_room; SELECT %s;"]
+    assert conn.deferred == []
+
+
+def test_defer_runs_at_once_outside_the_pool():
+    cur = RecordingCursor(Connection())
+    database.defer(cur, "RELEASE SAVEPOINT claim_room;")
+    assert cur.queries == ["RELEASE SAVEPOINT claim_room;"]
@@ -0,0 +1,146 @@
+import pytest
+from flask import Flask
+
+import cache
+import serialization
+from cache import TTLCache, cached_response
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    ttl_cache.set("a", 1)
+    clock.now += 4.9
+    assert ttl_cache.get("a") == 1
+    clock.now += 0.1
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+
+
+def test_invalidate_drops_only_tagged_entries():
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.set(("package", 1), "p", tags=("package", "service"))
+    ttl_cache.set(("room_type",), "r", tags=("room_type",))
+    ttl_cache.invalidate("service")
+    assert ttl_cache.get(("package", 1)) is None
+    assert ttl_cache.get(("room_type",)) == "r"
+
+
+def test_stats_count_hits_and_misses():
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.get("a")
+    ttl_cache.set("a", 1)
+    ttl_cache.get("a")
+    stats = ttl_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+@pytest.fixture
+def catalog_app(monkeypatch):
+    """App mínima (sin base) con el JSON de la app y un cache propio."""
+    monkeypatch.setattr(cache, "catalog_cache", TTLCache(maxsize=10, ttl=60))
+    app = Flask(__name__)
+    serialization.init_app(app)
+    calls = []
+
+    @app.route("/catalog")
+    def catalog():
+        def build():
+            calls.append(1)
+            return {"status": "success", "data": [1, 2, 3]}, 200
+        return cached_response(("catalog",), build)
+
+    @app.route("/missing")
+    def missing():
+        def build():
+            calls.append(1)
+            return {"status": "error", "message": "vacío"}, 404
+        return cached_response(("missing",), build)
+
+    app.calls = calls
+    return app
+
+
+def test_response_is_built_once_and_carries_etag(catalog_app):
+    client = catalog_app.test_client()
+    first = client.get("/catalog")
+    second = client.get("/catalog")
+    assert first.status_code == second.status_code == 200
+    assert first.get_json()["data"] == [1, 2, 3]
+    assert first.headers["ETag"] == second.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert len(catalog_app.calls) == 1
+
+
+def test_matching_if_none_match_returns_304(catalog_app):
+    client = catalog_app.test_client()
+    etag = client.get("/catalog").headers["ETag"]
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+    assert client.get("/catalog", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_first_request_with_current_etag_is_not_modified(catalog_app):
+    etag = catalog_app.test_client().get("/catalog").headers["ETag"]
+    cache.catalog_cache.clear()
+    # Aunque haya que armar la respuesta de nuevo, el cuerpo es el mismo
+    assert catalog_app.test_client().get("/catalog", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_errors_are_not_cached(catalog_app):
+    client = catalog_app.test_client()
+    assert client.get("/missing").status_code == 404
+    assert client.get("/missing").status_code == 404
+    assert len(catalog_app.calls) == 2
+    assert "ETag" not in client.get("/missing").headers
+
+
+def test_invalidation_rebuilds_the_response(catalog_app):
+    client = catalog_app.test_client()
+    client.get("/catalog")
+    cache.catalog_cache.invalidate("catalog")
+    client.get("/catalog")
+    assert len(catalog_app.calls) == 2
+
+
+def test_package_endpoint_revalidates_with_etag(client):
+    from database import pooled_connection
+
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM package ORDER BY id LIMIT 1;")
+            row = cur.fetchone()
+        conn.rollback()
+    if row is None:
+        pytest.skip("La base no tiene paquetes")
+    response = client.get(f"/package/{row['id']}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get(f"/package/{row['id']}", headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,65 @@
+import json
+import os
+from datetime import date
+
+import changes
+import instrumentation
+from cache import catalog_cache
+
+
+def test_occupancy_sync_picks_up_other_workers_bookings(client, booking):
+    """Un índice cargado antes de una reserva (como el de otro worker) la ve después de sincronizar."""
+    from database import pooled_connection
+    from occupancy import OccupancyIndex
+
+    other_worker = OccupancyIndex()
+    with pooled_connection() as conn:
+        other_worker.load(conn)
+        conn.rollback()
+    response = client.post("/reservations", json=booking)
+    assert response.status_code == 201
+    room_id = response.json["room_id"]
+    checkin, checkout = date.fromisoformat(booking["checkin_date"]), date.fromisoformat(booking["checkout_date"])
+    assert other_worker.is_free(room_id, checkin, checkout)
+
+    version = other_worker.version
+    with pooled_connection() as conn:
+        other_worker.sync(conn)
+        conn.rollback()
+    assert not other_worker.is_free(room_id, checkin, checkout)
+    assert other_worker.version > version
+
+    # Volver a sincronizar relee las últimas reservas pero no cambia nada
+    version = other_worker.version
+    with pooled_connection() as conn:
+        other_worker.sync(conn)
+        conn.rollback()
+    assert other_worker.version == version
+
+
+def test_catalog_invalidation_from_other_worker(monkeypatch):
+    monkeypatch.setattr(catalog_cache, "_data", catalog_cache._data.__class__())
+    catalog_cache.set(("service",), {"etag": "x", "body": b"{}"}, ("service",))
+    # El aviso del propio proceso se ignora: ya invalidó al confirmar
+    changes._dispatch(json.dumps({"kind": "catalog", "pid": os.getpid(), "tag": "service"}))
+    assert catalog_cache.get(("service",)) is not None
+    changes._dispatch(json.dumps({"kind": "catalog", "pid": os.getpid() + 1, "tag": "service"}))
+    assert catalog_cache.get(("service",)) is None
+
+
+def test_metrics_include_other_workers_by_label(tmp_path, monkeypatch):
+    other_pid = os.getpid() + 1
+    other = [["http_requests_total", "counter", "Requests atendidos",
+              [["http_requests_total", {"endpoint": "x", "method": "GET", "status": "200"}, 7]]]]
+    (tmp_path / f"{other_pid}.json").write_text(json.dumps(other))
+    monkeypatch.setattr(instrumentation, "METRICS_DIR", str(tmp_path))
+    instrumentation.write_snapshot()
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+
+    text = instrumentation.metrics.render()
+    assert f'http_requests_total{{endpoint="x",method="GET",status="200",worker="{other_pid}"}} 7' in text
+    # Cada familia aparece una sola vez aunque venga de varios workers
+    assert text.count("# TYPE http_requests_total counter") == 1
+
+    instrumentation.remove_snapshot(other_pid)
+    assert f'worker="{other_pid}"' not in instrumentation.metrics.render()
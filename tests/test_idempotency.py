@@ -0,0 +1,122 @@
+import threading
+import uuid
+
+import pytest
+
+import idempotency
+from conftest import reservations_for
+from database import pooled_connection
+
+
+def post(client, payload, key):
+    return client.post("/reservations", json=payload, headers={"Idempotency-Key": key})
+
+
+def test_retry_after_failed_store_books_once_and_then_replays(client, booking, monkeypatch):
+    key = uuid.uuid4().hex
+    # Falla el paso que guarda la respuesta de la clave
+    monkeypatch.setattr(idempotency, "STORE_QUERY", "SELECT %s, %s, %s, 1/0;")
+    failed = post(client, booking, key)
+    assert failed.status_code == 500
+    # La reserva se deshizo junto con la clave: no quedó nada a medias
+    assert reservations_for(booking["customer_email"]) == []
+
+    monkeypatch.undo()
+    first = post(client, booking, key)
+    assert first.status_code == 201
+    replay = post(client, booking, key)
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json["reservation_id"] == first.json["reservation_id"]
+    assert reservations_for(booking["customer_email"]) == [first.json["reservation_id"]]
+
+
+def test_retry_after_crash_following_commit_replays(client, booking, monkeypatch):
+    key = uuid.uuid4().hex
+    real_commit = idempotency.commit
+
+    def commit_then_crash(conn):
+        # Como si el worker muriera justo después de confirmar, sin llegar a responder
+        real_commit(conn)
+        raise RuntimeError("worker caído")
+
+    monkeypatch.setattr(idempotency, "commit", commit_then_crash)
+    assert post(client, booking, key).status_code == 500
+    monkeypatch.undo()
+
+    [reservation_id] = reservations_for(booking["customer_email"])
+    replay = post(client, booking, key)
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json["reservation_id"] == reservation_id
+    assert reservations_for(booking["customer_email"]) == [reservation_id]
+
+
+def test_concurrent_duplicates_book_once(client, booking):
+    key = uuid.uuid4().hex
+    responses = []
+    lock = threading.Lock()
+
+    def send():
+        response = post(client, booking, key)
+        with lock:
+            responses.append(response)
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [r.status_code for r in responses] == [201] * 4
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 3
+    assert reservations_for(booking["customer_email"]) == [responses[0].json["reservation_id"]]
+
+
+def test_same_key_with_another_body_is_rejected(client, booking):
+    key = uuid.uuid4().hex
+    assert post(client, booking, key).status_code == 201
+    assert post(client, dict(booking, adults=1), key).status_code == 422
+    assert len(reservations_for(booking["customer_email"])) == 1
+
+
+@pytest.mark.parametrize("key", ["", "   ", "x" * (idempotency.IDEMPOTENCY_KEY_MAX_LENGTH + 1)])
+def test_invalid_keys_are_rejected(client, booking, key):
+    assert post(client, booking, key).status_code == 400
+    assert reservations_for(booking["customer_email"]) == []
+
+
+def test_failed_request_does_not_keep_the_key(client, booking):
+    key = uuid.uuid4().hex
+    assert post(client, dict(booking, adults=0), key).status_code == 400
+    # El pedido corregido con la misma clave se procesa
+    created = post(client, booking, key)
+    assert created.status_code == 201
+    assert "Idempotent-Replayed" not in created.headers
+
+
+def test_expired_key_can_be_reused(client, booking):
+    key = uuid.uuid4().hex
+    assert post(client, booking, key).status_code == 201
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE idempotency_key SET created_at = now() - interval '1 day' - make_interval(secs => %s) WHERE key = %s;",
+                        (idempotency.IDEMPOTENCY_KEY_TTL_HOURS * 3600, key))
+        conn.commit()
+    second = post(client, dict(booking, adults=1), key)
+    assert second.status_code == 201
+    assert len(reservations_for(booking["customer_email"])) == 2
+
+
+def test_request_in_flight_answers_409(client, booking, monkeypatch):
+    key = uuid.uuid4().hex
+    # Como si otro worker hubiera tomado la clave y todavía no guardara la respuesta
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(idempotency.CLAIM_QUERY, {"key": key, "fingerprint": "", "ttl": idempotency.IDEMPOTENCY_KEY_TTL_HOURS * 3600})
+        conn.commit()
+    monkeypatch.setattr(idempotency, "_fingerprint", lambda: "")
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    response = post(client, booking, key)
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    assert reservations_for(booking["customer_email"]) == []
@@ -0,0 +1,106 @@
+import io
+from types import SimpleNamespace
+
+import pytest
+
+import catalog_import
+from catalog_import import CatalogImport, ImportFormatError, _CopySource, _open_records
+
+
+def run(table, text, fmt="csv", skip_invalid=False, room_type_ids=()):
+    """Valida las filas sin base: devuelve (líneas para COPY, importación)."""
+    columns, records = _open_records(io.StringIO(text), fmt, table)
+    job = CatalogImport(table, records, columns, set(room_type_ids), skip_invalid)
+    return list(job), job
+
+
+def test_valid_csv_rows_become_copy_lines():
+    rows, job = run("service", "name,description,price,gallery\nSpa,Masajes\tcon piedras,25.5,\nSauna,\"Seco\nY húmedo\",10,a\\b\n")
+    assert rows == ["Spa\tMasajes\\tcon piedras\t25.5\t\\N\n", "Sauna\tSeco\\nY húmedo\t10\ta\\\\b\n"]
+    assert (job.copied, job.rejected, job.errors) == (2, 0, [])
+    assert job.columns == ["name", "description", "price", "gallery"]
+
+
+def test_invalid_rows_are_reported_with_their_line():
+    text = "name,description,price\nSpa,Masajes,-1\n,Sin nombre,5\nSauna,Seco,diez\nGym,Pesas,3,extra\n"
+    rows, job = run("service", text)
+    assert rows == []
+    assert job.errors == [
+        {"line": 2, "message": "'price' debe ser un número no negativo"},
+        {"line": 3, "message": "falta 'name'"},
+        {"line": 4, "message": "'price' debe ser un número"},
+        {"line": 5, "message": "tiene más valores que columnas el encabezado"},
+    ]
+
+
+def test_rows_after_the_first_error_are_validated_but_not_sent():
+    rows, job = run("service", "name,description,price\nSpa,Masajes,1\nSauna,Seco,x\nGym,Pesas,3\n")
+    # La primera ya se había mandado; la importación se deshace igual por el error
+    assert rows == ["Spa\tMasajes\t1\n"]
+    assert (job.copied, job.rejected) == (1, 1)
+
+
+def test_skip_invalid_keeps_the_valid_rows():
+    rows, job = run("service", "name,description,price\nSpa,Masajes,1\nSauna,Seco,x\nGym,Pesas,3\n", skip_invalid=True)
+    assert rows == ["Spa\tMasajes\t1\n", "Gym\tPesas\t3\n"]
+    assert job.lines.tolist() == [2, 4]
+
+
+def test_errors_listed_are_capped(monkeypatch):
+    monkeypatch.setattr(catalog_import, "IMPORT_MAX_ERRORS", 2)
+    _, job = run("service", "name,description,price\n" + "Spa,Masajes,x\n" * 5)
+    assert job.rejected == 5
+    assert len(job.errors) == 2
+
+
+def test_room_needs_an_existing_room_type():
+    rows, job = run("room", "type_id,number,price_per_night\n1,101,80\n9,102,80\n1.5,103,80\n", room_type_ids={1})
+    assert rows == ["1\t101\t80\n"]
+    assert [e["message"] for e in job.errors] == ["no existe el tipo de habitación 9", "'type_id' debe ser un entero"]
+
+
+def test_ndjson_rows():
+    text = '{"name": "Spa", "description": "Masajes", "price": 25}\n\nno es json\n[1]\n{"name": "Gym", "description": {"a": 1}, "price": 3}\n'
+    rows, job = run("service", text, fmt="ndjson", skip_invalid=True)
+    assert rows == ["Spa\tMasajes\t25\t\\N\n"]
+    assert job.errors == [
+        {"line": 3, "message": "no es un JSON válido"},
+        {"line": 4, "message": "debe ser un objeto JSON"},
+        {"line": 5, "message": "'description' debe ser un texto"},
+    ]
+
+
+def test_ndjson_ids_all_or_none():
+    text = '{"name": "Spa", "description": "Masajes", "price": 25}\n{"id": 7, "name": "Gym", "description": "Pesas", "price": 3}\n'
+    rows, job = run("service", text, fmt="ndjson", skip_invalid=True)
+    assert len(rows) == 1
+    assert "o todas lo traen o ninguna" in job.errors[0]["message"]
+
+    rows, job = run("service", '{"id": 7, "name": "Gym", "description": "Pesas", "price": 3}\n', fmt="ndjson")
+    assert rows == ["7\tGym\tPesas\t3\t\\N\n"]
+    assert job.max_id == 7
+
+
+@pytest.mark.parametrize("table, text, fmt", [
+    ("service", "name,price\nSpa,1\n", "csv"),
+    ("service", "name,description,price,color\nSpa,x,1,rojo\n", "csv"),
+    ("service", "name,description,price\n", "xml"),
+])
+def test_invalid_files_raise_format_error(table, text, fmt):
+    with pytest.raises(ImportFormatError):
+        run(table, text, fmt)
+
+
+def test_copy_source_reads_rows_in_blocks():
+    source = _CopySource(["ab\n", "cdé\n", "f\n"])
+    assert source.read(2) == b"ab"
+    assert source.read(4) == b"\ncd\xc3"
+    assert source.read() == b"\xa9\nf\n"
+    assert source.read(10) == b""
+
+
+def test_copy_error_is_mapped_to_the_input_line():
+    _, job = run("service", "name,description,price\nSpa,Masajes,1\nSauna,Seco,x\nGym,Pesas,3\n", skip_invalid=True)
+    error = SimpleNamespace(diag=SimpleNamespace(context='COPY service, line 2: "Gym\tPesas\t3"'))
+    assert job.line_of_copy_error(error) == 4
+    assert job.line_of_copy_error(SimpleNamespace(diag=SimpleNamespace(context=None))) is None
@@ -0,0 +1,101 @@
+import io
+import json
+import select
+import uuid
+
+import psycopg2
+import pytest
+
+import changes
+from catalog_import import import_catalog
+from database import DATABASE_URL, pooled_connection
+
+
+@pytest.fixture
+def service_name(app):
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    yield name
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM service WHERE name = %s;", (name,))
+        conn.commit()
+
+
+def count_services(name):
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) AS n FROM service WHERE name = %s;", (name,))
+            n = cur.fetchone()["n"]
+        conn.rollback()
+    return n
+
+
+def csv_for(name):
+    return f"name,description,price\n{name},Servicio de prueba,10.50\n"
+
+
+def test_import_notifies_other_workers_in_its_transaction(client, service_name):
+    listener = psycopg2.connect(DATABASE_URL)
+    listener.autocommit = True
+    try:
+        with listener.cursor() as cur:
+            cur.execute(f"LISTEN {changes.CHANGES_CHANNEL};")
+        response = client.post("/import/service", data=csv_for(service_name), content_type="text/csv")
+        assert response.status_code == 201
+        select.select([listener], [], [], 5)
+        listener.poll()
+        tags = [json.loads(n.payload).get("tag") for n in listener.notifies]
+        assert "service" in tags
+    finally:
+        listener.close()
+
+
+def test_failed_notify_rolls_back_the_import(app, service_name):
+    def fail(cur):
+        raise psycopg2.OperationalError("se cayó la conexión")
+
+    with pooled_connection() as conn:
+        with pytest.raises(psycopg2.OperationalError):
+            import_catalog(conn, "service", io.StringIO(csv_for(service_name)), before_commit=fail)
+    # Sin aviso no queda importación: los otros workers nunca ven filas sin invalidar su cache
+    assert count_services(service_name) == 0
+
+
+def test_invalid_row_rejects_the_whole_import(client, service_name):
+    body = csv_for(service_name) + f"{service_name},Otro,gratis\n"
+    response = client.post("/import/service", data=body, content_type="text/csv")
+    assert response.status_code == 422
+    assert response.json["data"]["errors"] == [{"line": 3, "message": "'price' debe ser un número"}]
+    assert count_services(service_name) == 0
+
+    response = client.post("/import/service?skip_invalid=1", data=body, content_type="text/csv")
+    assert response.status_code == 201
+    assert (response.json["data"]["inserted"], response.json["data"]["rejected"]) == (1, 1)
+    assert count_services(service_name) == 1
+
+
+def test_row_rejected_by_the_database_is_reported_by_line(client, service_name):
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT max(id) AS id FROM service;")
+            taken = cur.fetchone()["id"]
+        conn.rollback()
+    if taken is None:
+        pytest.skip("La base no tiene servicios")
+    body = (f"id,name,description,price\n{taken + 1000},{service_name},Nuevo,1\n"
+            f"{taken},{service_name},Repetido,1\n")
+    response = client.post("/import/service?skip_invalid=1", data=body, content_type="text/csv")
+    assert response.status_code == 422
+    error, = response.json["data"]["errors"]
+    assert error["line"] == 3
+    assert count_services(service_name) == 0
+
+
+@pytest.mark.parametrize("path, body, content_type, status", [
+    ("/import/service", "name,description,price\n", "text/plain", 415),
+    ("/import/service", "name,price\nSpa,1\n", "text/csv", 400),
+    ("/import/reservation", "id\n1\n", "text/csv", 400),
+    ("/import/service", b"name,description,price\nSpa,Caf\xe9,1\n", "text/csv", 400),
+])
+def test_unusable_files_are_rejected(client, path, body, content_type, status):
+    assert client.post(path, data=body, content_type=content_type).status_code == status
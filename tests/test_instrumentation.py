@@ -0,0 +1,74 @@
+import logging
+import os
+import re
+
+import pytest
+
+import instrumentation
+from instrumentation import Histogram, Metrics, _sample, metrics
+
+
+def requests_for(endpoint):
+    return sum(count for (name, _, _), count in metrics.requests.items() if name == endpoint)
+
+
+def test_streamed_response_is_observed_when_closed(client):
+    endpoint = "rooms_bp.get_rooms"
+    before = requests_for(endpoint)
+    response = client.get("/rooms?stream=1")
+    if response.status_code != 200:
+        response.close()
+        pytest.skip("La base no tiene habitaciones")
+    # La vista terminó pero el cuerpo todavía no se generó: aún no cuenta
+    assert requests_for(endpoint) == before
+    response.get_data()
+    response.close()
+    assert requests_for(endpoint) == before + 1
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3):
+        hist.observe(value)
+    assert hist.counts == [1, 3]
+    assert hist.count == 4
+    assert hist.sum == pytest.approx(4.05)
+
+
+def test_render_uses_prometheus_text_format():
+    own = Metrics()
+    own.observe_request("rooms_bp.get_rooms", "GET", 200, 0.02, 3, 0.01)
+    own.observe_request("rooms_bp.get_rooms", "GET", 200, 2.0, 1, 0.5)
+    text = own.render()
+    worker = f'worker="{os.getpid()}"'
+    assert "# TYPE http_requests_total counter" in text
+    assert f'http_requests_total{{endpoint="rooms_bp.get_rooms",method="GET",status="200",{worker}}} 2' in text
+    assert f'http_request_duration_seconds_bucket{{endpoint="rooms_bp.get_rooms",le="0.025",{worker}}} 1' in text
+    assert f'http_request_duration_seconds_bucket{{endpoint="rooms_bp.get_rooms",le="+Inf",{worker}}} 2' in text
+    assert f'db_queries_total{{endpoint="rooms_bp.get_rooms",{worker}}} 4' in text
+
+
+def test_label_values_are_escaped():
+    assert _sample("x", {"path": 'a"b\\c\nd'}, 1) == 'x{path="a\\"b\\\\c\\nd"} 1'
+
+
+def test_server_timing_counts_the_request_queries(client):
+    response = client.get("/availability?checkin=2030-01-01&checkout=2030-01-02")
+    timing = response.headers["Server-Timing"]
+    assert re.fullmatch(r'db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, total;dur=[\d.]+', timing)
+
+
+def test_metrics_endpoint_exposes_request_counts(client):
+    client.get("/rooms")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'http_requests_total{endpoint="rooms_bp.get_rooms",method="GET"' in response.get_data(as_text=True)
+
+
+def test_slow_queries_are_logged(client, monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="instrumentation"):
+        client.get("/availability?checkin=2030-01-01&checkout=2030-01-02")
+    assert any("Consulta lenta" in record.getMessage() for record in caplog.records)
@@ -0,0 +1,78 @@
+import importlib.util
+import os
+import signal
+import threading
+
+import pytest
+
+import lifecycle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def sigterm(monkeypatch):
+    """Handler de SIGTERM de prueba; al terminar se restauran el handler y el estado de drenado."""
+    calls = []
+    done = threading.Event()
+
+    def previous(signum, frame):
+        calls.append(signum)
+        done.set()
+
+    original = signal.signal(signal.SIGTERM, previous)
+    monkeypatch.setattr(lifecycle, "_draining", threading.Event())
+    yield calls, done
+    signal.signal(signal.SIGTERM, original)
+
+
+def test_sigterm_drains_before_shutting_down(sigterm, monkeypatch):
+    calls, done = sigterm
+    monkeypatch.setattr(lifecycle, "DRAIN_DELAY_SECONDS", 0.2)
+    lifecycle.install_drain_handler()
+    signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+    # Primero solo deja de estar listo; el cierre del servidor llega después de la demora
+    assert lifecycle.is_draining()
+    assert calls == []
+    assert done.wait(5)
+    assert calls == [signal.SIGTERM]
+
+
+def test_sigterm_without_delay_shuts_down_at_once(sigterm, monkeypatch):
+    calls, _ = sigterm
+    monkeypatch.setattr(lifecycle, "DRAIN_DELAY_SECONDS", 0)
+    lifecycle.install_drain_handler()
+    signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+    assert lifecycle.is_draining()
+    assert calls == [signal.SIGTERM]
+
+
+def test_pre_fork_closes_the_master_pools(monkeypatch, tmp_path):
+    import database
+
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    spec = importlib.util.spec_from_file_location("gunicorn_conf_lifecycle", os.path.join(ROOT, "gunicorn.conf.py"))
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    closed = []
+    monkeypatch.setattr(database, "close_pool", lambda: closed.append(True))
+    assert conf.preload_app and conf.worker_class == "gthread"
+    conf.pre_fork(None, None)
+    assert closed == [True]
+
+
+def test_wsgi_exposes_the_app(app):
+    import wsgi
+
+    assert wsgi.application is app
+
+
+def test_ready_turns_503_while_draining(client, monkeypatch):
+    monkeypatch.setattr(lifecycle, "_draining", threading.Event())
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json["data"]["uptime_seconds"] >= 0
+    lifecycle.start_draining()
+    assert client.get("/ready").status_code == 503
+    # Sigue vivo: el balanceador no tiene que reiniciarlo
+    assert client.get("/live").status_code == 200
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from flask import Flask
+
+from database import get_pool
+from listing import LIST_MAX_LIMIT, page_args, page_query, with_page_info
+
+
+@pytest.fixture
+def request_with():
+    app = Flask(__name__)
+
+    def page(query):
+        with app.test_request_context("/rooms" + query):
+            return page_args()
+    return page
+
+
+def test_page_args(request_with):
+    assert request_with("") == (None, None)
+    assert request_with("?limit=10") == (10, 0)
+    assert request_with("?limit=10&after=42") == (10, 42)
+
+
+@pytest.mark.parametrize("query", ["?after=3", "?limit=diez", "?limit=0", f"?limit={LIST_MAX_LIMIT + 1}", "?limit=5&after=x"])
+def test_invalid_page_args(request_with, query):
+    with pytest.raises(ValueError):
+        request_with(query)
+
+
+def test_page_query_uses_the_id_key():
+    assert page_query("room", (None, None)) == ("SELECT * FROM room ORDER BY id;", ())
+    assert page_query("room", (20, 7)) == ("SELECT * FROM room WHERE id > %s ORDER BY id LIMIT %s;", (7, 20))
+
+
+def test_next_after_only_on_full_pages():
+    rows = [{"id": 3}, {"id": 8}]
+    assert with_page_info({}, rows, (2, 0)) == {"next_after": 8}
+    assert with_page_info({}, rows, (5, 0)) == {"next_after": None}
+    assert with_page_info({}, rows, (None, None)) == {}
+
+
+def all_rooms(client):
+    response = client.get("/rooms")
+    if response.status_code != 200:
+        pytest.skip("La base no tiene habitaciones")
+    return response.json["data"]
+
+
+def test_pages_cover_the_whole_table(client):
+    rooms = all_rooms(client)
+    limit = max(len(rooms) // 3, 1)
+    seen, after = [], 0
+    while after is not None:
+        response = client.get(f"/rooms?limit={limit}&after={after}")
+        assert response.status_code == 200
+        seen.extend(response.json["data"])
+        after = response.json["next_after"]
+    assert seen == rooms
+
+
+def test_stream_matches_the_buffered_listing(client):
+    rooms = all_rooms(client)
+    response = client.get("/rooms?stream=1")
+    assert response.is_streamed
+    body = json.loads(response.get_data())
+    response.close()
+    assert body["data"] == rooms
+    assert "next_after" not in body
+
+    response = client.get(f"/rooms?stream=1&limit=2&after={rooms[0]['id']}")
+    page = json.loads(response.get_data())
+    response.close()
+    assert page == client.get(f"/rooms?limit=2&after={rooms[0]['id']}").json
+
+
+def test_stream_returns_its_connection_when_closed(client):
+    all_rooms(client)
+    response = client.get("/rooms?stream=1")
+    # La conexión sigue afuera del pool mientras se genera la respuesta
+    assert get_pool().stats()["in_use"] == 1
+    response.get_data()
+    response.close()
+    assert get_pool().stats()["in_use"] == 0
+
+
+def test_invalid_page_is_rejected(client):
+    assert client.get("/rooms?limit=0").status_code == 400
+    assert client.get("/rooms?stream=1&after=5").status_code == 400
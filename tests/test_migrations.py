@@ -0,0 +1,67 @@
+import importlib.util
+import os
+
+import pytest
+
+import migrations
+from database import pooled_connection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_check_query_plans():
+    spec = importlib.util.spec_from_file_location("check_query_plans", os.path.join(ROOT, "bench", "check_query_plans.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_versions_are_consecutive():
+    assert [number for number, _, _ in migrations.MIGRATIONS] == list(range(1, len(migrations.MIGRATIONS) + 1))
+
+
+def test_pending_migrations():
+    latest = len(migrations.MIGRATIONS)
+    assert [m[0] for m in migrations.pending_migrations(0)] == list(range(1, latest + 1))
+    assert [m[0] for m in migrations.pending_migrations(1, target=3)] == [2, 3]
+    assert migrations.pending_migrations(latest) == []
+
+
+class PlanCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def execute(self, query):
+        assert query.startswith("EXPLAIN (FORMAT JSON) ")
+
+    def fetchone(self):
+        return {"QUERY PLAN": [{"Plan": self.plan}]}
+
+
+def test_check_plan_flags_seq_scans_on_large_tables():
+    check = load_check_query_plans()
+    plan = {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "room_type"},
+        {"Node Type": "Hash", "Plans": [{"Node Type": "Seq Scan", "Relation Name": "reservation"}]},
+        {"Node Type": "Index Scan", "Relation Name": "room", "Index Name": "room_pkey"},
+    ]}
+    root, bad = check.check_plan(PlanCursor(plan), "SELECT 1", check.LARGE_TABLES)
+    assert root is plan
+    assert [node["Relation Name"] for node in bad] == ["reservation"]
+    assert check.describe(plan)[-1] == "  -> Index Scan on room using room_pkey"
+
+
+def test_database_is_migrated(app):
+    with pooled_connection() as conn:
+        logged = []
+        assert migrations.migrate(conn, log=logged.append) == len(migrations.MIGRATIONS)
+        assert logged == []
+
+
+@pytest.mark.parametrize("sql", [m[2] for m in migrations.MIGRATIONS], ids=[f"v{m[0]}" for m in migrations.MIGRATIONS])
+def test_migrations_can_run_again(app, sql):
+    # Se aplican sobre la base que ya existe: volver a correrlas no cambia nada ni falla
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        conn.rollback()
@@ -0,0 +1,162 @@
+from datetime import date
+
+import occupancy
+from occupancy import OccupancyIndex, _merge_sorted
+
+
+def d(day):
+    """Un día de enero de 2030."""
+    return date(2030, 1, day)
+
+
+class FakeConnection:
+    """Conexión sin base que responde las consultas del índice con filas fijas."""
+
+    def __init__(self, rooms, stays):
+        self.rooms = rooms  # [(room_id, type_id)]
+        self.stays = stays  # [(room_id, checkin, checkout, reservation_id)]
+        self.rows = []
+
+    def cursor(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if query == occupancy.ROOMS_QUERY:
+            self.rows = [{'id': room_id, 'type_id': type_id} for room_id, type_id in self.rooms]
+        elif query == occupancy.STAYS_QUERY:
+            self.rows = list(self.stays)
+        elif query == occupancy.SYNC_QUERY:
+            self.rows = [('room', room_id, type_id, None, None)
+                         for room_id, type_id in self.rooms if room_id > params['room_id']]
+            self.rows += [('stay', reservation_id, room_id, checkin, checkout)
+                          for room_id, checkin, checkout, reservation_id in self.stays
+                          if reservation_id > params['reservation_id']]
+        else:
+            raise AssertionError(query)
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def loaded_index(rooms, stays):
+    index = OccupancyIndex()
+    index.load(FakeConnection(rooms, stays))
+    return index
+
+
+def test_merge_joins_overlapping_and_touching_stays():
+    stays = [(d(1), d(3)), (d(2), d(4)), (d(4), d(6)), (d(8), d(9)), (d(8), d(9))]
+    assert _merge_sorted(stays) == ([d(1), d(8)], [d(6), d(9)])
+
+
+def test_merge_keeps_a_contained_stay_inside():
+    assert _merge_sorted([(d(1), d(10)), (d(2), d(3))]) == ([d(1)], [d(10)])
+
+
+def test_checkout_day_is_free_for_the_next_guest():
+    index = loaded_index([(1, 10)], [(1, d(5), d(8), 1)])
+    assert index.is_free(1, d(8), d(10))
+    assert index.is_free(1, d(1), d(5))
+    assert not index.is_free(1, d(7), d(9))
+    assert not index.is_free(1, d(4), d(6))
+    assert not index.is_free(1, d(6), d(7))
+    assert not index.is_free(1, d(1), d(20))
+
+
+def test_room_without_stays_is_free():
+    index = loaded_index([(1, 10)], [])
+    assert index.is_free(1, d(1), d(2))
+    assert index.is_free(99, d(1), d(2))
+
+
+def test_is_free_accepts_iso_strings():
+    index = loaded_index([(1, 10)], [(1, d(5), d(8), 1)])
+    assert not index.is_free(1, "2030-01-06", "2030-01-07")
+
+
+def test_inserted_stay_bridging_two_intervals_merges_them():
+    index = loaded_index([(1, 10)], [(1, d(1), d(3), 1), (1, d(5), d(7), 2)])
+    assert index.is_free(1, d(3), d(5))
+    index.add_stay(1, d(3), d(5))
+    assert index._starts[1] == [d(1)]
+    assert index._ends[1] == [d(7)]
+    assert not index.is_free(1, d(4), d(5))
+
+
+def test_inserted_stay_in_a_gap_keeps_order():
+    index = loaded_index([(1, 10)], [(1, d(1), d(2), 1), (1, d(10), d(12), 2)])
+    index.add_stay(1, d(5), d(6))
+    assert index._starts[1] == [d(1), d(5), d(10)]
+    assert index._ends[1] == [d(2), d(6), d(12)]
+
+
+def test_free_rooms_and_counts_by_type():
+    rooms = [(1, 10), (2, 10), (3, 20)]
+    index = loaded_index(rooms, [(2, d(1), d(5), 1), (3, d(3), d(4), 2)])
+    assert index.free_rooms(10, d(2), d(3)) == [1]
+    assert index.free_rooms(10, d(5), d(6)) == [1, 2]
+    assert index.free_counts(d(3), d(4)) == {10: 1}
+    assert index.free_counts(d(6), d(7)) == {10: 2, 20: 1}
+
+
+def test_add_stay_bumps_version():
+    index = loaded_index([(1, 10)], [])
+    version = index.version
+    index.add_stay(1, "2030-01-01", "2030-01-02")
+    assert index.version == version + 1
+
+
+def test_sync_adds_new_rooms_and_stays_once():
+    conn = FakeConnection([(1, 10)], [(1, d(1), d(2), 1)])
+    index = OccupancyIndex()
+    index.load(conn)
+    conn.rooms.append((2, 10))
+    conn.stays.append((2, d(3), d(4), 2))
+    version = index.version
+    index.sync(conn)
+    assert index.room_ids(10) == [1, 2]
+    assert not index.is_free(2, d(3), d(4))
+    assert (index.max_room_id, index.max_reservation_id) == (2, 2)
+    assert index.version == version + 1
+    # La ventana de OCCUPANCY_SYNC_LOOKBACK vuelve a traer las mismas reservas: no es un cambio
+    index.sync(conn)
+    assert index.version == version + 1
+    assert index._starts[2] == [d(3)]
+
+
+def test_daily_free_counts_per_night():
+    rooms = [(1, 10), (2, 10), (3, 20)]
+    stays = [
+        (1, d(3), d(6), 1),
+        (2, d(1), d(2), 2),  # termina el día en que empieza la ventana
+        (2, d(5), d(7), 3),
+        (3, d(7), d(10), 4),  # sigue después del fin de la ventana
+    ]
+    counts = loaded_index(rooms, stays).daily_free_counts(d(2), d(7))
+    assert counts == {10: (2, [2, 1, 1, 0, 1, 2]), 20: (1, [1, 1, 1, 1, 1, 0])}
+
+
+def test_daily_free_counts_match_night_by_night_checks():
+    rooms = [(room_id, 10 + room_id % 3) for room_id in range(1, 10)]
+    stays = []
+    for room_id, _ in rooms:
+        start = room_id % 4 + 1
+        while start < 28:
+            nights = room_id % 3 + 1
+            stays.append((room_id, d(start), d(start + nights), len(stays) + 1))
+            start += nights + room_id % 5
+    index = loaded_index(rooms, stays)
+    counts = index.daily_free_counts(d(3), d(20))
+    for type_id, (total, free) in counts.items():
+        assert total == len(index.room_ids(type_id))
+        expected = [len(index.free_rooms(type_id, d(day), d(day + 1))) for day in range(3, 21)]
+        assert free == expected
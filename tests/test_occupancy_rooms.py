@@ -0,0 +1,69 @@
+import uuid
+
+import occupancy
+from database import pooled_connection
+
+
+class FakeConnection:
+    """Conexión que devuelve siempre las mismas filas (id, type_id) de room."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        assert query == occupancy.ROOMS_QUERY
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_sync_rooms_adds_rooms_with_lower_ids():
+    index = occupancy.OccupancyIndex()
+    index.sync_rooms(FakeConnection([(5, 1), (9, 2)]))
+    assert index.max_room_id == 9
+    version = index.version
+    # Una importación con un id menor que el último visto
+    assert index.sync_rooms(FakeConnection([(5, 1), (9, 2), (3, 1)])) == 1
+    assert index.room_ids(1) == [3, 5]
+    assert index.version == version + 1
+    assert index.sync_rooms(FakeConnection([(5, 1), (9, 2), (3, 1)])) == 0
+    assert index.version == version + 1
+
+
+def test_room_import_refreshes_rooms_without_reloading_stays(client, monkeypatch):
+    index = occupancy.get_occupancy_index()
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT type_id FROM room LIMIT 1;")
+            type_id = cur.fetchone()["type_id"]
+        conn.rollback()
+    number = f"T{uuid.uuid4().hex[:8]}"
+
+    def full_reload(conn):
+        raise AssertionError("la importación no tiene que recargar todas las reservas")
+
+    monkeypatch.setattr(index, "load", full_reload)
+    try:
+        response = client.post("/import/room", data=f"type_id,number,price_per_night\n{type_id},{number},80\n",
+                               content_type="text/csv")
+        assert response.status_code == 201, response.json
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id FROM room WHERE number = %s;", (number,))
+                room_id = cur.fetchone()["id"]
+            conn.rollback()
+        assert room_id in index.room_ids(type_id)
+    finally:
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM room WHERE number = %s;", (number,))
+            conn.commit()
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from cache import catalog_cache
+from routes.packages import load_packages
+
+
+class FakeCursor:
+    """Devuelve filas fijas según la tabla de la consulta y las cuenta."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.queries = []
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.queries.append((query, params))
+        table = re.search(r'FROM (\w+)', query).group(1)
+        self.rows = [dict(row) for row in self.tables[table]]
+
+    def fetchall(self):
+        return self.rows
+
+
+def catalog(packages):
+    return {
+        'package': [{'id': i, 'name': f'Pack {i}'} for i in range(1, packages + 1)],
+        'room_type': [{'package_id': i, 'id': 10, 'name': 'Doble', 'description': '', 'gallery': []}
+                      for i in range(1, packages + 1)],
+        'activity': [{'package_id': i, 'id': 20 + a, 'name': f'Actividad {a}', 'description': '', 'price': 5,
+                      'gallery': [], 'schedule': ''} for i in range(1, packages + 1) for a in range(i)],
+        'service': [{'package_id': 1, 'id': 30, 'name': 'Spa', 'description': '', 'price': 9, 'gallery': []}],
+    }
+
+
+@pytest.mark.parametrize("packages", [1, 5, 50])
+def test_packages_are_loaded_with_four_queries(packages):
+    cur = FakeCursor(catalog(packages))
+    data = load_packages(cur)
+    assert len(cur.queries) == 4
+    assert len(data) == packages
+
+
+def test_packages_are_assembled_from_the_joined_rows():
+    cur = FakeCursor(catalog(3))
+    first, second, third = load_packages(cur)
+    assert first['room_type'] == {'id': 10, 'name': 'Doble', 'description': '', 'gallery': []}
+    assert [a['id'] for a in third['activities']] == [20, 21, 22]
+    assert [s['name'] for s in first['services']] == ['Spa']
+    assert second['services'] == []
+
+
+def test_selected_packages_are_filtered_in_every_query():
+    cur = FakeCursor(catalog(2))
+    load_packages(cur, [2])
+    assert all(params == ([2],) and '= ANY(%s)' in query for query, params in cur.queries)
+
+
+def test_no_packages_stops_after_first_query():
+    cur = FakeCursor({'package': []})
+    assert load_packages(cur, [99]) == []
+    assert len(cur.queries) == 1
+
+
+def test_expand_full_matches_each_package(client):
+    catalog_cache.clear()
+    response = client.get("/package?expand=full")
+    if response.status_code == 404:
+        pytest.skip("La base no tiene paquetes")
+    assert response.status_code == 200
+    assert 'desc="4 queries"' in response.headers["Server-Timing"]
+    for package in response.json["data"][:5]:
+        assert client.get(f"/package/{package['id']}").json["data"] == package
@@ -0,0 +1,159 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2.pool import PoolError
+
+from database import ConnectionPool, PoolTimeoutError, get_pool
+
+
+class FakeConnection:
+    """Conexión sin base: cuenta los rollbacks y puede estar caída."""
+
+    def __init__(self, broken=False):
+        self.closed = 0
+        self.broken = broken
+        self.rollbacks = 0
+
+    def cursor(self):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, vars=None):
+        pass
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        opened.append(conn)
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return conn
+
+    monkeypatch.setattr(ConnectionPool, "_connect", connect)
+
+    def make(**kwargs):
+        pool = ConnectionPool("postgresql://fake", **dict({"minconn": 0, "maxconn": 2, "timeout": 0.2}, **kwargs))
+        pool.opened = opened
+        return pool
+    return make
+
+
+def test_invalid_sizes_are_rejected(make_pool):
+    for sizes in ({"minconn": 3, "maxconn": 2}, {"maxconn": 0}, {"minconn": -1}):
+        with pytest.raises(ValueError):
+            make_pool(**sizes)
+
+
+def test_connections_are_reused(make_pool):
+    pool = make_pool(minconn=1)
+    assert len(pool.opened) == 1
+    conn = pool.getconn()
+    assert conn is pool.opened[0]
+    pool.putconn(conn)
+    # Al devolverla se descarta cualquier transacción abierta
+    assert conn.rollbacks == 1
+    assert pool.getconn() is conn
+    assert pool.stats()["connections_opened"] == 1
+    assert pool.stats()["borrows"] == 2
+
+
+def test_most_recently_returned_connection_is_lent_first(make_pool):
+    pool = make_pool()
+    first, second = pool.getconn(), pool.getconn()
+    pool.putconn(first)
+    pool.putconn(second)
+    assert pool.getconn() is second
+
+
+def test_getconn_times_out_when_exhausted(make_pool):
+    pool = make_pool(maxconn=1, timeout=0.05)
+    pool.getconn()
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["in_use"] == 1
+
+
+def test_waiter_gets_returned_connection(make_pool):
+    pool = make_pool(maxconn=1, timeout=5)
+    conn = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while pool.stats()["waiting"] == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    pool.putconn(conn)
+    waiter.join()
+    assert got == [conn]
+    assert len(pool.opened) == 1
+    assert pool.stats()["wait_seconds_max"] > 0
+
+
+def test_broken_idle_connection_is_replaced(make_pool):
+    pool = make_pool(healthcheck_idle=0)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    replacement = pool.getconn()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.stats()["healthcheck_failures"] == 1
+
+
+def test_recently_used_connection_skips_healthcheck(make_pool):
+    pool = make_pool(healthcheck_idle=60)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    assert pool.getconn() is conn
+
+
+def test_connection_that_fails_rollback_is_discarded(make_pool):
+    pool = make_pool(maxconn=1)
+    conn = pool.getconn()
+    conn.broken = True
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.stats()["idle"] == 0
+    # El lugar quedó libre para una conexión nueva
+    assert pool.getconn() is not conn
+
+
+def test_closed_pool_refuses_connections(make_pool):
+    pool = make_pool(minconn=1)
+    idle = pool.opened[0]
+    conn = pool.getconn()
+    pool.putconn(conn)
+    pool.closeall()
+    assert idle.closed
+    with pytest.raises(PoolError):
+        pool.getconn()
+
+
+def test_request_connection_is_returned_after_the_request(client):
+    assert client.get("/room_types").status_code in (200, 404)
+    assert get_pool().stats()["in_use"] == 0
@@ -0,0 +1,148 @@
+import psycopg2
+import pytest
+
+import database
+from database import PreparedStatement, pooled_connection, prepared_statement
+
+
+class FakeConnection:
+    """Conexión del pool sin base: `prepared`, `stale` y `deferred` como PooledConnection."""
+
+    def __init__(self, pooled=True):
+        if pooled:
+            self.prepared = set()
+            self.stale = set()
+            self.deferred = []
+
+
+class FakeCursor:
+    """Anota lo que se ejecuta; `fail` hace fallar el próximo EXECUTE."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+        self.fail = None
+
+    def execute(self, query, vars=None):
+        self.executed.append((query, vars))
+        if self.fail and query.startswith("EXECUTE"):
+            error, self.fail = self.fail, None
+            raise error
+
+
+def test_positional_placeholders_are_numbered():
+    statement = PreparedStatement("free_rooms", "SELECT id FROM room WHERE type_id = %s AND id <> %s;")
+    assert statement.prepare_sql == "PREPARE free_rooms AS SELECT id FROM room WHERE type_id = $1 AND id <> $2"
+    assert statement.execute_sql == "EXECUTE free_rooms (%s, %s)"
+    assert statement.params_count == 2
+    assert statement.bind((4, 7)) == [4, 7]
+
+
+def test_named_placeholders_are_reused_in_order():
+    statement = PreparedStatement(
+        "stays", "SELECT 1 WHERE %(checkin)s < %(checkout)s AND %(checkin)s::date > now() AND note LIKE 'x%%'")
+    assert statement.names == ["checkin", "checkout"]
+    assert statement.prepare_sql == "PREPARE stays AS SELECT 1 WHERE $1 < $2 AND $1::date > now() AND note LIKE 'x%'"
+    assert statement.execute_sql == "EXECUTE stays (%s, %s)"
+    assert statement.bind({"checkout": "2090-01-03", "checkin": "2090-01-01", "other": 1}) == ["2090-01-01", "2090-01-03"]
+
+
+def test_statement_without_parameters():
+    statement = PreparedStatement("room_count", "SELECT count(*) FROM room")
+    assert statement.execute_sql == "EXECUTE room_count"
+    assert statement.bind(()) == []
+
+
+def test_mixed_placeholders_are_rejected():
+    with pytest.raises(ValueError):
+        PreparedStatement("mixed", "SELECT %s, %(x)s")
+
+
+def test_registering_another_query_under_the_same_name_fails(monkeypatch):
+    monkeypatch.setattr(database, "_statements", {})
+    first = prepared_statement("test_registry", "SELECT %s")
+    assert prepared_statement("test_registry", "SELECT %s") is not first
+    assert database.get_prepared_statements()["test_registry"].query == "SELECT %s"
+    with pytest.raises(ValueError):
+        prepared_statement("test_registry", "SELECT %s + 1")
+
+
+def test_prepares_once_per_connection():
+    statement = PreparedStatement("test_once", "SELECT %s")
+    cur = FakeCursor(FakeConnection())
+    statement.execute(cur, (1,))
+    statement.execute(cur, (2,))
+    assert cur.executed == [
+        ("PREPARE test_once AS SELECT $1", None),
+        ("EXECUTE test_once (%s)", [1]),
+        ("EXECUTE test_once (%s)", [2]),
+    ]
+    # Otra conexión del pool la prepara de nuevo
+    other = FakeCursor(FakeConnection())
+    statement.execute(other, (3,))
+    assert other.executed[0] == ("PREPARE test_once AS SELECT $1", None)
+    assert (statement.prepares, statement.executions) == (2, 3)
+
+
+def test_deferred_commands_and_prefix_travel_with_execute():
+    statement = PreparedStatement("test_prefix", "SELECT %s")
+    conn = FakeConnection()
+    cur = FakeCursor(conn)
+    database.defer(cur, "SET LOCAL lock_timeout = '1s';")
+    statement.execute(cur, (1,), prefix="SAVEPOINT s;")
+    assert cur.executed[-1] == ("SET LOCAL lock_timeout = '1s'; SAVEPOINT s;EXECUTE test_prefix (%s)", [1])
+    assert conn.deferred == []
+
+
+def test_plain_query_outside_the_pool_or_when_disabled(monkeypatch):
+    statement = PreparedStatement("test_plain", "SELECT %(x)s")
+    cur = FakeCursor(FakeConnection(pooled=False))
+    statement.execute(cur, {"x": 1})
+    assert cur.executed == [("SELECT %(x)s", {"x": 1})]
+    monkeypatch.setattr(database, "DB_PREPARED_STATEMENTS", False)
+    conn = FakeConnection()
+    cur = FakeCursor(conn)
+    statement.execute(cur, {"x": 2})
+    assert cur.executed == [("SELECT %(x)s", {"x": 2})]
+    assert conn.prepared == set()
+
+
+def test_stale_plan_is_deallocated_and_prepared_again():
+    statement = PreparedStatement("test_stale", "SELECT * FROM room WHERE id = %s")
+    conn = FakeConnection()
+    cur = FakeCursor(conn)
+    statement.execute(cur, (1,))
+    cur.fail = psycopg2.errors.FeatureNotSupported("cached plan must not change result type")
+    with pytest.raises(psycopg2.errors.FeatureNotSupported):
+        statement.execute(cur, (1,))
+    assert conn.prepared == set()
+    assert conn.stale == {"test_stale"}
+    cur.executed.clear()
+    statement.execute(cur, (1,))
+    assert [query for query, _ in cur.executed] == [
+        "DEALLOCATE test_stale",
+        "PREPARE test_stale AS SELECT * FROM room WHERE id = $1",
+        "EXECUTE test_stale (%s)",
+    ]
+    assert conn.stale == set()
+
+
+def test_pooled_connection_runs_execute(app):
+    statement = PreparedStatement("test_server_side", "SELECT %(a)s::int + %(b)s::int AS total, %(a)s::int AS a")
+    with pooled_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                assert statement.execute(cur, {"a": 2, "b": 3}) is None
+                assert cur.fetchone() == {"total": 5, "a": 2}
+                # Sobrevive al rollback: PREPARE no es transaccional
+                conn.rollback()
+                statement.execute(cur, {"a": 4, "b": 1})
+                assert cur.fetchone()["total"] == 5
+                cur.execute("SELECT statement FROM pg_prepared_statements WHERE name = 'test_server_side';")
+                assert cur.fetchone()["statement"] == statement.prepare_sql
+                assert statement.prepares == 1
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("DEALLOCATE test_server_side;")
+            conn.prepared.discard("test_server_side")
+            conn.rollback()
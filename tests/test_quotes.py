@@ -0,0 +1,112 @@
+from decimal import Decimal
+
+import pytest
+
+import routes.reservations as reservations
+from database import pooled_connection
+from pricing import PricingSnapshot, quote_itinerary
+
+SNAPSHOT = PricingSnapshot([
+    {"kind": "room", "id": 1, "ref_id": 7, "price": 100, "nights": None},
+    {"kind": "activity", "id": 3, "ref_id": None, "price": 20, "nights": None},
+    {"kind": "service", "id": 4, "ref_id": None, "price": 5, "nights": None},
+    {"kind": "package", "id": 9, "ref_id": 7, "price": 500, "nights": 3},
+])
+
+ITINERARY = {"room_type_id": 7, "checkin_date": "2090-01-01", "checkout_date": "2090-01-03"}
+
+
+def test_int_like_ids_are_accepted():
+    quote = quote_itinerary(SNAPSHOT, dict(ITINERARY, room_type_id="7", activity_ids=["3", 3], service_ids=[4]))
+    assert quote["room_type_id"] == 7
+    assert quote["amount"] == 2 * 100 + 20 + 5
+    assert quote_itinerary(SNAPSHOT, {"package_id": "9", "checkin_date": "2090-01-01"})["package_id"] == 9
+
+
+@pytest.mark.parametrize("itinerary", [
+    dict(ITINERARY, activity_ids=[[3]]),
+    dict(ITINERARY, service_ids=[{"id": 4}]),
+    dict(ITINERARY, room_type_id=[7]),
+    dict(ITINERARY, room_type_id=True),
+    {"package_id": {"id": 9}, "checkin_date": "2090-01-01"},
+    dict(ITINERARY, activity_ids=["tres"]),
+])
+def test_malformed_ids_raise_value_error(itinerary):
+    with pytest.raises(ValueError):
+        quote_itinerary(SNAPSHOT, itinerary)
+
+
+def test_malformed_itinerary_in_valid_batch(client, booking):
+    valid = {k: booking[k] for k in ("room_type_id", "checkin_date", "checkout_date")}
+    response = client.post("/reservations/quote", json={"itineraries": [
+        valid,
+        dict(valid, activity_ids=[[1]], service_ids=[{"id": 1}]),
+        dict(valid, room_type_id=[valid["room_type_id"]]),
+    ]})
+    assert response.status_code == 200
+    first, *malformed = response.json["data"]
+    assert first["status"] == "success"
+    assert [entry["status"] for entry in malformed] == ["error", "error"]
+
+
+def test_rooms_of_one_type_give_a_price_range():
+    snapshot = PricingSnapshot([
+        {"kind": "room", "id": 1, "ref_id": 7, "price": 100, "nights": None},
+        {"kind": "room", "id": 2, "ref_id": 7, "price": 130, "nights": None},
+    ])
+    quote = quote_itinerary(snapshot, ITINERARY)
+    assert (quote["nights"], quote["amount"], quote["amount_max"]) == (2, 200, 260)
+
+
+def test_package_quote_uses_package_price_and_nights():
+    quote = quote_itinerary(SNAPSHOT, {"package_id": 9, "checkin_date": "2090-01-01", "activity_ids": [3]})
+    assert quote == {
+        "package_id": 9, "room_type_id": 7, "checkin_date": "2090-01-01", "checkout_date": "2090-01-04",
+        "nights": 3, "amount": 500, "amount_max": 500,
+    }
+
+
+@pytest.mark.parametrize("itinerary, message", [
+    (dict(ITINERARY, checkout_date="2090-01-01"), "posterior"),
+    (dict(ITINERARY, checkin_date="mañana"), "checkin_date"),
+    (dict(ITINERARY, room_type_id=8), "Tipo de habitación"),
+    (dict(ITINERARY, activity_ids=[99]), "actividades"),
+    (dict(ITINERARY, service_ids=4), "lista"),
+    ({"package_id": 10, "checkin_date": "2090-01-01"}, "Paquete"),
+    ("itinerario", "objeto"),
+])
+def test_invalid_itineraries(itinerary, message):
+    with pytest.raises(ValueError, match=message):
+        quote_itinerary(SNAPSHOT, itinerary)
+
+
+def test_quote_matches_booking_and_availability(client, booking):
+    itinerary = {k: booking[k] for k in ("room_type_id", "checkin_date", "checkout_date")}
+    before, = client.post("/reservations/quote", json={"itineraries": [itinerary]}).json["data"]
+    created = client.post("/reservations", json=booking)
+    assert created.status_code == 201
+    after, = client.post("/reservations/quote", json={"itineraries": [itinerary]}).json["data"]
+    assert after["available_rooms"] == before["available_rooms"] - 1
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT amount FROM reservation WHERE id = %s;", (created.json["reservation_id"],))
+            amount = cur.fetchone()["amount"]
+        conn.rollback()
+    # Los montos viajan como string para no perder decimales
+    assert Decimal(before["amount"]) <= amount <= Decimal(before["amount_max"])
+
+
+def test_quote_cost_does_not_grow_with_the_batch(client, booking):
+    itinerary = {k: booking[k] for k in ("room_type_id", "checkin_date", "checkout_date")}
+    client.post("/reservations/quote", json={"itineraries": [itinerary]})
+    response = client.post("/reservations/quote", json={"itineraries": [itinerary] * 200})
+    assert response.status_code == 200
+    assert len(response.json["data"]) == 200
+    # Snapshot de precios cacheado e índice en memoria: ninguna consulta por itinerario
+    assert 'desc="0 queries"' in response.headers["Server-Timing"]
+
+
+def test_quote_batch_limits(client):
+    assert client.post("/reservations/quote", json={"itineraries": []}).status_code == 400
+    too_many = [ITINERARY] * (reservations.QUOTE_MAX_ITINERARIES + 1)
+    assert client.post("/reservations/quote", json={"itineraries": too_many}).status_code == 400
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+import database
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Con alguna réplica configurada (no se usa: solo se decide si leer del primario)
+    monkeypatch.setattr(database, "_replicas", [object()])
+    monkeypatch.setattr(database, "_primary_until", 0.0)
+    app = Flask(__name__)
+    app.after_request(database._set_primary_pin)
+
+    @app.route("/write", methods=["POST"])
+    def write():
+        database.stick_to_primary()
+        return jsonify({"status": "success"}), 201
+
+    @app.route("/read")
+    def read():
+        return jsonify({"primary": database._reads_from_primary()})
+
+    return app.test_client()
+
+
+def test_pin_travels_in_header_without_cookies(client):
+    until = client.post("/write").headers[database.PRIMARY_HEADER]
+    # Un cliente de otro origen no manda la cookie, solo devuelve el header
+    client.delete_cookie(database.PRIMARY_COOKIE)
+    assert client.get("/read", headers={database.PRIMARY_HEADER: until}).json["primary"] is True
+    assert client.get("/read").json["primary"] is False
+
+
+def test_pin_still_read_from_cookie(client):
+    client.post("/write")
+    assert client.get("/read").json["primary"] is True
+
+
+@pytest.mark.parametrize("value", ["basura", str(time.time() + 3600), str(time.time() - 1)])
+def test_invalid_or_far_pins_are_ignored(client, value):
+    assert client.get("/read", headers={database.PRIMARY_HEADER: value}).json["primary"] is False
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from psycopg2.extensions import make_dsn
+
+import database
+
+
+@pytest.fixture
+def replicas(app, monkeypatch):
+    """
+    Configura réplicas que en realidad son el mismo servidor con otro DSN
+    (pools separados), o una caída. Al terminar cierra sus pools.
+    """
+    dsns = []
+
+    def configure(*names, down=()):
+        replicas = []
+        for number, name in enumerate(names):
+            if name in down:
+                dsn = "postgresql://nadie@127.0.0.1:1/hotel?connect_timeout=1"
+            else:
+                dsn = make_dsn(os.environ["DATABASE_URL"], application_name=f"replica_{name}")
+            dsns.append(dsn)
+            replicas.append(database.Replica(number, dsn))
+        monkeypatch.setattr(database, "_replicas", replicas)
+        return replicas
+
+    monkeypatch.setattr(database, "_primary_until", 0.0)
+    yield configure
+    for dsn in dsns:
+        pool = database._pools.pop(dsn, None)
+        if pool is not None:
+            pool.closeall()
+
+
+def application_name(conn):
+    with conn.cursor() as cur:
+        cur.execute("SHOW application_name;")
+        return cur.fetchone()["application_name"]
+
+
+def test_reads_go_to_a_healthy_replica(app, replicas):
+    replica, = replicas("a")
+    with app.test_request_context("/rooms"):
+        assert application_name(database.get_db_connection(readonly=True)) == "replica_a"
+        assert database.get_db_connection() is not database.get_db_connection(readonly=True)
+    assert replica.healthy and replica.lag_seconds == 0
+
+
+def test_request_that_used_the_primary_keeps_reading_from_it(app, replicas):
+    replicas("a")
+    with app.test_request_context("/reservations", method="POST"):
+        primary = database.get_db_connection()
+        assert database.get_db_connection(readonly=True) is primary
+
+
+def test_reads_rotate_between_replicas(app, replicas):
+    replicas("a", "b")
+    names = set()
+    for _ in range(4):
+        with app.test_request_context("/rooms"):
+            names.add(application_name(database.get_db_connection(readonly=True)))
+    assert names == {"replica_a", "replica_b"}
+
+
+def test_lagging_replica_is_skipped(app, replicas, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_MAX_LAG_SECONDS", -1)
+    replica, = replicas("a")
+    with app.test_request_context("/rooms"):
+        assert application_name(database.get_db_connection(readonly=True)) != "replica_a"
+    assert not replica.healthy
+
+
+def test_down_replica_falls_back_to_the_primary(app, replicas):
+    down, up = replicas("a", "b", down=("a",))
+    for _ in range(2):
+        with app.test_request_context("/rooms"):
+            assert application_name(database.get_db_connection(readonly=True)) == "replica_b"
+    assert not down.healthy and down.error
+    assert [r["healthy"] for r in database.get_replica_stats()] == [False, True]
+
+
+def test_worker_reads_from_primary_after_a_catalog_write(app, replicas):
+    replicas("a")
+    with app.test_request_context("/services", method="POST"):
+        database.stick_to_primary(worker=True)
+    with app.test_request_context("/services"):
+        assert application_name(database.get_db_connection(readonly=True)) != "replica_a"
@@ -0,0 +1,165 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import admin
+import reports
+import routes.reports as routes_reports
+from database import pooled_connection
+
+TOKEN = "secreto-de-prueba"
+
+
+def rooms_sold(booking):
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COALESCE(sum(rooms_sold), 0) AS sold FROM report_occupancy_daily WHERE day = %s AND room_type_id = %s;",
+                (booking["checkin_date"], booking["room_type_id"]),
+            )
+            sold = cur.fetchone()["sold"]
+        conn.rollback()
+    return sold
+
+
+def apply_pending():
+    with pooled_connection() as conn:
+        return reports.apply_pending(conn)
+
+
+def rebuild(client, booking, token=TOKEN):
+    return client.post(
+        f"/reports/rebuild?from={booking['checkin_date']}&to={booking['checkout_date']}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+def test_booking_is_added_to_rollups_outside_its_transaction(client, booking):
+    before = rooms_sold(booking)
+    assert client.post("/reservations/bulk", json=dict(booking, rooms=[{"adults": 2}, {"adults": 1}])).status_code == 201
+    # La reserva solo dejó su id en la cola
+    assert rooms_sold(booking) == before
+    assert apply_pending() >= 2
+    assert rooms_sold(booking) == before + 2
+
+
+def test_rebuild_counts_queued_bookings_once(client, booking, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    before = rooms_sold(booking)
+    assert client.post("/reservations", json=booking).status_code == 201
+    assert rebuild(client, booking).status_code == 200
+    assert rooms_sold(booking) == before + 1
+    # La reconstrucción ya la sacó de la cola
+    apply_pending()
+    assert rooms_sold(booking) == before + 1
+
+
+def test_rebuild_requires_admin_token(client, booking, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "")
+    assert rebuild(client, booking).status_code == 403
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    response = rebuild(client, booking, token="otro")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_concurrent_rebuild_is_rejected(client, booking, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(reports.TRY_LOCK_REBUILD_QUERY)
+            try:
+                assert rebuild(client, booking).status_code == 409
+            finally:
+                cur.execute(reports.UNLOCK_REBUILD_QUERY)
+        conn.commit()
+
+
+def test_occupancy_report_rejects_invalid_room_type(client, booking):
+    url = f"/reports/occupancy?from={booking['checkin_date']}&to={booking['checkout_date']}"
+    response = client.get(url + "&room_type_id=suite")
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+    response = client.get(url + f"&room_type_id={booking['room_type_id']}")
+    assert response.status_code == 200
+    assert {row["room_type_id"] for day in response.get_json()["data"] for row in day["room_types"]} == {booking["room_type_id"]}
+
+
+def first_activity():
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, price FROM activity ORDER BY id LIMIT 1;")
+            row = cur.fetchone()
+        conn.rollback()
+    if row is None:
+        pytest.skip("La base no tiene actividades")
+    return row
+
+
+@pytest.mark.parametrize("path", ["/reports/occupancy", "/reports/revenue", "/reports/kpis"])
+@pytest.mark.parametrize("query", [
+    "from=2090-01-01",
+    "from=2090-01-01&to=01/03/2090",
+    "from=2090-01-03&to=2090-01-01",
+    f"from=2090-01-01&to={date(2090, 1, 1) + timedelta(days=routes_reports.REPORT_MAX_DAYS)}",
+])
+def test_reports_reject_invalid_date_range(client, path, query):
+    response = client.get(f"{path}?{query}")
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_ratio_rounds_to_cents_and_ignores_zero_denominator():
+    assert routes_reports.ratio(Decimal("100.00"), 3) == Decimal("33.33")
+    assert routes_reports.ratio(Decimal("100.00"), 0) is None
+
+
+def test_kpis_count_new_booking_nights(client, booking):
+    url = f"/reports/kpis?from={booking['checkin_date']}&to={booking['checkout_date']}"
+
+    def room_type_kpis():
+        data = client.get(url).get_json()["data"]
+        [kpis] = [rt for rt in data["room_types"] if rt["room_type_id"] == booking["room_type_id"]]
+        return data["total"], kpis
+
+    total_before, before = room_type_kpis()
+    assert client.post("/reservations", json=booking).status_code == 201
+    apply_pending()
+    total, after = room_type_kpis()
+    # Dos noches de una habitación; el rango tiene tres días
+    assert after["rooms_sold"] == before["rooms_sold"] + 2
+    assert total["rooms_sold"] == total_before["rooms_sold"] + 2
+    assert after["rooms_available"] == before["rooms_available"]
+    assert after["rooms_available"] % 3 == 0
+    revenue = Decimal(after["room_revenue"])
+    assert revenue > Decimal(before["room_revenue"])
+    assert Decimal(after["adr"]) == (revenue / after["rooms_sold"]).quantize(Decimal("0.01"))
+    assert Decimal(after["revpar"]) == (revenue / after["rooms_available"]).quantize(Decimal("0.01"))
+    assert after["occupancy"] == round(after["rooms_sold"] / after["rooms_available"], 4)
+
+
+def test_revenue_report_counts_booked_activity(client, booking):
+    activity = first_activity()
+    url = f"/reports/revenue?from={booking['checkin_date']}&to={booking['checkin_date']}&kind=activity"
+
+    def activity_row():
+        data = client.get(url).get_json()["data"]
+        assert list(data) == ["activity"]
+        rows = [row for row in data["activity"] if row["id"] == activity["id"]]
+        return rows[0] if rows else {"bookings": 0, "revenue": "0"}
+
+    before = activity_row()
+    # La actividad repetida se cobra una vez
+    payload = dict(booking, activity_ids=[activity["id"], activity["id"]])
+    assert client.post("/reservations", json=payload).status_code == 201
+    apply_pending()
+    after = activity_row()
+    assert after["bookings"] == before["bookings"] + 1
+    assert Decimal(after["revenue"]) == Decimal(before["revenue"]) + activity["price"]
+
+
+def test_revenue_report_rejects_unknown_kind(client, booking):
+    response = client.get(f"/reports/revenue?from={booking['checkin_date']}&to={booking['checkout_date']}&kind=room")
+    assert response.status_code == 400
+    assert "package" in response.get_json()["message"]
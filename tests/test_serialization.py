@@ -0,0 +1,91 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serialization
+
+needs_orjson = pytest.mark.skipif(serialization.orjson is None, reason="orjson no está instalado")
+
+
+@pytest.fixture
+def json_app():
+    app = Flask(__name__)
+    serialization.init_app(app)
+
+    @app.route("/room")
+    def room():
+        return {"id": 1, "price_per_night": Decimal("80.50"), "name": "Habitación doble"}
+    return app
+
+
+@pytest.fixture
+def providers(json_app):
+    return DefaultJSONProvider(json_app), serialization.JSONProvider(json_app)
+
+
+@needs_orjson
+@pytest.mark.parametrize("obj", [
+    {3: "tres", 1: "uno", 20: "veinte"},
+    {1.5: Decimal("10.00"), 2.25: date(2090, 1, 1)},
+    {True: 1, False: 0},
+    {None: "nulo"},
+    {"data": [{7: {"free": 3, "total": 10}}, {8: {"free": 0, "total": 4}}]},
+])
+def test_non_str_keys_match_default_provider(providers, obj):
+    default, fast = providers
+    # Mismo contenido; con varias claves numéricas el orden puede diferir
+    # (json ordena por número, orjson por el string ya convertido)
+    assert json.loads(fast.dumps(obj)) == json.loads(default.dumps(obj))
+    assert json.loads(fast.dumps_bytes(obj, indent=True)) == json.loads(default.dumps(obj))
+
+
+
+ROWS = [
+    {"id": 1, "name": "Cabaña del río", "price": Decimal("120.00"), "check_in_date": date(2090, 1, 1), "gallery": None},
+    {"id": 2, "name": "Suite \"Lago\"", "price": Decimal("99.9"), "tags": ["vista", "ñandú"], "nested": {"b": 1, "a": [1.5, True]}},
+]
+
+
+@needs_orjson
+def test_rows_match_default_provider(providers):
+    default, fast = providers
+    assert json.loads(fast.dumps_bytes(ROWS)) == json.loads(default.dumps(ROWS))
+    assert fast.loads(fast.dumps(ROWS)) == default.loads(default.dumps(ROWS))
+
+
+def test_prices_and_dates_are_written_like_flask(providers):
+    _, fast = providers
+    row = json.loads(fast.dumps_bytes(ROWS[0]))
+    assert row["price"] == "120.00"
+    assert row["check_in_date"] == "Sun, 01 Jan 2090 00:00:00 GMT"
+
+
+def test_unknown_types_raise_type_error(providers):
+    _, fast = providers
+    with pytest.raises(TypeError):
+        fast.dumps_bytes({"value": object()})
+
+
+def test_fallback_without_orjson(providers, monkeypatch):
+    default, fast = providers
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert fast.dumps_bytes(ROWS) == default.dumps(ROWS).encode("utf-8")
+    assert json.loads(fast.dumps_bytes(ROWS, indent=True)) == json.loads(default.dumps(ROWS))
+
+
+def test_view_responses_use_the_provider(json_app):
+    response = json_app.test_client().get("/room")
+    assert response.mimetype == "application/json"
+    assert response.data.endswith(b"\n")
+    assert response.get_json() == {"id": 1, "price_per_night": "80.50", "name": "Habitación doble"}
+
+
+def test_json_response_sends_the_bytes_as_they_are(json_app):
+    body = b'{"status":"success"}\n'
+    with json_app.app_context():
+        response = serialization.json_response(body, 201)
+    assert (response.status_code, response.data, response.mimetype) == (201, body, "application/json")
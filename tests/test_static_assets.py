@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+
+import pytest
+import yaml
+from flask import Flask
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import static_assets
+from routes.docs import docs_bp
+from static_assets import Asset
+
+needs_brotli = pytest.mark.skipif(static_assets.brotli is None, reason="brotli no está instalado")
+
+BODY = b"swagger ui " * 500
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+@pytest.fixture
+def docs_app():
+    """Solo las rutas de la documentación, sin base."""
+    app = Flask(__name__)
+    app.register_blueprint(docs_bp)
+    return app.test_client()
+
+
+def test_small_files_are_not_compressed():
+    asset = Asset(b"hola", "text/plain")
+    assert list(asset.bodies) == ["identity"]
+    assert asset.negotiate(accept("gzip, br")) == "identity"
+
+
+def test_variants_decompress_to_the_original():
+    asset = Asset(BODY, "text/plain")
+    assert gzip.decompress(asset.bodies["gzip"]) == BODY
+    if static_assets.brotli is not None:
+        assert static_assets.brotli.decompress(asset.bodies["br"]) == BODY
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", "identity"),
+    ("gzip", "gzip"),
+    ("deflate", "identity"),
+    ("gzip;q=0, identity", "identity"),
+    ("*", "br"),
+    ("gzip, br", "br"),
+    ("gzip;q=1, br;q=0.5", "gzip"),
+    ("br;q=0, *", "gzip"),
+])
+@needs_brotli
+def test_negotiate_picks_highest_quality(header, expected):
+    assert Asset(BODY, "text/plain").negotiate(accept(header)) == expected
+
+
+def test_each_variant_has_its_own_etag():
+    asset = Asset(BODY, "text/plain")
+    assert asset.etag("identity") == asset.version
+    assert asset.etag("gzip") == f"{asset.version}-gzip"
+    # La versión depende solo del contenido
+    assert Asset(BODY, "text/css").version == asset.version
+    assert Asset(BODY + b"!", "text/plain").version != asset.version
+
+
+def test_precompressed_file_is_used_only_if_newer(tmp_path):
+    path = tmp_path / "app.js"
+    path.write_bytes(BODY)
+    (tmp_path / "app.js.gz").write_bytes(b"precomprimido")
+    assert Asset(BODY, "text/javascript", str(path)).bodies["gzip"] == b"precomprimido"
+    # El original cambió después de precomprimir: se comprime de nuevo
+    mtime = os.path.getmtime(path)
+    os.utime(tmp_path / "app.js.gz", (mtime - 10, mtime - 10))
+    assert gzip.decompress(Asset(BODY, "text/javascript", str(path)).bodies["gzip"]) == BODY
+
+
+def test_precompress_writes_smaller_variants(tmp_path):
+    (tmp_path / "app.js").write_bytes(BODY)
+    (tmp_path / "tiny.js").write_bytes(b"x")
+    written = static_assets.precompress(str(tmp_path))
+    assert {(name, encoding) for name, encoding, _, _ in written} == {
+        ("app.js", encoding) for encoding in static_assets.ENCODINGS if static_assets._available(encoding)}
+    assert gzip.decompress((tmp_path / "app.js.gz").read_bytes()) == BODY
+    assert not (tmp_path / "tiny.js.gz").exists()
+    # Los .gz ya escritos no se vuelven a comprimir
+    assert {name for name, _, _, _ in static_assets.precompress(str(tmp_path))} == {"app.js"}
+
+
+def test_gzip_response_and_revalidation(docs_app):
+    response = docs_app.get("/docs/swagger-ui.css", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    asset = static_assets.get_asset("swagger-ui.css")
+    assert gzip.decompress(response.get_data()) == asset.bodies["identity"]
+    etag = response.headers["ETag"]
+    assert etag == f'"{asset.etag("gzip")}"'
+
+    response = docs_app.get("/docs/swagger-ui.css", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+    # El ETag de la variante gzip no sirve para la sin comprimir
+    response = docs_app.get("/docs/swagger-ui.css", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == asset.bodies["identity"]
+
+
+def test_versioned_url_is_immutable(docs_app):
+    asset = static_assets.get_asset("swagger-ui-bundle.js")
+    response = docs_app.get(f"/docs/swagger-ui-bundle.js?v={asset.version}")
+    assert response.headers["Cache-Control"] == static_assets.IMMUTABLE_CACHE_CONTROL
+    # Una versión vieja se revalida
+    response = docs_app.get("/docs/swagger-ui-bundle.js?v=0000")
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+def test_index_links_versioned_assets(docs_app):
+    index = docs_app.get("/docs/").get_data(as_text=True)
+    for name in ("swagger-ui.css", "index.css", "swagger-ui-bundle.js", "swagger-initializer.js"):
+        assert f'"./{name}?v={static_assets.get_asset(name).version}"' in index
+    initializer = docs_app.get("/docs/swagger-initializer.js").get_data(as_text=True)
+    assert f'"/swagger.json?v={static_assets.get_asset("swagger.json").version}"' in initializer
+
+
+def test_spec_is_served_as_yaml_and_json(docs_app):
+    response = docs_app.get("/swagger.yaml")
+    assert response.mimetype == "application/yaml"
+    spec = yaml.safe_load(response.get_data())
+    response = docs_app.get("/swagger.json")
+    assert response.mimetype == "application/json"
+    assert json.loads(response.get_data()) == json.loads(json.dumps(spec, default=static_assets._json_default))
+    assert static_assets.get_spec() == spec
+
+
+@pytest.mark.parametrize("path", ["/docs/nada.js", "/docs/swagger.yaml", "/docs/../app.py"])
+def test_unknown_files_are_not_served(docs_app, path):
+    response = docs_app.get(path)
+    assert response.status_code == 404
+    assert response.get_json()["status"] == "error"